@@ -0,0 +1,123 @@
+"""
+Async-версии «горячих» представлений для ASGI (config/asgi.py).
+Блокирующие вызовы core.storage выполняются в ограниченном пуле потоков (core.executor),
+поэтому медленные и долгие соединения не занимают воркер целиком.
+Ответы совпадают с sync-версиями из api/views.py.
+"""
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from core import ratelimit, storage
+from core.executor import run_storage
+
+from .views import (
+    INVALID_IDEMPOTENCY_KEY,
+    MONTHLY_STATS_ARGS_ERROR,
+    RATE_LIMITED,
+    REPLICA_STALENESS_HEADER,
+    _children_payload,
+    _educator_group_id,
+    _idempotency_key,
+    _monthly_stats_args,
+    _on_replica,
+    _stats_children_data,
+    _stats_groups_data,
+)
+
+NOT_AUTHENTICATED = {"detail": "Учетные данные не были предоставлены."}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={"ensure_ascii": False})
+
+
+async def _report(fn, *args, **kwargs):
+    """Отчёт по реплике (если она свежая) в пуле потоков хранилища; отставание — в заголовке."""
+    data, staleness = await run_storage(_on_replica, fn, *args, **kwargs)
+    response = _json(data)
+    if staleness is not None:
+        response[REPLICA_STALENESS_HEADER] = f"{staleness:.1f}"
+    return response
+
+
+def _request_data(request):
+    """Тело запроса как dict (JSON или форма). None — если JSON не разбирается."""
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+async def _is_authenticated(request):
+    user = await request.auser()
+    return user.is_authenticated
+
+
+@require_GET
+async def children_list(request):
+    """GET /api/v1/children — список детей (id, fullName, groupId, balance)."""
+    children = await run_storage(storage.get_children)
+    return _json(_children_payload(children))
+
+
+@csrf_exempt
+@require_POST
+async def game_interaction(request):
+    """POST /api/v1/game/interaction — взаимодействие: body { childId, actionId, requestId? } (или заголовок Idempotency-Key)."""
+    data = _request_data(request)
+    if data is None:
+        return _json({"detail": "JSON parse error"}, status=400)
+    child_id = data.get("childId")
+    action_id = data.get("actionId")
+    if not child_id or not action_id:
+        return _json({"success": False, "reason": "childId and actionId required"}, status=400)
+    idempotency_key = _idempotency_key(request, data)
+    if idempotency_key == "":
+        return _json(INVALID_IDEMPOTENCY_KEY, status=400)
+    # Повтор уже выполненного запроса получает сохранённый ответ и не тратит токены лимитера
+    if idempotency_key:
+        replay = await run_storage(storage.get_idempotent_result, idempotency_key, child_id, action_id)
+        if replay is not None:
+            return _json(replay)
+    # Лимитер — доли миллисекунды в общей памяти, без пула потоков хранилища
+    retry_after = ratelimit.admit(ratelimit.client_key(request), child_id)
+    if retry_after:
+        response = _json(RATE_LIMITED, status=429)
+        response["Retry-After"] = str(retry_after)
+        return response
+    result = await run_storage(storage.process_interaction, child_id, action_id, idempotency_key=idempotency_key)
+    return _json(result)
+
+
+@require_GET
+async def admin_stats_groups(request):
+    """GET /api/v1/admin/stats/groups?from=...&to=..."""
+    if not await _is_authenticated(request):
+        return _json(NOT_AUTHENTICATED, status=403)
+    return await _report(_stats_groups_data, request.GET, _educator_group_id(request))
+
+
+@require_GET
+async def admin_stats_children(request):
+    """GET /api/v1/admin/stats/children?groupId=...&q=...&from=...&to=..."""
+    if not await _is_authenticated(request):
+        return _json(NOT_AUTHENTICATED, status=403)
+    return await _report(_stats_children_data, request.GET, _educator_group_id(request))
+
+
+@require_GET
+async def admin_monthly_stats(request):
+    """GET /api/v1/admin/monthly-stats?year=2025&month=10&group_id=... — расширенная статистика за месяц."""
+    if not await _is_authenticated(request):
+        return _json(NOT_AUTHENTICATED, status=403)
+    args = _monthly_stats_args(request.GET, _educator_group_id(request))
+    if args is None:
+        return _json(MONTHLY_STATS_ARGS_ERROR, status=400)
+    year, month, group_id = args
+    return await _report(storage.get_monthly_stats, year=year, month=month, group_id=group_id)
@@ -2,14 +2,55 @@
 Бэкенд аутентификации по JSON-файлу admins.json вместо SQLite auth_user.
 Пароли хранятся в открытом виде. Сессии в БД; в сессии сохраняем admin_username.
 """
+import time
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import BaseBackend
+from django.db.models.signals import post_delete, post_save
 
 from core import storage
 
 # Один «прокси»-пользователь в БД для сессии (id=1). Создаётся в init_admin.
 PROXY_USERNAME = "__admin_proxy__"
 
+# Поля прокси-пользователя кэшируются на процесс: get_user вызывается на каждом запросе с сессией.
+# Каждый запрос получает свой экземпляр (login() меняет его). Изменения из других процессов
+# сигналы не ловят, поэтому запись перечитывается раз в PROXY_CACHE_TTL секунд и при чужом pk.
+PROXY_CACHE_TTL = 60
+_proxy_cache = {}
+
+
+def _get_proxy_user(user_id=None):
+    """Новый экземпляр прокси-пользователя по кэшу процесса; в БД идём при первом обращении,
+    по истечении PROXY_CACHE_TTL и если user_id из сессии не совпал с закэшированным pk."""
+    User = get_user_model()
+    cached = _proxy_cache.get("user")
+    stale = cached is None or time.monotonic() - cached["at"] > PROXY_CACHE_TTL
+    if not stale and user_id is not None and str(cached["pk"]) != str(user_id):
+        stale = True
+    if stale:
+        try:
+            proxy = User.objects.get(username=PROXY_USERNAME)
+        except User.DoesNotExist:
+            _proxy_cache.pop("user", None)
+            return None
+        names = [f.attname for f in User._meta.concrete_fields]
+        cached = {
+            "pk": proxy.pk, "db": proxy._state.db, "names": names,
+            "values": [getattr(proxy, name) for name in names], "at": time.monotonic(),
+        }
+        _proxy_cache["user"] = cached
+    return User.from_db(cached["db"], cached["names"], list(cached["values"]))
+
+
+def _drop_proxy_cache(sender, instance, **kwargs):
+    if getattr(instance, "username", None) == PROXY_USERNAME:
+        _proxy_cache.pop("user", None)
+
+
+post_save.connect(_drop_proxy_cache, sender=get_user_model(), dispatch_uid="auth_backend_proxy_save")
+post_delete.connect(_drop_proxy_cache, sender=get_user_model(), dispatch_uid="auth_backend_proxy_delete")
+
 
 class JSONFileBackend(BaseBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -23,23 +64,18 @@ class JSONFileBackend(BaseBackend):
             return None
         if not admin.get("is_staff", True):
             return None
-        User = get_user_model()
-        try:
-            proxy = User.objects.get(username=PROXY_USERNAME)
-        except User.DoesNotExist:
+        proxy = _get_proxy_user()
+        if proxy is None:
             return None
         if request is not None:
             request.session["admin_username"] = username
             request.session["role"] = admin.get("role") or "admin"
             request.session["group_id"] = admin.get("group_id") or ""
+            request.session["tenant"] = storage.current_tenant()
         return proxy
 
     def get_user(self, user_id):
-        User = get_user_model()
-        try:
-            user = User.objects.get(pk=user_id)
-            if user.username == PROXY_USERNAME:
-                return user
-        except User.DoesNotExist:
-            pass
+        proxy = _get_proxy_user(user_id)
+        if proxy is not None and str(proxy.pk) == str(user_id):
+            return proxy
         return None
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import storage
+
+
+class TenantCommand(BaseCommand):
+    """Команда над хранилищем с опцией --tenant: handle_storage выполняется с данными указанного детского сада."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenant", help="тенант (детский сад) в мультитенантном режиме")
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options["tenant"]:
+            tenant = storage.get_tenant(options["tenant"])
+            if tenant is None:
+                raise CommandError(f"Тенант не найден: {options['tenant']}")
+        with storage.use_tenant(tenant):
+            self.handle_storage(*args, **options)
+
+    def handle_storage(self, *args, **options):
+        raise NotImplementedError
@@ -0,0 +1,11 @@
+from core import storage
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = "Удалить из events.json события удалённых детей (по надгробиям) одним проходом. Удобно запускать по cron в нерабочее время."
+
+    def handle_storage(self, *args, **options):
+        removed = storage.compact_events()
+        self.stdout.write(self.style.SUCCESS(f"Удалено событий: {removed}."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import storage
+
+
+class Command(BaseCommand):
+    help = "Создать тенант (детский сад) для мультитенантного режима: каталог TENANTS_DIR/<имя> с файлами по умолчанию."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="имя тенанта: латиница в нижнем регистре, цифры, дефис (как поддомен)")
+        parser.add_argument("--admin", help="логин администратора тенанта")
+        parser.add_argument("--password", help="пароль администратора (по умолчанию совпадает с логином)")
+
+    def handle(self, *args, **options):
+        tenant = storage.create_tenant(options["name"])
+        if tenant is None:
+            raise CommandError("Недопустимое имя тенанта: только a-z, 0-9 и дефис, до 63 символов.")
+        if options["admin"]:
+            with storage.use_tenant(tenant):
+                storage.add_or_update_admin(options["admin"], options["password"] or options["admin"], is_staff=True, role="admin")
+        self.stdout.write(self.style.SUCCESS(f"Тенант {tenant.name}: {tenant.data_dir}"))
@@ -0,0 +1,28 @@
+from django.core.management.base import CommandError
+from core import storage
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = "Импортировать детей из CSV (ФИО; группа). Недостающие группы создаются, всё сохраняется одной записью."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("path", help="путь к CSV-файлу")
+        parser.add_argument("--encoding", default="utf-8-sig", help="кодировка файла (по умолчанию utf-8)")
+
+    def handle_storage(self, *args, **options):
+        try:
+            with open(options["path"], "r", encoding=options["encoding"]) as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"Не удалось прочитать файл: {e}")
+        result = storage.import_children(storage.parse_children_csv(text))
+        if result.get("errors"):
+            for err in result["errors"]:
+                self.stderr.write(f"Строка {err['line']}: {err['error']}")
+            raise CommandError("Импорт отменён, ничего не сохранено.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано детей: {len(result['created'])}, новых групп: {len(result['groupsCreated'])}."
+        ))
@@ -0,0 +1,17 @@
+from core import storage
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = (
+        "Перенести итоги месяцев из прежнего monthly_results.json в индекс monthly_index.json и файлы по группам "
+        "(monthly/<год-месяц>/<группа>.json). Выполняется и автоматически при старте, если индекса ещё нет."
+    )
+
+    def handle_storage(self, *args, **options):
+        count = storage.migrate_monthly_results()
+        if count is None:
+            self.stdout.write(f"Нет файла {storage.LEGACY_MONTHLY_RESULTS} — переносить нечего.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Перенесено месяцев: {count}."))
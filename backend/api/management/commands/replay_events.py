@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import CommandError
+from core import replay, storage
+
+from ..base import TenantCommand
+
+# Сколько раз пересчитывать, если журнал событий изменился между пересчётом и исправлением
+REPAIR_ATTEMPTS = 3
+
+
+class Command(TenantCommand):
+    help = (
+        "Пересчитать балансы детей по журналу событий с начала текущего месяца (в пуле процессов) "
+        "и сообщить о расхождениях; --fix — исправить балансы, счётчик номеров событий и суммы итогов месяцев."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--fix", action="store_true", help="исправить найденные расхождения")
+        parser.add_argument("--workers", type=int, help="число процессов (по умолчанию — по числу ядер)")
+        parser.add_argument("--chunk-mb", type=int, default=replay.CHUNK_BYTES // (1024 * 1024), help="размер куска events.json на процесс, МБ")
+
+    def handle_storage(self, *args, **options):
+        chunk_bytes = max(1, options["chunk_mb"]) * 1024 * 1024
+        for _ in range(REPAIR_ATTEMPTS):
+            start = time.perf_counter()
+            result = replay.replay(workers=options["workers"], chunk_bytes=chunk_bytes)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"Событий: {result['events']}, детей с событиями за период: {len(result['expected'])}, {elapsed:.2f} с.")
+            if not options["fix"]:
+                mismatches = replay.compare(result)
+                self._report(mismatches)
+                if mismatches:
+                    raise CommandError(f"Расхождений: {len(mismatches)} (исправить: --fix).")
+                self.stdout.write(self.style.SUCCESS("Балансы сходятся с журналом событий."))
+                return
+            fixed = replay.repair(result)
+            if fixed is not None:
+                break
+            self.stdout.write("Журнал событий изменился во время пересчёта — пересчитываю заново.")
+        else:
+            raise CommandError("Журнал событий меняется слишком часто, повторите в нерабочее время.")
+        self._report(fixed["children"])
+        self.stdout.write(self.style.SUCCESS(f"Исправлено балансов: {len(fixed['children'])}."))
+        if fixed["eventSeq"] is not None:
+            self.stdout.write(self.style.SUCCESS(f"Счётчик номеров событий: {fixed['eventSeq']}."))
+        if fixed["monthlyIndex"]:
+            self.stdout.write(self.style.SUCCESS(f"Исправлено сумм в индексе итогов месяцев: {fixed['monthlyIndex']}."))
+        # Индексы в памяти воркеров пересобираются сами по новой версии файлов; здесь — проверка, что строятся
+        storage._index_cache.clear()
+        start = time.perf_counter()
+        storage.warm_indexes()
+        self.stdout.write(f"Индексы перестроены за {time.perf_counter() - start:.2f} с.")
+
+    def _report(self, mismatches):
+        for m in mismatches:
+            self.stderr.write(
+                f"{m['childId']}: баланс {m['balance']}, по журналу {m['expected']}"
+                f" (balanceAfter последнего события: {m['lastBalanceAfter']})"
+            )
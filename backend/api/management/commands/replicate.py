@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import CommandError
+from core import replication, storage
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = (
+        "Реплика для отчётов: применять журнал изменений основного хранилища (STORAGE_CHANGELOG=1) "
+        "к каталогу реплики. Первый запуск копирует данные целиком."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--source", help="каталог основного хранилища (по умолчанию DATA_DIR или каталог тенанта)")
+        parser.add_argument("--target", help="каталог реплики (по умолчанию REPLICA_DATA_DIR)")
+        parser.add_argument("--interval", type=float, default=1.0, help="пауза между проверками журнала, сек")
+        parser.add_argument("--once", action="store_true", help="применить накопленное и выйти")
+
+    def handle_storage(self, *args, **options):
+        source = options["source"] or storage.current_data_dir()
+        target = options["target"] or replication.replica_dir(storage.current_tenant())
+        if target is None:
+            raise CommandError("Не задан каталог реплики: --target или REPLICA_DATA_DIR.")
+        while True:
+            applied = replication.apply_pending(source, target)
+            if applied < 0:
+                self.stdout.write(f"Начальная копия {source} → {target}.")
+            elif applied:
+                self.stdout.write(f"Применено записей журнала: {applied}.")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
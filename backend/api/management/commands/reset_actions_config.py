@@ -1,10 +1,11 @@
-from django.core.management.base import BaseCommand
 from core import storage
 
+from ..base import TenantCommand
 
-class Command(BaseCommand):
+
+class Command(TenantCommand):
     help = "Перезаписать правила начисления очков (actions_config.json) дефолтными из кода."
 
-    def handle(self, *args, **options):
+    def handle_storage(self, *args, **options):
         storage.reset_actions_config_to_defaults()
         self.stdout.write(self.style.SUCCESS("Правила начисления очков сброшены на дефолтные из кода."))
@@ -0,0 +1,24 @@
+from django.core.management.base import CommandError
+from core import backup
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = "Восстановить хранилище из снимка (manage.py snapshot). Снимок предварительно проверяется."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("path", help="путь к архиву snapshot-*.tar.gz")
+        parser.add_argument("--force", action="store_true", help="восстановить, даже если балансы не сходятся с событиями")
+
+    def handle_storage(self, *args, **options):
+        try:
+            manifest, problems, restored = backup.restore_snapshot(options["path"], force=options["force"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        for problem in problems:
+            self.stderr.write(f"Проверка: {problem}")
+        if not restored:
+            raise CommandError("Снимок не прошёл проверку, ничего не изменено (--force — восстановить всё равно).")
+        self.stdout.write(self.style.SUCCESS(f"Восстановлен снимок от {manifest['created']}."))
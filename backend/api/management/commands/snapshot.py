@@ -0,0 +1,23 @@
+from core import backup
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = (
+        "Снять согласованный снимок всех файлов хранилища в сжатый архив (tar.gz с manifest.json). "
+        "Запись не останавливается: блокировка держится только на время открытия файлов."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--output", help="каталог для архива (по умолчанию SNAPSHOT_DIR или DATA_DIR/snapshots)")
+        parser.add_argument("--no-verify", action="store_true", help="не сверять балансы с событиями")
+
+    def handle_storage(self, *args, **options):
+        path, manifest = backup.create_snapshot(options["output"], check=not options["no_verify"])
+        size = path.stat().st_size
+        raw_size = sum(f["size"] for f in manifest["files"].values())
+        self.stdout.write(self.style.SUCCESS(f"Снимок {path} ({size} байт, данные {raw_size} байт)."))
+        for problem in manifest["problems"] or []:
+            self.stderr.write(f"Проверка: {problem}")
@@ -0,0 +1,38 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import storage, storage_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Сервер хранилища: один процесс владеет данными и индексами, воркеры gunicorn "
+        "обращаются к нему через Unix-сокет (STORAGE_SOCKET)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", help="путь Unix-сокета (по умолчанию STORAGE_SOCKET)")
+
+    def handle(self, *args, **options):
+        path = options["socket"] or getattr(settings, "STORAGE_SOCKET", "")
+        if not path:
+            raise CommandError("Не задан путь сокета: --socket или STORAGE_SOCKET.")
+        if not storage_server.remove_stale_socket(path):
+            raise CommandError(f"По сокету {path} уже отвечает сервер хранилища.")
+        storage.bootstrap(warm=True)
+        server = storage_server.StorageServer(path)
+        # serve_forever останавливается из другого потока; начатые вызовы дописываются до выхода
+        stop = lambda *_: threading.Thread(target=server.shutdown).start()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f"Сервер хранилища слушает {path}.")
+        try:
+            server.serve_forever()
+        finally:
+            if not server.drain():
+                self.stderr.write("Не дождался завершения начатых вызовов.")
+            server.server_close()
+            storage_server.remove_stale_socket(path)
+        self.stdout.write("Сервер хранилища остановлен.")
@@ -0,0 +1,27 @@
+from django.core.management.base import CommandError
+from core import backup
+
+from ..base import TenantCommand
+
+
+class Command(TenantCommand):
+    help = "Сверить балансы детей с журналом событий: в текущем хранилище (согласованный срез) или в архиве снимка."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("path", nargs="?", help="архив снимка; без него проверяется текущее хранилище")
+
+    def handle_storage(self, *args, **options):
+        if options["path"]:
+            try:
+                _, data = backup.read_snapshot(options["path"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            problems = backup.verify(data)
+        else:
+            problems = backup.verify_current()
+        for problem in problems:
+            self.stderr.write(f"{problem}")
+        if problems:
+            raise CommandError(f"Найдено проблем: {len(problems)}.")
+        self.stdout.write(self.style.SUCCESS("Балансы сходятся с событиями."))
@@ -0,0 +1,32 @@
+"""Общая подготовка тестов: хранилище во временном каталоге."""
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+
+from api import auth_backend
+from core import storage
+
+
+class StorageTestCase(TestCase):
+    """Тест с хранилищем в чистом временном каталоге: тенант по умолчанию подменяется на время теста."""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory(prefix="detsad_test_")
+        self.addCleanup(tmp.cleanup)
+        self.data_dir = Path(tmp.name)
+        tenant = storage.use_tenant(storage.Tenant("", self.data_dir))
+        tenant.__enter__()
+        self.addCleanup(tenant.__exit__, None, None, None)
+        storage._ensure_defaults()
+        caches["stats"].clear()
+        auth_backend._proxy_cache.clear()
+
+    def login_admin(self, username="test_admin", role="admin", group_id=None):
+        get_user_model().objects.get_or_create(username=auth_backend.PROXY_USERNAME, defaults={"is_staff": True})
+        storage.add_or_update_admin(username, username, is_staff=True, role=role, group_id=group_id)
+        response = self.client.post("/api/v1/admin/login", {"username": username, "password": username}, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
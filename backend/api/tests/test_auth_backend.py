@@ -0,0 +1,41 @@
+"""Прокси-пользователь сессий админки: свой экземпляр на запрос, изменения из других процессов."""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+
+from api import auth_backend
+
+from .base import StorageTestCase
+
+
+class ProxyUserTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, _ = get_user_model().objects.get_or_create(username=auth_backend.PROXY_USERNAME, defaults={"is_staff": True})
+        self.backend = auth_backend.JSONFileBackend()
+
+    def test_fresh_instance_per_request(self):
+        first = self.backend.get_user(self.user.pk)
+        first.backend = "changed"
+        second = self.backend.get_user(self.user.pk)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.pk, self.user.pk)
+        self.assertFalse(hasattr(second, "backend"))
+
+    def test_recreated_in_other_process(self):
+        self.assertIsNotNone(self.backend.get_user(self.user.pk))
+        # update() не шлёт сигналов — как пересоздание из другого процесса
+        get_user_model().objects.filter(pk=self.user.pk).update(id=self.user.pk + 100)
+        self.assertEqual(self.backend.get_user(self.user.pk + 100).pk, self.user.pk + 100)
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_deleted_in_other_process(self):
+        self.assertIsNotNone(self.backend.get_user(self.user.pk))
+        get_user_model().objects.filter(pk=self.user.pk).update(username="gone")
+        self.assertIsNotNone(self.backend.get_user(self.user.pk))
+        with mock.patch.object(auth_backend, "PROXY_CACHE_TTL", -1):
+            self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_login_session(self):
+        self.login_admin()
+        self.assertEqual(self.client.get("/api/v1/admin/me").status_code, 200)
@@ -0,0 +1,42 @@
+"""Порядок выборки EventIndex совпадает с прежней сортировкой событий по времени."""
+from django.test import SimpleTestCase
+
+from core import storage
+
+
+def _events():
+    # Пары событий с одинаковым временем у разных детей и у одного ребёнка
+    times = ["2025-01-01T09:00:00", "2025-01-01T10:00:00", "2025-01-01T09:00:00", "2025-01-01T10:00:00",
+             "2025-01-02T08:00:00", "2025-01-01T10:00:00", "2025-01-02T08:00:00", "2025-01-01T09:00:00"]
+    return [{"id": i, "timestamp": ts, "childId": f"c{i % 3}"} for i, ts in enumerate(times)]
+
+
+def _baseline(events, child_ids=None, from_date=None, to_date=None):
+    out = [
+        e for e in events
+        if (child_ids is None or e["childId"] in child_ids)
+        and (not from_date or e["timestamp"][:10] >= from_date) and (not to_date or e["timestamp"][:10] <= to_date)
+    ]
+    return [e["id"] for e in sorted(out, key=lambda x: x.get("timestamp", ""), reverse=True)]
+
+
+class EventIndexOrderTest(SimpleTestCase):
+    def check(self, index, events):
+        cases = (
+            {}, {"child_ids": ["c0"]}, {"child_ids": ["c0", "c1"]}, {"child_ids": ["c0", "c1", "c2"]},
+            {"from_date": "2025-01-01", "to_date": "2025-01-01"}, {"child_ids": ["c1", "c2"], "from_date": "2025-01-02"},
+        )
+        for kwargs in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual([e["id"] for e in index.select(**kwargs)], _baseline(events, **kwargs))
+
+    def test_equal_timestamps_in_file_order(self):
+        events = _events()
+        self.check(storage.EventIndex(events), events)
+
+    def test_patched_index(self):
+        events = _events()
+        index = storage.EventIndex(events[:3])
+        for e in events[3:]:
+            index.add(e)
+        self.check(index, events)
@@ -0,0 +1,75 @@
+"""Ключи идемпотентности начислений: повтор, чужой ключ, вытеснение по TTL и числу ключей."""
+from unittest import mock
+
+from core import ratelimit, storage
+
+from .base import StorageTestCase
+from .test_ratelimit import _temp_segment
+
+
+class IdempotencyTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        storage._write_json("children", [
+            {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": "group1", "balance": 0, "avatar": None}
+            for i in (1, 2)
+        ])
+        storage._write_json("actions_config", [
+            {"id": "crane", "name": "Кран", "coins": 1, "cooldown_sec": 0, "daily_limit_coins": 10 ** 9},
+        ])
+        patches = (
+            mock.patch.object(ratelimit, "_segment", _temp_segment(self)),
+            mock.patch.object(ratelimit, "ENABLED", True),
+            mock.patch.object(ratelimit, "CHILD_BUCKET", (1, 0.001)),
+        )
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def interact(self, key, child_id="child1"):
+        return self.client.post(
+            "/api/v1/game/interaction", {"childId": child_id, "actionId": "crane", "requestId": key},
+            content_type="application/json",
+        )
+
+    def balance(self, child_id="child1"):
+        return storage.get_child_by_id(child_id)["balance"]
+
+    def test_replay_is_not_rate_limited(self):
+        first = self.interact("k1")
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.json()["success"])
+        # Ведро ребёнка пусто: новый запрос отклоняется, повтор получает исходный ответ
+        self.assertEqual(self.interact("k2").status_code, 429)
+        replay = self.interact("k1")
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json(), {**first.json(), "replayed": True})
+        self.assertEqual(self.balance(), 1)
+
+    def test_key_reused_for_other_child(self):
+        self.interact("k1")
+        response = self.interact("k1", child_id="child2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["reason"], "idempotency_key_reused")
+        self.assertEqual(self.balance("child2"), 0)
+
+    def test_expired_key_is_processed_again(self):
+        with mock.patch.object(ratelimit, "ENABLED", False):
+            self.interact("k1")
+            entries = storage._read_json_any("idempotency")
+            entries[0]["at"] -= storage.IDEMPOTENCY_TTL + 1
+            storage._write_json("idempotency", entries)
+            response = self.interact("k1")
+        self.assertNotIn("replayed", response.json())
+        self.assertEqual(self.balance(), 2)
+        # Устаревшая запись вытеснена, вместо неё — новая
+        self.assertEqual([e["key"] for e in storage._read_json_any("idempotency")], ["k1"])
+
+    def test_oldest_keys_evicted_over_limit(self):
+        with mock.patch.object(ratelimit, "ENABLED", False), mock.patch.object(storage, "IDEMPOTENCY_MAX_KEYS", 2):
+            for key in ("k1", "k2", "k3"):
+                self.interact(key)
+            self.assertEqual([e["key"] for e in storage._read_json_any("idempotency")], ["k2", "k3"])
+            self.assertTrue(self.interact("k3").json().get("replayed"))
+            self.assertNotIn("replayed", self.interact("k1").json())
+        self.assertEqual(self.balance(), 4)
@@ -0,0 +1,79 @@
+"""Итоги месяцев: повторное сохранение месяца и статистика за месяц."""
+from core import storage
+
+from .base import StorageTestCase
+
+
+def _row(child_id, group_id, balance):
+    return {"childId": child_id, "fullName": child_id, "balance": balance, "groupId": group_id}
+
+
+class MonthlyTest(StorageTestCase):
+    def month_files(self):
+        return sorted(p.name for p in (self.data_dir / storage.MONTHLY_DIR / "2025-01").glob("*.json"))
+
+    def test_resave_removes_unlisted_group_files(self):
+        with storage.transaction():
+            storage._save_month(2025, 1, [_row("c1", "group1", 3), _row("c2", "group2", 5)])
+        self.assertEqual(self.month_files(), ["group1.json", "group2.json"])
+        with storage.transaction():
+            storage._save_month(2025, 1, [_row("c1", "group1", 4)])
+        self.assertEqual(self.month_files(), ["group1.json"])
+        [entry] = storage.get_monthly_results()
+        self.assertEqual((entry["totalSum"], [c["childId"] for c in entry["children"]]), (4, ["c1"]))
+
+    def test_failed_resave_keeps_files(self):
+        with storage.transaction():
+            storage._save_month(2025, 1, [_row("c1", "group1", 3), _row("c2", "group2", 5)])
+        with self.assertRaises(RuntimeError), storage.transaction():
+            storage._save_month(2025, 1, [_row("c1", "group1", 4)])
+            raise RuntimeError
+        self.assertEqual(self.month_files(), ["group1.json", "group2.json"])
+        self.assertEqual(storage.get_monthly_results()[0]["totalSum"], 8)
+
+    def test_stats_take_events_of_month(self):
+        def event(seq, child_id, timestamp):
+            return {"id": f"ev{seq}", "seq": seq, "childId": child_id, "actionId": "a", "credited": 1, "timestamp": timestamp}
+
+        storage._write_json("events", [
+            event(1, "c1", "2024-12-31T23:59:00"),
+            event(2, "c1", "2025-01-01T08:00:00"),
+            event(3, "c2", "2025-01-15T10:00:00"),
+            event(4, "c1", "2025-01-31T18:00:00"),
+            event(5, "c2", "2025-02-01T00:00:00"),
+        ])
+        with storage.transaction():
+            storage._save_month(2025, 1, [_row("c1", "group1", 2), _row("c2", "group2", 1)])
+        stats = storage.get_monthly_stats(2025, 1)
+        self.assertEqual(stats["summary"]["totalActions"], 3)
+        self.assertEqual([(r["childId"], r["actionsCount"]) for r in stats["topChildrenByActions"]], [("c1", 2), ("c2", 1)])
+        stats = storage.get_monthly_stats(2025, 1, group_id="group2")
+        self.assertEqual(stats["summary"]["totalActions"], 1)
+
+
+class MigrateMonthlyResultsTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.legacy = self.data_dir / storage.LEGACY_MONTHLY_RESULTS
+        self.legacy.write_text(
+            '[{"year": 2024, "month": 12, "children": [{"childId": "c1", "balance": 3, "groupId": "group1"}]}]',
+            encoding="utf-8",
+        )
+        storage._write_json("monthly_index", [])
+
+    def test_outer_rollback_keeps_legacy_file(self):
+        with self.assertRaises(RuntimeError), storage.transaction():
+            self.assertEqual(storage.migrate_monthly_results(), 1)
+            # Внутри внешней транзакции ничего не записано — старый файл на месте
+            self.assertTrue(self.legacy.exists())
+            raise RuntimeError
+        self.assertTrue(self.legacy.exists())
+        self.assertEqual(storage.get_monthly_results(), [])
+
+    def test_renamed_after_outer_commit(self):
+        with storage.transaction():
+            storage.migrate_monthly_results()
+            self.assertTrue(self.legacy.exists())
+        self.assertFalse(self.legacy.exists())
+        self.assertTrue(self.legacy.with_name(self.legacy.name + ".migrated").exists())
+        self.assertEqual([(m["year"], m["totalSum"]) for m in storage.get_monthly_results()], [(2024, 3)])
@@ -0,0 +1,54 @@
+"""Реплика по журналу изменений: повторное применение пачки записей ничего не задваивает."""
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from core import replication, storage
+
+from .base import StorageTestCase
+
+
+class ReplicationTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Основной каталог теста пишет журнал изменений
+        primary = storage.use_tenant(storage.Tenant("", self.data_dir, changelog=True))
+        primary.__enter__()
+        self.addCleanup(primary.__exit__, None, None, None)
+        tmp = tempfile.TemporaryDirectory(prefix="detsad_replica_")
+        self.addCleanup(tmp.cleanup)
+        self.replica_dir = Path(tmp.name)
+
+    def read(self, directory, key):
+        path = Path(directory) / storage.file_name(key)
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def test_reapplied_batch_is_not_duplicated(self):
+        self.assertEqual(replication.apply_pending(self.data_dir, self.replica_dir), -1)
+        storage.adjust_balance("child1", 2, "тест", "admin")
+        storage.adjust_balance("child2", 3, "тест", "admin")
+        storage.adjust_balance("child1", 1, "тест", "admin")
+        # Сбой после записи файлов реплики, но до записи позиции: пачка применяется ещё раз
+        position = self.replica_dir / replication.POSITION_FILE
+        saved = self.replica_dir / "position.saved"
+        shutil.copyfile(position, saved)
+        self.assertEqual(replication.apply_pending(self.data_dir, self.replica_dir), 3)
+        shutil.copyfile(saved, position)
+        self.assertEqual(replication.apply_pending(self.data_dir, self.replica_dir), 3)
+
+        for key in ("events", "children", "child_changes"):
+            with self.subTest(key=key):
+                self.assertEqual(self.read(self.replica_dir, key), self.read(self.data_dir, key))
+
+    def test_removed_month_files_follow(self):
+        replication.apply_pending(self.data_dir, self.replica_dir)
+        rows = [{"childId": "c1", "balance": 1, "groupId": "group1"}, {"childId": "c2", "balance": 2, "groupId": "group2"}]
+        with storage.transaction():
+            storage._save_month(2025, 1, rows)
+        with storage.transaction():
+            storage._save_month(2025, 1, rows[:1])
+        replication.apply_pending(self.data_dir, self.replica_dir)
+        files = sorted(p.name for p in (self.replica_dir / storage.MONTHLY_DIR / "2025-01").glob("*.json"))
+        self.assertEqual(files, ["group1.json"])
+        self.assertEqual(self.read(self.replica_dir, "monthly_index"), self.read(self.data_dir, "monthly_index"))
@@ -0,0 +1,121 @@
+"""Снимок хранилища на запрос: чтения файлов за запрос к API, отложенные записи и откат транзакций."""
+import threading
+from collections import Counter
+from unittest import mock
+
+from django.core.cache import caches
+
+from core import storage
+
+from .base import StorageTestCase
+
+
+class _RecordingSnapshot(storage.StorageSnapshot):
+    """Снимок, который запоминает себя: после запроса по ним считаются чтения файлов."""
+
+    created = []
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.created.append(self)
+
+
+class SnapshotReadsTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login_admin()
+
+    def reads(self, method, url, data=None):
+        """Чтения файлов за один «холодный» запрос (без индексов и кэша отчётов): {ключ: число}."""
+        storage._index_cache.clear()
+        caches["stats"].clear()
+        _RecordingSnapshot.created = []
+        with mock.patch.object(storage, "StorageSnapshot", _RecordingSnapshot):
+            if method == "get":
+                response = self.client.get(url, data)
+            else:
+                response = getattr(self.client, method)(url, data or {}, content_type="application/json")
+        self.assertLess(response.status_code, 400, (url, response.content))
+        total = Counter()
+        for snap in _RecordingSnapshot.created:
+            total.update(snap.reads)
+        return dict(total)
+
+    def test_each_file_read_once(self):
+        endpoints = [
+            ("get", "/api/v1/groups", None, {"groups": 1}),
+            ("get", "/api/v1/children", None, {"children": 1, "last_month_reset": 1}),
+            ("get", "/api/v1/children/changes", None, {"child_changes": 1, "children": 1, "last_month_reset": 1}),
+            ("get", "/api/v1/kiosk/bootstrap", {"groupId": "group1"}, {
+                "actions_config": 1, "child_changes": 1, "children": 1, "groups": 1, "last_month_reset": 1,
+            }),
+            ("get", "/api/v1/game/actions", None, {"actions_config": 1}),
+            ("get", "/api/v1/leaderboard", None, {"children": 1, "last_month_reset": 1}),
+            ("post", "/api/v1/game/interaction", {"childId": "child1", "actionId": "crane"}, {
+                "actions_config": 1, "child_changes": 1, "children": 1, "events": 1, "last_month_reset": 1,
+            }),
+            ("post", "/api/v1/admin/child/child2/balance-adjust", {"delta": 3, "comment": "тест"}, {
+                "child_changes": 1, "children": 1, "events": 1, "last_month_reset": 1,
+            }),
+            ("put", "/api/v1/admin/child/child2/update", {"fullName": "Петя С.", "groupId": "group2"}, {
+                "child_changes": 1, "children": 1, "last_month_reset": 1,
+            }),
+            ("get", "/api/v1/admin/dashboard", None, {
+                "children": 1, "events": 1, "groups": 1, "last_month_reset": 1, "monthly_index": 1, "tombstones": 1,
+            }),
+            ("get", "/api/v1/admin/stats/groups", None, {
+                "children": 1, "events": 1, "groups": 1, "last_month_reset": 1, "tombstones": 1,
+            }),
+            ("get", "/api/v1/admin/stats/children", None, {
+                "children": 1, "events": 1, "groups": 1, "last_month_reset": 1, "tombstones": 1,
+            }),
+            ("get", "/api/v1/admin/stats/timeseries", None, {"events": 1, "tombstones": 1}),
+            ("get", "/api/v1/admin/events", None, {
+                "actions_config": 1, "children": 1, "events": 1, "last_month_reset": 1, "tombstones": 1,
+            }),
+            ("get", "/api/v1/admin/child/child1/events", None, {
+                "actions_config": 1, "children": 1, "events": 1, "last_month_reset": 1, "tombstones": 1,
+            }),
+            ("get", "/api/v1/admin/monthly-results", None, {"last_month_reset": 1, "monthly_index": 1}),
+        ]
+        for method, url, data, expected in endpoints:
+            with self.subTest(url=url):
+                self.assertEqual(self.reads(method, url, data), expected)
+
+
+class SnapshotWritesTest(StorageTestCase):
+    def create_group_in_thread(self, name):
+        """create_group в другом потоке (со своим контекстом: тот же каталог, без снимка этого потока)."""
+        tenant = storage._current_tenant.get()
+
+        def run():
+            with storage.use_tenant(tenant):
+                storage.create_group(name)
+        other = threading.Thread(target=run)
+        other.start()
+        other.join()
+
+    def test_concurrent_group_create_not_lost(self):
+        with storage.snapshot():
+            storage.create_group("A")
+            self.create_group_in_thread("B")
+        self.assertEqual([g["name"] for g in storage.get_groups()][-2:], ["A", "B"])
+
+    def test_stale_buffered_write_raises(self):
+        with self.assertRaises(storage.StorageConflict):
+            with storage.snapshot():
+                groups = storage._read_json("groups")
+                storage._write_json("groups", groups + [{"id": "z", "name": "Z"}])
+                self.create_group_in_thread("B")
+        self.assertEqual([g["name"] for g in storage.get_groups()][-1], "B")
+
+    def test_failed_transaction_keeps_request_snapshot(self):
+        with storage.snapshot():
+            before = [dict(c) for c in storage.get_children()]
+            with self.assertRaises(ValueError):
+                with storage.transaction():
+                    children = storage._read_json("children")
+                    children[0]["balance"] = 999
+                    children.append({"id": "x"})
+                    raise ValueError
+            self.assertEqual(storage.get_children(), before)
@@ -0,0 +1,30 @@
+"""Выбор сжатия оболочки SPA по Accept-Encoding."""
+from django.test import RequestFactory, SimpleTestCase
+
+from core import spa
+
+
+class _Shell:
+    variants = {"": b"", "gzip": b"", "br": b""}
+
+
+class EncodingTest(SimpleTestCase):
+    def encoding(self, accept):
+        return spa._encoding(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept), _Shell())
+
+    def test_q_values(self):
+        cases = {
+            "": "",
+            "gzip, deflate, br": "br",
+            "gzip, br;q=0": "gzip",
+            "br;q=0.0, gzip;q=0.5": "gzip",
+            "br;q=0, gzip;q=0": "",
+            "BR; q=0.8": "br",
+            "identity": "",
+            "*": "br",
+            "*, br;q=0": "gzip",
+            "deflate, *;q=0": "",
+        }
+        for accept, expected in cases.items():
+            with self.subTest(accept=accept):
+                self.assertEqual(self.encoding(accept), expected)
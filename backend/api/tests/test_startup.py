@@ -0,0 +1,19 @@
+"""Подготовка хранилища — при старте сервера приложения, а не при любой команде manage.py."""
+import tempfile
+from pathlib import Path
+
+from django.apps import apps
+from django.test import SimpleTestCase, override_settings
+
+from core import storage, storage_client
+
+
+@override_settings(STORAGE_SOCKET="", STORAGE_WARM_ON_STARTUP=False)
+class StartupTest(SimpleTestCase):
+    def test_only_server_startup_touches_data(self):
+        with tempfile.TemporaryDirectory() as tmp, storage.use_tenant(storage.Tenant("", Path(tmp))):
+            for config in apps.get_app_configs():
+                config.ready()
+            self.assertEqual(list(Path(tmp).iterdir()), [])
+            storage_client.startup()
+            self.assertTrue((Path(tmp) / storage.file_name("children")).exists())
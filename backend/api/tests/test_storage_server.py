@@ -0,0 +1,98 @@
+"""Сервер хранилища на Unix-сокете и клиент core.storage_client."""
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core import storage, storage_client, storage_server
+
+from .base import StorageTestCase
+
+
+class SocketModeTest(SimpleTestCase):
+    def test_socket_owner_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "storage.sock")
+            umask = os.umask(0o022)
+            try:
+                server = storage_server.StorageServer(path)
+                server.server_close()
+                # Права сокета задаются без смены umask процесса
+                self.assertEqual(os.umask(0o022), 0o022)
+            finally:
+                os.umask(umask)
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            self.assertEqual(os.listdir(tmp), ["storage.sock"])
+            # Занятый адрес не перезаписывается
+            with self.assertRaises(OSError):
+                storage_server.StorageServer(path)
+
+
+class StorageClientTest(StorageTestCase):
+    """Вызовы через клиента к запущенному manage.py storage_server со своим DATA_DIR."""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory(prefix="detsad_server_")
+        self.addCleanup(tmp.cleanup)
+        self.server_dir = Path(tmp.name)
+        self.path = str(self.server_dir / "storage.sock")
+        env = {**os.environ, "DATA_DIR": str(self.server_dir), "STORAGE_SOCKET": self.path, "STORAGE_WARM": "0"}
+        server = subprocess.Popen(
+            [sys.executable, "manage.py", "storage_server"], cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+        self.wait_socket(server)
+        self.client = storage_client.StorageClient(self.path)
+        self.addCleanup(self.client.close)
+
+    def wait_socket(self, server, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self.assertIsNone(server.poll(), "storage_server завершился при старте")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                return
+            except OSError:
+                time.sleep(0.05)
+            finally:
+                probe.close()
+        self.fail("storage_server не открыл сокет")
+
+    def server_group_ids(self):
+        groups = json.loads((self.server_dir / storage.file_name("groups")).read_text(encoding="utf-8"))
+        return [g["id"] for g in groups]
+
+    def test_calls_and_errors(self):
+        group_id = self.client.create_group("Через сервер")
+        self.assertIn({"id": group_id, "name": "Через сервер"}, self.client.get_groups())
+        self.assertIn(group_id, self.server_group_ids())
+        with self.assertRaises(TypeError):
+            self.client.get_child_by_id()
+        with self.assertRaisesRegex(ValueError, "Слишком длинный период"):
+            self.client.get_stats_timeseries("0001-01-01", "2025-12-31")
+        with self.assertRaises(AttributeError):
+            self.client.compact_storage_everything
+
+    def test_install_routes_storage_functions(self):
+        for name in storage_server.API:
+            self.addCleanup(setattr, storage, name, getattr(storage, name))
+        storage_client.install(self.path)
+        group_id = storage.create_group("Через install")
+        self.assertIn(group_id, [g["id"] for g in storage.get_groups()])
+        # Записал сервер в свой каталог, а не этот процесс в каталог теста
+        self.assertIn(group_id, self.server_group_ids())
+        self.assertNotIn(group_id, [g["id"] for g in storage._read_json_any("groups")])
+        with self.assertRaises(ValueError):
+            storage.get_stats_timeseries("0001-01-01", "2025-12-31")
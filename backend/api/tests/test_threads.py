@@ -0,0 +1,91 @@
+"""Потокобезопасность хранилища (малая версия scripts/stress_threads.py): нет потерянных обновлений."""
+import random
+import sys
+import threading
+import traceback
+
+from core import storage
+
+from .base import StorageTestCase
+
+CHILDREN = 12
+GROUPS = 3
+WRITERS = 6
+OPS = 15
+READERS = 2
+
+
+class ThreadsTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Действие без cooldown и дневного лимита — каждое начисление успешно
+        storage._write_json("groups", [{"id": f"group{g}", "name": str(g)} for g in range(1, GROUPS + 1)])
+        storage._write_json("children", [
+            {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": f"group{i % GROUPS + 1}", "balance": 0, "avatar": None}
+            for i in range(CHILDREN)
+        ])
+        storage._write_json("actions_config", [{"id": "crane", "name": "Кран", "coins": 1, "cooldown_sec": 0, "daily_limit_coins": 10 ** 9}])
+        storage._write_json("events", [])
+        interval = sys.getswitchinterval()
+        # Переключать потоки как можно чаще: гонки проявляются чаще
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_no_lost_updates(self):
+        tenant = storage._current_tenant.get()
+        done = threading.Event()
+        errors = []
+        succeeded = []
+
+        def write(n):
+            rnd = random.Random(n)
+            ok = 0
+            try:
+                with storage.use_tenant(tenant):
+                    for _ in range(OPS):
+                        child_id = f"child{rnd.randrange(CHILDREN)}"
+                        if rnd.random() < 0.8:
+                            ok += storage.process_interaction(child_id, "crane")["success"]
+                        else:
+                            ok += storage.adjust_balance(child_id, rnd.randint(1, 3), "threads", "admin") is not None
+            except Exception:
+                errors.append(traceback.format_exc())
+            succeeded.append(ok)
+
+        def read(n):
+            rnd = random.Random(-n)
+            try:
+                with storage.use_tenant(tenant):
+                    while not done.is_set():
+                        storage.get_leaderboard(limit=CHILDREN)
+                        storage.get_all_events(child_id=f"child{rnd.randrange(CHILDREN)}")
+                        storage.get_stats_groups()
+            except Exception:
+                errors.append(traceback.format_exc())
+
+        writers = [threading.Thread(target=write, args=(n,)) for n in range(WRITERS)]
+        readers = [threading.Thread(target=read, args=(n,)) for n in range(READERS)]
+        for t in writers + readers:
+            t.start()
+        for t in writers:
+            t.join()
+        done.set()
+        for t in readers:
+            t.join()
+        self.assertEqual(errors, [])
+
+        ops = sum(succeeded)
+        self.assertGreater(ops, 0)
+        events = storage._read_json_any("events")
+        self.assertEqual(len(events), ops)
+        self.assertEqual(sorted(e["seq"] for e in events), list(range(1, ops + 1)))
+        sums = {}
+        for e in events:
+            sums[e["childId"]] = sums.get(e["childId"], 0) + e["credited"]
+        balances = {c["id"]: c["balance"] for c in storage._read_json_any("children")}
+        self.assertEqual(balances, {f"child{i}": sums.get(f"child{i}", 0) for i in range(CHILDREN)})
+        for key, name, build in storage._WARM_INDEXES:
+            with self.subTest(index=f"{key}/{name}"):
+                index = storage._cached_index(key, name, build)
+                fresh = build(storage._read_json_any(key))
+                self.assertEqual(getattr(index, "__dict__", index), getattr(fresh, "__dict__", fresh))
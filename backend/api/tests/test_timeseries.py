@@ -0,0 +1,24 @@
+"""Границы периода /admin/stats/timeseries."""
+from .base import StorageTestCase
+
+
+class TimeseriesBoundsTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login_admin()
+
+    def test_year_of_days(self):
+        response = self.client.get("/api/v1/admin/stats/timeseries", {"from": "2025-01-01", "to": "2025-12-31"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["series"]), 365)
+
+    def test_too_many_buckets_rejected(self):
+        response = self.client.get("/api/v1/admin/stats/timeseries", {"from": "0001-01-01", "to": "2025-12-31"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Слишком длинный период", response.json()["error"])
+
+    def test_long_range_by_weeks(self):
+        response = self.client.get("/api/v1/admin/stats/timeseries", {"from": "2020-01-01", "to": "2025-12-31", "bucket": "week"})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/api/v1/admin/stats/timeseries", {"from": "2020-01-01", "to": "2025-12-31"})
+        self.assertEqual(response.status_code, 400)
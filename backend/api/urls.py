@@ -1,26 +1,43 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if getattr(settings, "API_ASYNC", False):
+    # ASGI: «горячие» представления в async-варианте (см. api/async_views.py)
+    from . import async_views as hot_views
+else:
+    hot_views = views
+
 urlpatterns = [
     path("csrf-set", views.csrf_set),
     path("groups", views.groups_list),
-    path("children", views.children_list),
+    path("children", hot_views.children_list),
+    path("children/changes", views.children_changes),
+    path("kiosk/bootstrap", views.kiosk_bootstrap),
     path("game/actions", views.game_actions),
-    path("game/interaction", views.game_interaction),
+    path("game/interaction", hot_views.game_interaction),
+    path("leaderboard", views.leaderboard),
     path("admin/login", views.admin_login),
     path("admin/logout", views.admin_logout),
     path("admin/me", views.admin_me),
-    path("admin/stats/groups", views.admin_stats_groups),
-    path("admin/stats/children", views.admin_stats_children),
+    path("admin/dashboard", views.admin_dashboard),
+    path("admin/stats/groups", hot_views.admin_stats_groups),
+    path("admin/stats/children", hot_views.admin_stats_children),
+    path("admin/stats/timeseries", views.admin_stats_timeseries),
     path("admin/events", views.admin_events),
     path("admin/monthly-results", views.admin_monthly_results),
-    path("admin/monthly-stats", views.admin_monthly_stats),
+    path("admin/monthly-stats", hot_views.admin_monthly_stats),
     path("admin/child/<str:id>/events", views.admin_child_events),
+    path("admin/snapshots", views.admin_snapshots),
+    path("admin/snapshots/<str:name>", views.admin_snapshot_download),
+    path("admin/ratelimit", views.admin_ratelimit),
     path("admin/child/<str:id>/balance-adjust", views.admin_balance_adjust),
     path("admin/groups", views.admin_groups_list),
     path("admin/group/create", views.admin_group_create),
+    path("admin/group/<str:id>/balance-adjust", views.admin_group_balance_adjust),
     path("admin/group/<str:id>", views.admin_group_detail),
     path("admin/children/create", views.admin_child_create),
+    path("admin/children/import", views.admin_children_import),
     path("admin/child/<str:id>/update", views.admin_child_update),
     path("admin/child/<str:id>/delete", views.admin_child_delete),
 ]
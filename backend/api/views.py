@@ -1,12 +1,28 @@
+import functools
+import hashlib
+import json
+import re
+from datetime import date
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.authentication import SessionAuthentication
 from django.contrib.auth import authenticate, login, logout
+from django.http import FileResponse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import ensure_csrf_cookie
 
-from core import storage
+from core import backup, ratelimit, storage
+from core.replication import replica_reads
+
+# Отставание реплики в секундах, если отчёт построен по ней
+REPLICA_STALENESS_HEADER = "X-Replica-Staleness"
+
+RATE_LIMITED = {"success": False, "reason": "rate_limited"}
+INVALID_IDEMPOTENCY_KEY = {"success": False, "reason": "invalid idempotency key"}
+IDEMPOTENCY_KEY_RE = re.compile(r"^[\x21-\x7e]{1,128}$")
 
 
 def _educator_group_id(request):
@@ -16,6 +32,74 @@ def _educator_group_id(request):
     return None
 
 
+def _idempotency_key(request, data):
+    """Ключ идемпотентности начисления: заголовок Idempotency-Key или поле requestId. None — не передан, "" — недопустимый."""
+    key = request.headers.get("Idempotency-Key") or data.get("requestId")
+    if key is None or key == "":
+        return None
+    key = str(key)
+    return key if IDEMPOTENCY_KEY_RE.match(key) else ""
+
+
+def _children_payload(children):
+    return [{"id": c["id"], "fullName": c.get("fullName", ""), "groupId": c.get("groupId"), "balance": c.get("balance", 0), "avatar": c.get("avatar")} for c in children]
+
+
+# Поля ребёнка, которые киоск может запросить в /kiosk/bootstrap?fields= (id передаётся всегда)
+KIOSK_CHILD_FIELDS = ("id", "fullName", "groupId", "balance", "avatar")
+
+
+def _stats_groups_data(params, educator_group):
+    """Данные для /admin/stats/groups (общие для sync- и async-представлений)."""
+    data = storage.get_stats_groups(from_date=params.get("from"), to_date=params.get("to"))
+    if educator_group:
+        data = [g for g in data if g.get("groupId") == educator_group]
+    return data
+
+
+def _stats_children_data(params, educator_group):
+    """Данные для /admin/stats/children (общие для sync- и async-представлений)."""
+    return storage.get_stats_children(
+        group_id=educator_group or params.get("groupId"),
+        q=params.get("q"),
+        from_date=params.get("from"),
+        to_date=params.get("to"),
+    )
+
+
+def _monthly_stats_args(params, educator_group):
+    """Разобрать year/month/group_id для /admin/monthly-stats. Возвращает (year, month, group_id) или None."""
+    group_id = params.get("group_id") or educator_group
+    try:
+        year = int(params.get("year", 0))
+        month = int(params.get("month", 0))
+    except (TypeError, ValueError):
+        year = month = 0
+    if not year or not month or month < 1 or month > 12:
+        return None
+    return year, month, group_id or None
+
+
+MONTHLY_STATS_ARGS_ERROR = {"error": "Нужны параметры year и month (1–12)"}
+
+
+def _on_replica(fn, *args, **kwargs):
+    """Вызвать функцию чтения на реплике (если она настроена и свежая). Возвращает (результат, отставание или None)."""
+    with replica_reads() as staleness:
+        return fn(*args, **kwargs), staleness
+
+
+def _replica_read(view):
+    """Отчёт только читает данные: выполнить его на реплике, отставание реплики — в заголовке ответа."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response, staleness = _on_replica(view, request, *args, **kwargs)
+        if staleness is not None:
+            response[REPLICA_STALENESS_HEADER] = f"{staleness:.1f}"
+        return response
+    return wrapper
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 @ensure_csrf_cookie
@@ -36,8 +120,69 @@ def groups_list(request):
 @permission_classes([AllowAny])
 def children_list(request):
     """GET /api/v1/children — список детей (id, fullName, groupId, balance)."""
-    children = storage.get_children()
-    return Response([{"id": c["id"], "fullName": c.get("fullName", ""), "groupId": c.get("groupId"), "balance": c.get("balance", 0), "avatar": c.get("avatar")} for c in children])
+    return Response(_children_payload(storage.get_children()))
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def children_changes(request):
+    """
+    GET /api/v1/children/changes?since=<seq>&groupId=... — дети, изменённые после since:
+    {"seq", "full", "children", "removed"}. Без since, после сброса месяца или если журнал уже обрезан —
+    полный список ("full": true). Киоск хранит seq из ответа и передаёт его в следующий запрос.
+    """
+    since = request.query_params.get("since")
+    if since not in (None, ""):
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            return Response({"error": "since должен быть неотрицательным целым"}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        since = None
+    data = storage.get_children_changes(since=since, group_id=request.query_params.get("groupId") or None)
+    return Response({**data, "children": _children_payload(data["children"])})
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def kiosk_bootstrap(request):
+    """
+    GET /api/v1/kiosk/bootstrap?groupId=...&fields=id,fullName,balance — старт киоска одним запросом:
+    {"group", "children" (только дети группы, только поля fields), "actions", "seq"}.
+    seq — для последующих /children/changes?since=. Ответ с ETag: без изменений — 304 без тела.
+    """
+    group_id = request.query_params.get("groupId")
+    if not group_id:
+        return Response({"error": "Нужен параметр groupId"}, status=status.HTTP_400_BAD_REQUEST)
+    fields = request.query_params.get("fields")
+    fields = [f for f in fields.split(",") if f] if fields else list(KIOSK_CHILD_FIELDS)
+    unknown = [f for f in fields if f not in KIOSK_CHILD_FIELDS]
+    if unknown:
+        return Response(
+            {"error": f"Неизвестные поля: {', '.join(unknown)}. Допустимые: {', '.join(KIOSK_CHILD_FIELDS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    data = storage.get_kiosk_bootstrap(group_id)
+    if data is None:
+        return Response({"error": "Группа не найдена"}, status=status.HTTP_404_NOT_FOUND)
+    fields = ["id"] + [f for f in fields if f != "id"]
+    data = {
+        "group": {"id": data["group"]["id"], "name": data["group"].get("name", data["group"]["id"])},
+        "children": [{f: c[f] for f in fields} for c in _children_payload(data["children"])],
+        "actions": data["actions"],
+        "seq": data["seq"],
+    }
+    # seq меняется с любым изменением любого ребёнка — в ETag только содержимое для этой группы;
+    # с закэшированным старым seq киоск просто получит в /children/changes чуть больше изменений
+    raw = json.dumps({**data, "seq": None}, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(raw).hexdigest()[:20]
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    response = Response(status=status.HTTP_304_NOT_MODIFIED) if etag in etags or "*" in etags else Response(data)
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
 
 
 @api_view(["GET"])
@@ -51,15 +196,37 @@ def game_actions(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def game_interaction(request):
-    """POST /api/v1/game/interaction — взаимодействие: body { childId, actionId }."""
+    """POST /api/v1/game/interaction — взаимодействие: body { childId, actionId, requestId? } (или заголовок Idempotency-Key)."""
     child_id = request.data.get("childId")
     action_id = request.data.get("actionId")
     if not child_id or not action_id:
         return Response({"success": False, "reason": "childId and actionId required"}, status=status.HTTP_400_BAD_REQUEST)
-    result = storage.process_interaction(child_id, action_id)
+    idempotency_key = _idempotency_key(request, request.data)
+    if idempotency_key == "":
+        return Response(INVALID_IDEMPOTENCY_KEY, status=status.HTTP_400_BAD_REQUEST)
+    # Повтор уже выполненного запроса получает сохранённый ответ и не тратит токены лимитера
+    replay = storage.get_idempotent_result(idempotency_key, child_id, action_id) if idempotency_key else None
+    if replay is not None:
+        return Response(replay)
+    retry_after = ratelimit.admit(ratelimit.client_key(request), child_id)
+    if retry_after:
+        return Response(RATE_LIMITED, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(retry_after)})
+    result = storage.process_interaction(child_id, action_id, idempotency_key=idempotency_key)
     return Response(result)
 
 
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def leaderboard(request):
+    """GET /api/v1/leaderboard?groupId=...&limit=10 — рейтинг детей по балансу (группа или весь сад)."""
+    try:
+        limit = int(request.query_params.get("limit", 10))
+    except (TypeError, ValueError):
+        return Response({"error": "limit must be integer"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, 100))
+    return Response(storage.get_leaderboard(group_id=request.query_params.get("groupId") or None, limit=limit))
+
+
 # --- Admin (session auth) ---
 
 @api_view(["POST"])
@@ -102,33 +269,78 @@ def admin_me(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
+def admin_dashboard(request):
+    """
+    GET /api/v1/admin/dashboard?from=...&to=...&groupId=...&q=... — всё для открытия админки одним запросом:
+    me, groups, statsGroups, statsChildren, monthlyResults (как отдельные эндпоинты, с теми же правами воспитателя).
+    """
+    educator_group = _educator_group_id(request)
+    params = request.query_params
+    data = storage.get_dashboard(
+        from_date=params.get("from"),
+        to_date=params.get("to"),
+        group_id=educator_group or params.get("groupId") or None,
+        q=params.get("q"),
+        scope_group=educator_group,
+    )
+    me = {"role": request.session.get("role") or "admin", "group_id": request.session.get("group_id") or None}
+    return Response({"me": me, **data})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_stats_groups(request):
     """GET /api/v1/admin/stats/groups?from=...&to=..."""
-    from_date = request.query_params.get("from")
-    to_date = request.query_params.get("to")
-    data = storage.get_stats_groups(from_date=from_date, to_date=to_date)
-    group_id = _educator_group_id(request)
-    if group_id:
-        data = [g for g in data if g.get("groupId") == group_id]
-    return Response(data)
+    return Response(_stats_groups_data(request.query_params, _educator_group_id(request)))
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_stats_children(request):
     """GET /api/v1/admin/stats/children?groupId=...&q=...&from=...&to=..."""
-    group_id = _educator_group_id(request) or request.query_params.get("groupId")
-    q = request.query_params.get("q")
-    from_date = request.query_params.get("from")
-    to_date = request.query_params.get("to")
-    data = storage.get_stats_children(group_id=group_id, q=q, from_date=from_date, to_date=to_date)
+    return Response(_stats_children_data(request.query_params, _educator_group_id(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+@_replica_read
+def admin_stats_timeseries(request):
+    """GET /api/v1/admin/stats/timeseries?from=...&to=...&groupId=...&actionId=...&bucket=day|week —
+    монеты и число действий по дням/неделям."""
+    bucket = request.query_params.get("bucket") or "day"
+    if bucket not in ("day", "week"):
+        return Response({"error": "bucket must be day or week"}, status=status.HTTP_400_BAD_REQUEST)
+    from_date = request.query_params.get("from") or None
+    to_date = request.query_params.get("to") or None
+    try:
+        for d in (from_date, to_date):
+            if d:
+                date.fromisoformat(d)
+    except ValueError:
+        return Response({"error": "from/to must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        data = storage.get_stats_timeseries(
+            from_date=from_date,
+            to_date=to_date,
+            group_id=_educator_group_id(request) or request.query_params.get("groupId"),
+            action_id=request.query_params.get("actionId"),
+            bucket=bucket,
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(data)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_child_events(request, id):
     """GET /api/v1/admin/child/:id/events?from=...&to=... Воспитатель — только дети своей группы."""
     educator_group = _educator_group_id(request)
@@ -167,9 +379,34 @@ def admin_balance_adjust(request, id):
     return Response({"new_balance": new_balance})
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+def admin_group_balance_adjust(request, id):
+    """POST /api/v1/admin/group/:id/balance-adjust — body { delta, comment }: корректировка всем детям группы.
+    Воспитатель — только своей группе."""
+    group_id = _educator_group_id(request)
+    if group_id and id != group_id:
+        return Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    delta = request.data.get("delta")
+    comment = request.data.get("comment", "")
+    if delta is None:
+        return Response({"error": "delta required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        delta = int(delta)
+    except (TypeError, ValueError):
+        return Response({"error": "delta must be integer"}, status=status.HTTP_400_BAD_REQUEST)
+    admin_username = request.session.get("admin_username") or getattr(request.user, "username", "")
+    result = storage.adjust_group_balance(id, delta, comment, admin_username)
+    if result is None:
+        return Response({"error": "group not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"children": result})
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_events(request):
     """GET /api/v1/admin/events?groupId=...&childId=...&from=...&to=..."""
     group_id = _educator_group_id(request) or request.query_params.get("groupId")
@@ -183,6 +420,7 @@ def admin_events(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_monthly_results(request):
     """GET /api/v1/admin/monthly-results?group_id=... — итоги по месяцам (после сброса баланса)."""
     group_id = request.GET.get("group_id") or _educator_group_id(request)
@@ -193,23 +431,63 @@ def admin_monthly_results(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
+@_replica_read
 def admin_monthly_stats(request):
     """GET /api/v1/admin/monthly-stats?year=2025&month=10&group_id=... — расширенная статистика за месяц."""
-    group_id = request.GET.get("group_id") or _educator_group_id(request)
-    try:
-        year = int(request.GET.get("year", 0))
-        month = int(request.GET.get("month", 0))
-    except (TypeError, ValueError):
-        year = month = 0
-    if not year or not month or month < 1 or month > 12:
-        return Response(
-            {"error": "Нужны параметры year и month (1–12)"},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    data = storage.get_monthly_stats(year=year, month=month, group_id=group_id or None)
+    args = _monthly_stats_args(request.GET, _educator_group_id(request))
+    if args is None:
+        return Response(MONTHLY_STATS_ARGS_ERROR, status=status.HTTP_400_BAD_REQUEST)
+    year, month, group_id = args
+    data = storage.get_monthly_stats(year=year, month=month, group_id=group_id)
     return Response(data)
 
 
+# --- Снимки хранилища (только администратор) ---
+
+SNAPSHOT_NAME_RE = re.compile(r"^snapshot-[0-9-]+\.tar\.gz$")
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+def admin_snapshots(request):
+    """GET /api/v1/admin/snapshots — список снимков; POST — снять согласованный снимок хранилища (запись не останавливается)."""
+    if request.session.get("role") == "educator":
+        return Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    if request.method == "GET":
+        return Response(backup.list_snapshots())
+    path, manifest = backup.create_snapshot()
+    return Response({
+        "name": path.name,
+        "size": path.stat().st_size,
+        "created": manifest["created"],
+        "problems": manifest["problems"],
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+def admin_snapshot_download(request, name):
+    """GET /api/v1/admin/snapshots/:name — скачать архив снимка."""
+    if request.session.get("role") == "educator":
+        return Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    path = backup.snapshot_dir() / name
+    if not SNAPSHOT_NAME_RE.match(name) or not path.is_file():
+        return Response({"error": "snapshot not found"}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+def admin_ratelimit(request):
+    """GET /api/v1/admin/ratelimit — счётчики ограничения начислений (пропущено и отклонено по клиенту/ребёнку)."""
+    if request.session.get("role") == "educator":
+        return Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    return Response(ratelimit.metrics())
+
+
 # --- CRUD групп ---
 
 @api_view(["GET"])
@@ -279,6 +557,28 @@ def admin_child_create(request):
     return Response({"error": "invalid group"}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SessionAuthentication])
+def admin_children_import(request):
+    """POST /api/v1/admin/children/import — массовый импорт детей из CSV (ФИО; группа).
+    Файл в поле file (multipart) или текст в поле csv. Недостающие группы создаются. Воспитателю запрещено."""
+    if _educator_group_id(request):
+        return Response({"error": "forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    upload = request.FILES.get("file")
+    if upload is not None:
+        try:
+            text = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return Response({"error": "Файл должен быть в кодировке UTF-8"}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        text = request.data.get("csv") or ""
+    result = storage.import_children(storage.parse_children_csv(text))
+    if result.get("errors"):
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_201_CREATED)
+
+
 @api_view(["PUT", "PATCH"])
 @permission_classes([IsAuthenticated])
 @authentication_classes([SessionAuthentication])
@@ -0,0 +1,11 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# Под ASGI «горячие» представления API работают в async-варианте
+os.environ.setdefault("API_ASYNC", "1")
+application = get_asgi_application()
+
+from core import storage_client  # noqa: E402 — после django.setup() в get_asgi_application
+
+storage_client.startup()
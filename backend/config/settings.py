@@ -25,18 +25,60 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.AsyncWhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.TenantMiddleware",
+    "core.middleware.StorageSnapshotMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+# Async-варианты представлений API (включается автоматически в config/asgi.py)
+API_ASYNC = os.environ.get("API_ASYNC", "0") == "1"
+# Размер пула потоков для блокирующих вызовов хранилища из async-представлений
+STORAGE_THREADS = int(os.environ.get("STORAGE_THREADS", "8"))
+# Строить индексы хранилища при старте сервера (core.storage_client.startup)
+STORAGE_WARM_ON_STARTUP = os.environ.get("STORAGE_WARM", "1") == "1"
+# Мультитенантный режим: "" — один детский сад в DATA_DIR; "host" — тенант по поддомену
+# (sad1.example.ru → TENANTS_DIR/sad1); "prefix" — по префиксу URL (/t/sad1/api/v1/...)
+TENANT_MODE = os.environ.get("TENANT_MODE", "")
+TENANTS_DIR = Path(os.environ.get("TENANTS_DIR", str(DATA_DIR / "tenants")))
+# Сколько тенантов держат индексы в памяти процесса (остальные вытесняются по давности обращения)
+TENANT_CACHE_SIZE = int(os.environ.get("TENANT_CACHE_SIZE", "100"))
+# Сервер хранилища (manage.py storage_server): если задан Unix-сокет, воркеры не читают файлы сами,
+# а вызывают функции core.storage в процессе сервера (core.storage_client)
+STORAGE_SOCKET = os.environ.get("STORAGE_SOCKET", "")
+STORAGE_SOCKET_TIMEOUT = float(os.environ.get("STORAGE_SOCKET_TIMEOUT", "30"))
+# Реплика для админских отчётов (core.replication): основной экземпляр пишет журнал изменений
+# (STORAGE_CHANGELOG=1), команда replicate применяет его к REPLICA_DATA_DIR; отчёты читаются с реплики,
+# пока она отстаёт не больше REPLICA_MAX_STALENESS секунд
+STORAGE_CHANGELOG = os.environ.get("STORAGE_CHANGELOG", "0") == "1"
+REPLICA_DATA_DIR = os.environ.get("REPLICA_DATA_DIR", "")
+REPLICA_MAX_STALENESS = float(os.environ.get("REPLICA_MAX_STALENESS", "30"))
+# Каталог снимков хранилища (manage.py snapshot, /admin/snapshots); по умолчанию DATA_DIR/snapshots
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+# Ограничение частоты начислений (core.ratelimit): вёдра токенов по клиенту (киоску) и по ребёнку,
+# общие для всех воркеров; лишние запросы получают 429 с Retry-After до обращения к хранилищу
+RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "1") == "1"
+RATELIMIT_CLIENT_BURST = int(os.environ.get("RATELIMIT_CLIENT_BURST", "20"))
+RATELIMIT_CLIENT_RATE = float(os.environ.get("RATELIMIT_CLIENT_RATE", "5"))
+RATELIMIT_CHILD_BURST = int(os.environ.get("RATELIMIT_CHILD_BURST", "5"))
+RATELIMIT_CHILD_RATE = float(os.environ.get("RATELIMIT_CHILD_RATE", "0.5"))
+# Ключ request.META с адресом клиента за прокси (например HTTP_X_REAL_IP); пусто — REMOTE_ADDR
+RATELIMIT_CLIENT_HEADER = os.environ.get("RATELIMIT_CLIENT_HEADER", "")
+RATELIMIT_SHM_PATH = os.environ.get("RATELIMIT_SHM_PATH", "")
+# Ключи идемпотентности начислений (Idempotency-Key / requestId): сколько секунд и сколько последних ключей помнить
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "5000"))
+# Журнал изменений детей для /children/changes: сколько последних изменений помнить
+CHILD_CHANGES_MAX = int(os.environ.get("CHILD_CHANGES_MAX", "2000"))
 
 DATABASES = {
     "default": {
@@ -45,6 +87,22 @@ DATABASES = {
     }
 }
 
+# Кэш отчётов админки (core.storage._report_cache): ключи привязаны к версиям файлов, поэтому срок жизни не нужен.
+# По умолчанию LRU в памяти процесса; STATS_CACHE_DIR — файловый кэш, общий для всех воркеров.
+STATS_CACHE_DIR = os.environ.get("STATS_CACHE_DIR", "")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "stats": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache" if STATS_CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": STATS_CACHE_DIR or "stats",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("STATS_CACHE_MAX_ENTRIES", "256"))},
+    },
+}
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -74,6 +132,13 @@ USE_I18N = True
 USE_TZ = True
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# Сжатые копии статики (.gz, .br) создаются при сборке образа (python -m whitenoise.compress) или collectstatic,
+# WhiteNoise отдаёт их по Accept-Encoding. Файлы сборки Vite с хешем в имени кэшируются навсегда (immutable).
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedStaticFilesStorage"},
+}
+WHITENOISE_IMMUTABLE_FILE_TEST = r"^/static/(assets/.+-[A-Za-z0-9_-]{8}|workbox-[0-9a-f]{8})\.[a-z0-9]+$"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CORS_ALLOW_CREDENTIALS = True
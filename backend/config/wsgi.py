@@ -3,3 +3,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 application = get_wsgi_application()
+
+from core import storage_client  # noqa: E402 — после django.setup() в get_wsgi_application
+
+storage_client.startup()
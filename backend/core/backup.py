@@ -0,0 +1,206 @@
+"""
+Согласованные снимки хранилища (резервные копии) без остановки записи.
+
+Файлы хранилища пишутся атомарно (новый файл + os.replace), поэтому достаточно под блокировкой
+хранилища открыть все файлы разом: открытые дескрипторы указывают на одно поколение данных,
+даже если сразу после снятия блокировки киоск запишет новое. Чтение, проверка и сжатие
+выполняются уже без блокировки — process_interaction ждёт только открытия файлов.
+"""
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+from core import replication, storage
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_SUFFIX = ".tar.gz"
+LEGACY_MONTHLY_KEY = "legacy_monthly_results"
+
+
+def snapshot_dir():
+    """Каталог снимков текущего тенанта: SNAPSHOT_DIR (для тенантов — SNAPSHOT_DIR/tenants/<имя>) или DATA_DIR/snapshots."""
+    root = getattr(settings, "SNAPSHOT_DIR", "")
+    if not root:
+        return storage.current_data_dir() / "snapshots"
+    name = storage.current_tenant()
+    return Path(root) / "tenants" / name if name else Path(root)
+
+
+def capture():
+    """
+    Согласованное содержимое всех файлов хранилища: ({ключ: bytes}, позиция журнала изменений или None).
+    Блокировка держится только на время открытия файлов.
+    """
+    handles = {}
+    with storage._storage_lock():
+        for key, path in storage._current_tenant.get().storage_files().items():
+            try:
+                handles[key] = open(path, "rb")
+            except FileNotFoundError:
+                pass
+        lsn = replication.log_end(storage.current_data_dir()) if storage._current_tenant.get().changelog else None
+    raw = {}
+    for key, f in handles.items():
+        with f:
+            raw[key] = f.read()
+    return raw, lsn
+
+
+def _parse(raw):
+    return {key: json.loads(content) if content.strip() else None for key, content in raw.items()}
+
+
+def verify(data):
+    """
+    Сверить балансы с журналом событий. Баланс ребёнка должен совпадать с balanceAfter
+    его последнего события с начала текущего периода (месяца последнего сброса),
+    без событий — быть нулём. События неизвестных детей (не удалённых) тоже считаются ошибкой.
+    Возвращает список проблем (пустой — всё сходится).
+    """
+    problems = []
+    children = data.get("children") or []
+    events = data.get("events") or []
+    deleted = {t.get("childId") for t in data.get("tombstones") or []}
+    last = data.get("last_month_reset") or {}
+    period_start = ""
+    if isinstance(last, dict) and last.get("year") and last.get("month"):
+        period_start = f"{last['year']:04d}-{last['month']:02d}-01"
+    known = {c["id"] for c in children}
+    latest = {}
+    credited = {}
+    orphans = {}
+    for e in events:
+        child_id = e.get("childId")
+        if child_id not in known:
+            if child_id not in deleted:
+                orphans[child_id] = orphans.get(child_id, 0) + 1
+            continue
+        if (e.get("timestamp") or "") < period_start:
+            continue
+        credited[child_id] = credited.get(child_id, 0) + (e.get("credited") or 0)
+        if "balanceAfter" in e:
+            latest[child_id] = e["balanceAfter"]
+    for c in children:
+        balance = c.get("balance", 0)
+        expected = latest.get(c["id"], credited.get(c["id"], 0))
+        if balance != expected:
+            problems.append({"type": "balance", "childId": c["id"], "balance": balance, "expected": expected})
+    for child_id, count in orphans.items():
+        problems.append({"type": "orphan_events", "childId": child_id, "count": count})
+    return problems
+
+
+def verify_current():
+    """Проверить текущее хранилище по согласованному срезу (без архива)."""
+    raw, _ = capture()
+    return verify(_parse(raw))
+
+
+def create_snapshot(output_dir=None, check=True):
+    """
+    Снять согласованный снимок в архив <каталог>/snapshot-<время>.tar.gz: файлы хранилища как есть
+    и manifest.json (время, позиция журнала, sha256 и размеры файлов, результат проверки).
+    Возвращает (путь, манифест).
+    """
+    raw, lsn = capture()
+    created = datetime.now()
+    problems = verify(_parse(raw)) if check else None
+    manifest = {
+        "created": created.isoformat(),
+        "tenant": storage.current_tenant(),
+        "lsn": lsn,
+        "files": {
+            storage.file_name(key): {"sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+            for key, content in raw.items()
+        },
+        "problems": problems,
+    }
+    output_dir = Path(output_dir or snapshot_dir())
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"snapshot-{created:%Y%m%d-%H%M%S}-{created.microsecond // 1000:03d}{SNAPSHOT_SUFFIX}"
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    mtime = time.time()
+    with tarfile.open(tmp_path, "w:gz", compresslevel=6) as tar:
+        entries = [(storage.file_name(key), content) for key, content in raw.items()]
+        entries.append((MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")))
+        for name, content in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mtime = mtime
+            tar.addfile(info, io.BytesIO(content))
+    os.replace(tmp_path, path)
+    return path, manifest
+
+
+def list_snapshots():
+    """Снимки текущего тенанта, новые первыми: [{"name", "size", "created"}]."""
+    directory = snapshot_dir()
+    if not directory.is_dir():
+        return []
+    result = []
+    for p in sorted(directory.glob(f"snapshot-*{SNAPSHOT_SUFFIX}"), reverse=True):
+        st = p.stat()
+        result.append({"name": p.name, "size": st.st_size, "created": datetime.fromtimestamp(st.st_mtime).isoformat()})
+    return result
+
+
+def read_snapshot(path):
+    """
+    Прочитать архив снимка и проверить контрольные суммы. Возвращает (манифест, {ключ: данные}); ValueError — если архив повреждён.
+    Итоги месяцев из снимков прежнего формата (monthly_results.json) отдаются под ключом LEGACY_MONTHLY_KEY.
+    """
+    raw = {}
+    try:
+        with tarfile.open(path, "r:gz") as tar:
+            manifest = json.loads(tar.extractfile(MANIFEST_NAME).read())
+            for fname, meta in manifest["files"].items():
+                content = tar.extractfile(fname).read()
+                if hashlib.sha256(content).hexdigest() != meta["sha256"]:
+                    raise ValueError(f"контрольная сумма {fname} не совпадает")
+                key = LEGACY_MONTHLY_KEY if fname == storage.LEGACY_MONTHLY_RESULTS else storage.key_for_file_name(fname)
+                if key:
+                    raw[key] = content
+    except (OSError, KeyError, tarfile.TarError, json.JSONDecodeError) as e:
+        raise ValueError(f"архив снимка повреждён: {e}")
+    return manifest, _parse(raw)
+
+
+def restore_snapshot(path, force=False):
+    """
+    Восстановить хранилище из снимка одной транзакцией (индексы и реплика обновятся как при обычной записи).
+    Перед восстановлением снимок проверяется: при проблемах и без force ничего не меняется.
+    Счётчик номеров событий не уменьшается, чтобы новые события не повторили уже выданные id.
+    Итоги месяцев из снимка прежнего формата переносятся в индекс и файлы по группам.
+    Возвращает (манифест, проблемы, восстановлено ли).
+    """
+    manifest, data = read_snapshot(path)
+    problems = verify(data)
+    if problems and not force:
+        return manifest, problems, False
+    legacy_months = data.pop(LEGACY_MONTHLY_KEY, None)
+    with storage.transaction():
+        for key in list(storage.FILE_NAMES) + [k for k in data if k not in storage.FILE_NAMES]:
+            if key == "event_seq":
+                continue
+            if key in data and data[key] is not None:
+                storage._write_json(key, data[key])
+            elif key in ("tombstones", "monthly_index"):
+                storage._write_json(key, [])
+        for row in legacy_months or []:
+            storage._save_month(row["year"], row["month"], row.get("children") or [])
+        current = storage._load_json_any("event_seq") or {}
+        saved = data.get("event_seq") or {}
+        seq = max(
+            current.get("seq", 0) if isinstance(current, dict) else 0,
+            saved.get("seq", 0) if isinstance(saved, dict) else 0,
+            storage._max_event_seq(data.get("events") or []),
+        )
+        storage._write_json("event_seq", {"seq": seq})
+    return manifest, problems, True
@@ -0,0 +1,24 @@
+"""
+Ограниченный пул потоков для блокирующих вызовов хранилища из async-кода (ASGI).
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "STORAGE_THREADS", 8),
+    thread_name_prefix="storage",
+)
+
+
+async def run_storage(fn, *args, **kwargs):
+    """
+    Выполнить блокирующую функцию хранилища в пуле потоков, не занимая event loop.
+    Контекст (в т.ч. открытый снимок хранилища запроса) передаётся в поток.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, fn, *args, **kwargs))
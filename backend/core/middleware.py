@@ -0,0 +1,148 @@
+"""
+Middleware уровня хранилища.
+"""
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from core import storage
+from core.executor import run_storage
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, поддерживающий async-цепочку ASGI: иначе Django оборачивает sync-middleware
+    и каждый запрос к API проходит через отдельный поток.
+    Поиск файла — словарь в памяти, отдача файла выполняется вне event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+TENANT_PREFIX_RE = re.compile(r"^/t/([a-z0-9][a-z0-9-]*)(?=/|$)")
+
+
+async def _anonymous_user():
+    return AnonymousUser()
+
+
+class TenantMiddleware:
+    """
+    Выбирает каталог данных детского сада (тенант) на время запроса: по поддомену (TENANT_MODE=host)
+    или по префиксу URL /t/<имя>/ (TENANT_MODE=prefix, префикс убирается из path_info).
+    Сессия привязана к тенанту, в котором выполнен вход: в чужом тенанте пользователь анонимен.
+    При пустом TENANT_MODE не подключается.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "TENANT_MODE", "")
+        if not self.mode:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _resolve(self, request):
+        if self.mode == "host":
+            name = request.get_host().split(":")[0].split(".")[0].lower()
+        else:
+            m = TENANT_PREFIX_RE.match(request.path_info)
+            if not m:
+                return None
+            name = m.group(1)
+            request.path_info = request.path_info[m.end():] or "/"
+        tenant = storage.get_tenant(name)
+        if tenant is not None and "admin_username" in request.session and request.session.get("tenant") != tenant.name:
+            request.user = AnonymousUser()
+            request.auser = _anonymous_user
+        return tenant
+
+    @staticmethod
+    def _not_found():
+        return JsonResponse({"detail": "Детский сад не найден."}, status=404, json_dumps_params={"ensure_ascii": False})
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        tenant = self._resolve(request)
+        if tenant is None:
+            return self._not_found()
+        with storage.use_tenant(tenant):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        tenant = self._resolve(request)
+        if tenant is None:
+            return self._not_found()
+        with storage.use_tenant(tenant):
+            return await self.get_response(request)
+
+
+class StorageSnapshotMiddleware:
+    """
+    Открывает снимок хранилища (storage.snapshot) на время запроса к API:
+    каждый JSON-файл читается не больше одного раза, изменения пишутся на диск один раз в конце.
+    При ответе 5xx несохранённые изменения отбрасываются.
+    Работает и под WSGI, и под ASGI (в async-режиме запись выполняется в пуле потоков хранилища).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not request.path_info.startswith("/api/"):
+            return self.get_response(request)
+        with storage.snapshot() as snap:
+            response = self.get_response(request)
+            if response.status_code >= 500:
+                snap.discard()
+        return response
+
+    async def __acall__(self, request):
+        if not request.path_info.startswith("/api/"):
+            return await self.get_response(request)
+        with storage.snapshot(autoflush=False) as snap:
+            response = await self.get_response(request)
+            if response.status_code >= 500:
+                snap.discard()
+        if snap.dirty:
+            await run_storage(snap.flush)
+        return response
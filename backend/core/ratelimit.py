@@ -0,0 +1,146 @@
+"""
+Ограничение частоты начислений (token bucket) до обращения к хранилищу.
+
+Вёдра по клиенту (киоск: адрес или заголовок от прокси) и по ребёнку лежат в общем для всех
+воркеров сегменте памяти (mmap файла в /dev/shm): хеш-таблица на RATELIMIT_SLOTS ячеек,
+при коллизии ячейка переходит новому ключу с полным ведром. Там же счётчики пропущенных
+и отклонённых запросов (metrics()).
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from core import storage
+
+ENABLED = getattr(settings, "RATELIMIT_ENABLED", True)
+SLOTS = getattr(settings, "RATELIMIT_SLOTS", 4096)
+# (ёмкость ведра, пополнение в токенах в секунду)
+CLIENT_BUCKET = (getattr(settings, "RATELIMIT_CLIENT_BURST", 20), getattr(settings, "RATELIMIT_CLIENT_RATE", 5.0))
+CHILD_BUCKET = (getattr(settings, "RATELIMIT_CHILD_BURST", 5), getattr(settings, "RATELIMIT_CHILD_RATE", 0.5))
+# Ключ META с адресом клиента от доверенного прокси (например HTTP_X_REAL_IP); пусто — REMOTE_ADDR
+CLIENT_HEADER = getattr(settings, "RATELIMIT_CLIENT_HEADER", "")
+
+_HEADER = struct.Struct("<8sQQQ")  # магия; пропущено; отклонено по клиенту; отклонено по ребёнку
+_SLOT = struct.Struct("<Qdd")  # хеш ключа; токены; время последнего пополнения (monotonic, общее для процессов)
+_MAGIC = b"DSRATE01"
+
+_segment = None
+_segment_lock = threading.Lock()
+
+
+def _segment_path():
+    path = getattr(settings, "RATELIMIT_SHM_PATH", "")
+    if path:
+        return Path(path)
+    tag = hashlib.sha1(str(storage.DATA_DIR).encode("utf-8")).hexdigest()[:12]
+    shm = Path("/dev/shm")
+    return shm / f"detsad-ratelimit-{tag}" if shm.is_dir() else storage.DATA_DIR / ".ratelimit"
+
+
+class _Segment:
+    """Общий сегмент: заголовок со счётчиками и таблица вёдер."""
+
+    def __init__(self, path, slots):
+        self.slots = slots
+        size = _HEADER.size + slots * _SLOT.size
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.thread_lock = threading.Lock()
+        with self.locked():
+            if os.fstat(self.fd).st_size != size:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+            self.map = mmap.mmap(self.fd, size)
+            if _HEADER.unpack_from(self.map, 0)[0] != _MAGIC:
+                _HEADER.pack_into(self.map, 0, _MAGIC, 0, 0, 0)
+
+    @contextmanager
+    def locked(self):
+        """lockf исключает другие процессы, mutex — другие потоки этого процесса (lockf принадлежит процессу)."""
+        with self.thread_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    def take(self, key, bucket, now):
+        """Взять токен из ведра key. Возвращает 0, если взят, иначе через сколько секунд появится токен."""
+        capacity, rate = bucket
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        offset = _HEADER.size + (key_hash % self.slots) * _SLOT.size
+        stored, tokens, ts = _SLOT.unpack_from(self.map, offset)
+        # Время из будущего — сегмент пережил перезагрузку (monotonic отсчитывается заново): ведро как новое
+        if stored != key_hash or ts > now:
+            tokens, ts = float(capacity), now
+        tokens = min(float(capacity), tokens + (now - ts) * rate)
+        if tokens >= 1:
+            _SLOT.pack_into(self.map, offset, key_hash, tokens - 1, now)
+            return 0
+        _SLOT.pack_into(self.map, offset, key_hash, tokens, now)
+        return (1 - tokens) / rate if rate > 0 else 60
+
+    def count(self, index):
+        values = list(_HEADER.unpack_from(self.map, 0))
+        values[index] += 1
+        _HEADER.pack_into(self.map, 0, *values)
+
+    def counters(self):
+        return _HEADER.unpack_from(self.map, 0)[1:]
+
+
+def _get_segment():
+    global _segment
+    if _segment is None:
+        with _segment_lock:
+            if _segment is None:
+                _segment = _Segment(_segment_path(), SLOTS)
+    return _segment
+
+
+def client_key(request):
+    """Идентификатор клиента (киоска) для ведра: адрес из заголовка доверенного прокси или REMOTE_ADDR."""
+    value = request.META.get(CLIENT_HEADER) if CLIENT_HEADER else None
+    return (value or request.META.get("REMOTE_ADDR") or "").split(",")[0].strip()
+
+
+def admit(client, child_id):
+    """
+    Решить, пропускать ли начисление, не обращаясь к хранилищу.
+    Возвращает 0 — пропустить, иначе Retry-After в целых секундах.
+    """
+    if not ENABLED:
+        return 0
+    segment = _get_segment()
+    tenant = storage.current_tenant()
+    now = time.monotonic()
+    with segment.locked():
+        wait = segment.take(f"client:{tenant}:{client}", CLIENT_BUCKET, now)
+        if wait:
+            segment.count(2)
+        else:
+            wait = segment.take(f"child:{tenant}:{child_id}", CHILD_BUCKET, now)
+            segment.count(3 if wait else 1)
+    return math.ceil(wait)
+
+
+def metrics():
+    """Счётчики лимитера (общие для всех воркеров с начала жизни сегмента) и настройки вёдер."""
+    allowed, shed_client, shed_child = _get_segment().counters() if ENABLED else (0, 0, 0)
+    return {
+        "enabled": ENABLED,
+        "allowed": allowed,
+        "shedClient": shed_client,
+        "shedChild": shed_child,
+        "clientBucket": {"burst": CLIENT_BUCKET[0], "ratePerSec": CLIENT_BUCKET[1]},
+        "childBucket": {"burst": CHILD_BUCKET[0], "ratePerSec": CHILD_BUCKET[1]},
+    }
@@ -0,0 +1,202 @@
+"""
+Пересчёт балансов по журналу событий (manage.py replay_events).
+
+Баланс ребёнка — свёртка его событий с начала текущего периода (месяца последнего сброса):
+начисление прибавляет credited, корректировка — max(0, баланс + credited). Обе операции —
+функции вида b → max(c, b + s), и композиция таких функций имеет тот же вид. Поэтому events.json
+режется на куски по границам элементов, процессы пула сворачивают свои куски независимо
+(по ребёнку — пара (c, s)), а результаты склеиваются по порядку кусков.
+Кусок разбирается одним json.loads, в памяти процесса — только он.
+"""
+import functools
+import itertools
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core import storage
+
+# Начало элемента верхнего уровня в events.json (json.dump с indent=2): строки внутри JSON
+# не содержат перевода строки, вложенные объекты идут с большим отступом
+_ITEM = b"\n  {"
+CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def _compose(first, second):
+    """Свёртка «сначала first, потом second» для функций b → max(c, b + s); c=None — без нижней границы."""
+    c1, s1 = first
+    c2, s2 = second
+    if c1 is None:
+        return c2, s1 + s2
+    return (c1 + s2 if c2 is None else max(c2, c1 + s2)), s1 + s2
+
+
+def _fold(events, period_start, tombstones):
+    """Свернуть события по детям: {childId: [c, s, число событий, balanceAfter последнего]}."""
+    folds = {}
+    for e in events:
+        child_id = e.get("childId")
+        if (e.get("timestamp") or "") < period_start or storage._is_tombstoned(e, tombstones):
+            continue
+        credited = e.get("credited") or 0
+        step = (0, credited) if e.get("actionId") == "balance_adjust" else (None, credited)
+        fold = folds.get(child_id)
+        if fold is None:
+            folds[child_id] = [step[0], step[1], 1, e.get("balanceAfter")]
+        else:
+            fold[0], fold[1] = _compose((fold[0], fold[1]), step)
+            fold[2] += 1
+            fold[3] = e.get("balanceAfter")
+    return folds
+
+
+def _chunk_bounds(mm, chunk_bytes):
+    """Границы кусков: позиции начал элементов (_ITEM) примерно через chunk_bytes и закрывающей скобки."""
+    end = mm.rfind(b"\n]")
+    first = mm.find(_ITEM)
+    if first == -1 or end == -1:
+        return None
+    bounds = [first]
+    pos = first + chunk_bytes
+    while pos < end:
+        nxt = mm.find(_ITEM, pos, end)
+        if nxt == -1:
+            break
+        bounds.append(nxt)
+        pos = nxt + chunk_bytes
+    bounds.append(end)
+    return bounds
+
+
+def _replay_chunk(path, start, end, period_start, tombstones):
+    """Разобрать элементы в байтах [start, end) файла path и свернуть их. Возвращает (свёртки, число событий, макс. номер)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        raw = mm[start:end].rstrip().rstrip(b",")
+    events = json.loads(b"[" + raw + b"]")
+    return _fold(events, period_start, tombstones), len(events), storage._max_event_seq(events)
+
+
+def _period_start():
+    last = storage._read_json_any("last_month_reset") or {}
+    if isinstance(last, dict) and last.get("year") and last.get("month"):
+        return f"{last['year']:04d}-{last['month']:02d}-01"
+    return ""
+
+
+def replay(workers=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Пересчитать балансы по events.json в пуле из workers процессов (по умолчанию — по числу ядер).
+    Возвращает {"version": версия events.json, "events", "maxSeq", "expected": {childId: баланс}, "lastBalanceAfter": {...}}.
+    """
+    storage.ensure_monthly_reset_done()
+    path = storage._path("events")
+    version = storage._file_version("events")
+    period_start = _period_start()
+    tombstones = storage.get_tombstones()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        bounds = None
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                bounds = _chunk_bounds(mm, chunk_bytes)
+    if bounds is None:
+        # Пустой журнал или формат не от json.dump(indent=2) (правка вручную) — одним куском
+        events = storage._load_json_any("events") or []
+        results = [(_fold(events, period_start, tombstones), len(events), storage._max_event_seq(events))]
+    else:
+        starts, ends = bounds[:-1], bounds[1:]
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(starts))) as pool:
+            results = list(pool.map(
+                functools.partial(_replay_chunk, str(path)),
+                starts, ends, itertools.repeat(period_start), itertools.repeat(tombstones),
+            ))
+    folds = {}
+    total = 0
+    max_seq = 0
+    for chunk, count, chunk_max in results:
+        total += count
+        max_seq = max(max_seq, chunk_max)
+        for child_id, (c, s, n, after) in chunk.items():
+            fold = folds.get(child_id)
+            if fold is None:
+                folds[child_id] = [c, s, n, after]
+            else:
+                fold[0], fold[1] = _compose((fold[0], fold[1]), (c, s))
+                fold[2] += n
+                fold[3] = after
+    expected = {cid: (s if c is None else max(c, s)) for cid, (c, s, _, _) in folds.items()}
+    return {
+        "version": version,
+        "events": total,
+        "maxSeq": max(max_seq, total),
+        "expected": expected,
+        "lastBalanceAfter": {cid: fold[3] for cid, fold in folds.items()},
+    }
+
+
+def compare(result):
+    """Расхождения балансов children.json с пересчётом: [{"childId", "balance", "expected", "lastBalanceAfter"}]."""
+    mismatches = []
+    for c in storage._read_json("children"):
+        expected = result["expected"].get(c["id"], 0)
+        if c.get("balance", 0) != expected:
+            mismatches.append({
+                "childId": c["id"],
+                "balance": c.get("balance", 0),
+                "expected": expected,
+                "lastBalanceAfter": result["lastBalanceAfter"].get(c["id"]),
+            })
+    return mismatches
+
+
+def _month_totals_mismatches():
+    """Записи индекса итогов месяцев, чьи суммы по группам не совпадают с файлами групп: новый индекс и число исправлений."""
+    index = storage._read_json_any("monthly_index", [])
+    fixed = 0
+    rebuilt = []
+    for entry in index:
+        groups = []
+        for g in entry.get("groups") or []:
+            rows = storage._read_json_any(storage._month_group_key(entry["year"], entry["month"], g["file"]), [])
+            actual = {**g, "totalSum": sum(c.get("balance", 0) for c in rows), "childrenCount": len(rows)}
+            fixed += actual != g
+            groups.append(actual)
+        totals = {
+            "totalSum": sum(g["totalSum"] for g in groups),
+            "childrenCount": sum(g["childrenCount"] for g in groups),
+        }
+        fixed += any(entry.get(k) != v for k, v in totals.items())
+        rebuilt.append({**entry, **totals, "groups": groups})
+    return rebuilt, fixed
+
+
+def repair(result):
+    """
+    Исправить по пересчёту одной транзакцией: балансы детей, счётчик номеров событий (не меньше
+    наибольшего номера в журнале) и суммы в индексе итогов месяцев.
+    Если events.json изменился после пересчёта, ничего не пишется — возвращается None (пересчитать заново).
+    Иначе {"children": [исправленные расхождения], "eventSeq": новое значение или None, "monthlyIndex": число исправлений}.
+    """
+    with storage.transaction():
+        if storage._file_version("events") != result["version"]:
+            return None
+        mismatches = compare(result)
+        if mismatches:
+            expected = {m["childId"]: m["expected"] for m in mismatches}
+            children = storage._read_json("children")
+            for i, c in enumerate(children):
+                if c["id"] in expected:
+                    children[i] = {**c, "balance": expected[c["id"]]}
+                    storage._children_balance_changed(c["id"], expected[c["id"]])
+            storage._write_json("children", children)
+        seq = storage._read_json_any("event_seq") or {}
+        seq = seq.get("seq") if isinstance(seq, dict) else None
+        new_seq = None
+        if not isinstance(seq, int) or seq < result["maxSeq"]:
+            new_seq = result["maxSeq"]
+            storage._write_json("event_seq", {"seq": new_seq})
+        index, month_fixes = _month_totals_mismatches()
+        if month_fixes:
+            storage._write_json("monthly_index", index)
+    return {"children": mismatches, "eventSeq": new_seq, "monthlyIndex": month_fixes}
@@ -0,0 +1,191 @@
+"""
+Реплика хранилища для тяжёлых админских отчётов (log shipping).
+
+Основной экземпляр (STORAGE_CHANGELOG=1) пишет журнал изменений в DATA_DIR/changelog
+(storage._changelog_append), команда replicate применяет его к каталогу реплики (REPLICA_DATA_DIR),
+а отчёты читаются с реплики, пока её отставание не больше REPLICA_MAX_STALENESS секунд.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from core import storage
+
+POSITION_FILE = ".replica_position.json"
+
+REPLICA_DATA_DIR = getattr(settings, "REPLICA_DATA_DIR", None)
+REPLICA_MAX_STALENESS = getattr(settings, "REPLICA_MAX_STALENESS", 30)
+
+_replica_tenants = {}
+_replica_tenants_lock = threading.Lock()
+
+
+def log_end(data_dir):
+    """Позиция конца журнала (следующая запись получит её как lsn)."""
+    segments = storage.changelog_segments(data_dir)
+    if not segments:
+        return 0
+    start, path = segments[-1]
+    return start + path.stat().st_size
+
+
+def read_changelog(data_dir, lsn):
+    """
+    Записи журнала, начиная с позиции lsn: пары (запись, позиция следующей записи).
+    Недописанная последняя строка (основной экземпляр как раз пишет её) пропускается.
+    """
+    for start, path in storage.changelog_segments(data_dir):
+        size = path.stat().st_size
+        if start + size <= lsn:
+            continue
+        with open(path, "rb") as f:
+            f.seek(max(0, lsn - start))
+            pos = start + f.tell()
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return
+                pos += len(line)
+                yield json.loads(line), pos
+
+
+def read_position(target_dir):
+    """Состояние реплики: {"lsn", "checkedAt", "appliedAt"} или None, если реплика не инициализирована."""
+    try:
+        with open(Path(target_dir) / POSITION_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_position(target_dir, position):
+    path = Path(target_dir) / POSITION_FILE
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(position, f)
+    os.replace(tmp_path, path)
+
+
+def seed(source_dir, target_dir):
+    """
+    Начальная копия: все файлы хранилища и текущая позиция журнала берутся под блокировкой основного
+    хранилища, поэтому копия согласована с позицией, с которой реплика продолжит применять журнал.
+    """
+    source = storage.Tenant("", source_dir, changelog=False)
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    checked_at = time.time()
+    with storage.use_tenant(source), storage._storage_lock():
+        for key, path in source.storage_files().items():
+            if key in storage.CHANGELOG_SKIP or not path.exists():
+                continue
+            target = target_dir / storage.file_name(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f".{target.name}.seed.tmp")
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        lsn = log_end(source_dir)
+    _write_position(target_dir, {"lsn": lsn, "checkedAt": checked_at, "appliedAt": time.time()})
+    return lsn
+
+
+def _item_key(item):
+    """
+    Ключ дописанного элемента для отсева повторов: id (события) или seq (журнал изменений детей,
+    у его записей нет id). None — элемент не отсеивается.
+    """
+    return item.get("id", item.get("seq"))
+
+
+def _apply(changes, known):
+    """
+    Применить изменения одной записи журнала. known — {ключ файла: множество ключей его элементов},
+    общее для всей пачки записей: дописанные элементы, которые уже есть в файле, пропускаются.
+    Так повторное применение пачки (сбой между записью файлов и позиции реплики) ничего не задваивает.
+    """
+    for change in changes:
+        key = change["key"]
+        if change["op"] == "put":
+            storage._write_json(key, change["data"])
+            known.pop(key, None)
+            continue
+        if change["op"] == "delete":
+            storage._delete_json(key)
+            known.pop(key, None)
+            continue
+        data = storage._read_json_any(key, [])
+        seen = known.get(key)
+        if seen is None:
+            seen = known[key] = {k for k in map(_item_key, data) if k is not None}
+        items = [item for item in change["items"] if _item_key(item) is None or _item_key(item) not in seen]
+        if not items:
+            continue
+        seen.update(k for k in map(_item_key, items) if k is not None)
+        data.extend(items)
+        storage._write_json(key, data)
+
+
+def apply_pending(source_dir, target_dir):
+    """
+    Применить к реплике все новые записи журнала одной транзакцией (каждый файл пишется один раз).
+    Реплика без позиции или отставшая дальше хранимых сегментов заново копируется целиком (seed).
+    Возвращает число применённых записей (-1 — выполнена начальная копия).
+    """
+    position = read_position(target_dir)
+    segments = storage.changelog_segments(source_dir)
+    end = log_end(source_dir)
+    if position is None or position["lsn"] > end or (segments and position["lsn"] < segments[0][0]):
+        seed(source_dir, target_dir)
+        return -1
+    checked_at = time.time()
+    records = list(read_changelog(source_dir, position["lsn"]))
+    if records:
+        target = storage.Tenant("", target_dir, changelog=False)
+        known = {}
+        with storage.use_tenant(target), storage.transaction():
+            for record, _ in records:
+                _apply(record["changes"], known)
+    _write_position(target_dir, {
+        "lsn": records[-1][1] if records else position["lsn"],
+        "checkedAt": checked_at,
+        "appliedAt": time.time(),
+    })
+    return len(records)
+
+
+def replica_dir(tenant_name=""):
+    """Каталог реплики для тенанта (для мультитенантного режима — REPLICA_DATA_DIR/tenants/<имя>)."""
+    if not REPLICA_DATA_DIR:
+        return None
+    root = Path(REPLICA_DATA_DIR)
+    return root / "tenants" / tenant_name if tenant_name else root
+
+
+def _replica_tenant(path):
+    with _replica_tenants_lock:
+        tenant = _replica_tenants.get(path)
+        if tenant is None:
+            tenant = _replica_tenants[path] = storage.Tenant("", path, changelog=False, read_only=True)
+        return tenant
+
+
+@contextmanager
+def replica_reads():
+    """
+    Выполнить блок чтения на реплике текущего тенанта, если она настроена и отстаёт
+    не больше чем на REPLICA_MAX_STALENESS секунд. Отдаёт отставание в секундах
+    или None, если чтение идёт с основного хранилища.
+    """
+    path = replica_dir(storage.current_tenant())
+    position = read_position(path) if path is not None else None
+    staleness = time.time() - position["checkedAt"] if position else None
+    if staleness is None or staleness > REPLICA_MAX_STALENESS:
+        yield None
+        return
+    with storage.use_tenant(_replica_tenant(path)), storage.snapshot(autoflush=False):
+        yield max(0.0, staleness)
@@ -0,0 +1,96 @@
+"""
+Оболочка SPA (index.html) для всех клиентских маршрутов — из памяти процесса.
+
+Файл читается один раз (в DEBUG — заново при изменении), сразу сжимается в gzip и brotli
+и отдаётся с ETag: повторный заход киоска получает 304 без тела. Cache-Control: no-cache —
+браузер всегда сверяет оболочку, поэтому новая сборка фронтенда видна сразу, а ресурсы
+с хешем в имени (assets/*) кэшируются навсегда (WHITENOISE_IMMUTABLE_FILE_TEST).
+"""
+import gzip
+import hashlib
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен — только gzip
+    brotli = None
+
+INDEX_NAME = "index.html"
+_CODING_RE = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?", re.I)
+
+_shell = None
+_shell_lock = threading.Lock()
+
+
+class _Shell:
+    """Содержимое index.html, его ETag и сжатые варианты."""
+
+    def __init__(self, content, version):
+        self.version = version
+        self.etag = '"%s"' % hashlib.sha1(content).hexdigest()[:20]
+        self.variants = {"": content, "gzip": gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(content, quality=11)
+
+
+def _load():
+    global _shell
+    shell = _shell
+    if shell is not None and not settings.DEBUG:
+        return shell
+    path = Path(settings.STATIC_ROOT) / INDEX_NAME
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise Http404("Фронтенд не собран")
+    version = (st.st_mtime_ns, st.st_size)
+    with _shell_lock:
+        if _shell is None or _shell.version != version:
+            _shell = _Shell(path.read_bytes(), version)
+        return _shell
+
+
+def _accepted(header):
+    """Accept-Encoding → {кодировка: q}. Кодировка с q=0 запрещена клиентом."""
+    accepted = {}
+    for part in header.split(","):
+        match = _CODING_RE.match(part)
+        if not match:
+            continue
+        try:
+            q = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = q
+    return accepted
+
+
+def _encoding(request, shell):
+    accepted = _accepted(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    for encoding in ("br", "gzip"):
+        if encoding in shell.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return ""
+
+
+def spa_shell(request):
+    """index.html для любого пути вне API и статики (маршрутизацию выполняет React Router)."""
+    shell = _load()
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if shell.etag in etags or "*" in etags:
+        response = HttpResponseNotModified()
+    else:
+        encoding = _encoding(request, shell)
+        response = HttpResponse(shell.variants[encoding], content_type="text/html; charset=utf-8")
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = shell.etag
+    response["Cache-Control"] = "no-cache"
+    response["Vary"] = "Accept-Encoding"
+    return response
@@ -1,32 +1,132 @@
 """
 Сервисный слой для хранения данных в JSON с файловыми блокировками.
 """
+import csv
+import functools
+import hashlib
+import heapq
+from bisect import bisect_left, insort
+import io
 import json
 import fcntl
 import logging
 import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 from datetime import datetime, date, timedelta
 from django.conf import settings
+from django.core.cache import caches
 
 logger = logging.getLogger(__name__)
 
 DATA_DIR = getattr(settings, "DATA_DIR", Path(__file__).resolve().parent.parent / "data")
 DATA_DIR = Path(DATA_DIR)
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 SEED_DIR = Path(settings.SEED_DATA_DIR) if getattr(settings, "SEED_DATA_DIR", None) else None
 
-FILES = {
-    "groups": DATA_DIR / "groups.json",
-    "children": DATA_DIR / "children.json",
-    "events": DATA_DIR / "events.json",
-    "actions_config": DATA_DIR / "actions_config.json",
-    "monthly_results": DATA_DIR / "monthly_results.json",
-    "last_month_reset": DATA_DIR / "last_month_reset.json",
-    "admins": DATA_DIR / "admins.json",
+FILE_NAMES = {
+    "groups": "groups.json",
+    "children": "children.json",
+    "events": "events.json",
+    "actions_config": "actions_config.json",
+    "monthly_index": "monthly_index.json",
+    "last_month_reset": "last_month_reset.json",
+    "admins": "admins.json",
+    "tombstones": "tombstones.json",
+    "event_seq": "event_seq.json",
+    "idempotency": "idempotency.json",
+    "child_changes": "child_changes.json",
 }
 
+# Итоги месяцев: индекс monthly_index.json и по файлу на группу за месяц (ключ monthly/2025-10/group1)
+MONTHLY_DIR = "monthly"
+MONTH_GROUP_KEY_RE = re.compile(r"^monthly/\d{4}-\d{2}/[A-Za-z0-9_-]{1,64}$")
+# Прежний формат: все месяцы со снимками детей в одном файле (переносится migrate_monthly_results)
+LEGACY_MONTHLY_RESULTS = "monthly_results.json"
+
+
+def file_name(key):
+    """Путь файла ключа key относительно каталога данных."""
+    return FILE_NAMES.get(key) or f"{key}.json"
+
+
+def key_for_file_name(name):
+    """Ключ хранилища по относительному пути файла или None."""
+    for key, fname in FILE_NAMES.items():
+        if fname == name:
+            return key
+    key = name[:-len(".json")] if name.endswith(".json") else None
+    return key if key and MONTH_GROUP_KEY_RE.match(key) else None
+
+
+def _is_storage_key(key):
+    return key in FILE_NAMES or bool(MONTH_GROUP_KEY_RE.match(key))
+
+
+# Журнал изменений для реплики (core.replication): пишется основным экземпляром при STORAGE_CHANGELOG
+STORAGE_CHANGELOG = getattr(settings, "STORAGE_CHANGELOG", False)
+
+
+class Tenant:
+    """
+    Каталог данных одного детского сада: пути файлов хранилища и файла блокировки.
+    changelog — вести журнал изменений для реплики; read_only — каталог реплики, только чтение.
+    """
+
+    def __init__(self, name, data_dir, changelog=STORAGE_CHANGELOG, read_only=False):
+        self.name = name
+        self.data_dir = Path(data_dir)
+        self.files = {key: self.data_dir / fname for key, fname in FILE_NAMES.items()}
+        self.lock_file = self.data_dir / ".storage.lock"
+        # Потоки одного процесса сначала встают в очередь здесь, затем берут flock (см. _storage_lock)
+        self.thread_lock = threading.Lock()
+        self.changelog_dir = self.data_dir / "changelog"
+        self.changelog = changelog and not read_only
+        self.read_only = read_only
+
+    def path(self, key):
+        """Путь файла по ключу: файлы FILE_NAMES и файлы итогов месяца по группам."""
+        path = self.files.get(key)
+        if path is None:
+            if not MONTH_GROUP_KEY_RE.match(key):
+                raise KeyError(key)
+            path = self.data_dir / f"{key}.json"
+        return path
+
+    def storage_files(self):
+        """Все существующие файлы итогов месяцев вместе с файлами FILE_NAMES: {ключ: путь}."""
+        files = dict(self.files)
+        month_dir = self.data_dir / MONTHLY_DIR
+        if month_dir.is_dir():
+            for path in sorted(month_dir.glob("*/*.json")):
+                key = key_for_file_name(path.relative_to(self.data_dir).as_posix())
+                if key:
+                    files[key] = path
+        return files
+
+
+# Тенант по умолчанию — DATA_DIR (однотенантный режим, команды и скрипты без --tenant)
+DEFAULT_TENANT = Tenant("", DATA_DIR)
+FILES = DEFAULT_TENANT.files
+
+_current_tenant = ContextVar("storage_tenant", default=DEFAULT_TENANT)
+
+
+def _files():
+    """Пути файлов текущего тенанта."""
+    return _current_tenant.get().files
+
+
+def _path(key):
+    """Путь файла key текущего тенанта."""
+    return _current_tenant.get().path(key)
+
 DEFAULT_ACTIONS = [
     {"id": "crane", "name": "Закрытие крана", "coins": 1, "cooldown_sec": 120, "daily_limit_coins": 20},
     {"id": "cardboard_box", "name": "Макулатура", "coins": 5, "cooldown_sec": 120, "daily_limit_coins": 15},
@@ -47,55 +147,310 @@ def _copy_from_seed(key):
     """Скопировать файл из каталога-семени (JSON из репозитория), если он есть."""
     if not SEED_DIR:
         return False
-    seed_path = SEED_DIR / FILES[key].name
+    seed_path = SEED_DIR / FILE_NAMES[key]
     if not seed_path.exists():
         return False
     try:
         with open(seed_path, "r", encoding="utf-8") as f:
             data = json.load(f)
-        _write_json(key, data)
+        _write_json_file(key, data)
         return True
     except (json.JSONDecodeError, OSError):
         return False
 
 
 def _ensure_defaults():
-    """Создать файлы с дефолтными данными, если их нет. Сначала пробуем скопировать из JSON репозитория (seed)."""
-    if not FILES["groups"].exists():
+    """Создать файлы с дефолтными данными, если их нет. Сначала пробуем скопировать из JSON репозитория (seed).
+    Вызывается при старте (bootstrap) и как запасной путь, если файл пропал во время работы."""
+    files = _files()
+    _current_tenant.get().data_dir.mkdir(parents=True, exist_ok=True)
+    if not files["groups"].exists():
         if not _copy_from_seed("groups"):
-            _write_json("groups", DEFAULT_GROUPS)
-    if not FILES["children"].exists():
+            _write_json_file("groups", DEFAULT_GROUPS)
+    if not files["children"].exists():
         if not _copy_from_seed("children"):
-            _write_json("children", DEFAULT_CHILDREN)
-    if not FILES["events"].exists():
+            _write_json_file("children", DEFAULT_CHILDREN)
+    if not files["events"].exists():
         if not _copy_from_seed("events"):
-            _write_json("events", [])
-    if not FILES["actions_config"].exists():
+            _write_json_file("events", [])
+    if not files["actions_config"].exists():
         if not _copy_from_seed("actions_config"):
-            _write_json("actions_config", DEFAULT_ACTIONS)
-    if not FILES["monthly_results"].exists():
-        if not _copy_from_seed("monthly_results"):
-            _write_json("monthly_results", [])
-    if not FILES["last_month_reset"].exists():
+            _write_json_file("actions_config", DEFAULT_ACTIONS)
+    if not files["monthly_index"].exists():
+        data_dir = _current_tenant.get().data_dir
+        legacy = data_dir / LEGACY_MONTHLY_RESULTS
+        if not legacy.exists() and SEED_DIR and (SEED_DIR / LEGACY_MONTHLY_RESULTS).exists():
+            shutil.copyfile(SEED_DIR / LEGACY_MONTHLY_RESULTS, legacy)
+        if legacy.exists():
+            migrate_monthly_results()
+        else:
+            _write_json_file("monthly_index", [])
+    if not files["last_month_reset"].exists():
         if not _copy_from_seed("last_month_reset"):
-            _write_json("last_month_reset", {})
-    if not FILES["admins"].exists():
+            _write_json_file("last_month_reset", {})
+    if not files["admins"].exists():
         if not _copy_from_seed("admins"):
-            _write_json("admins", [])
+            _write_json_file("admins", [])
+    if not files["tombstones"].exists():
+        _write_json_file("tombstones", [])
 
 
 def reset_actions_config_to_defaults():
     """Перезаписать правила начисления очков: из seed (JSON репозитория) или из DEFAULT_ACTIONS."""
-    _ensure_defaults()
-    if not _copy_from_seed("actions_config"):
-        _write_json("actions_config", DEFAULT_ACTIONS)
+    with transaction():
+        _ensure_defaults()
+        if not _copy_from_seed("actions_config"):
+            _write_json("actions_config", DEFAULT_ACTIONS)
 
 
-def _read_json(key):
-    path = FILES[key]
-    if not path.exists():
+# --- Снимок хранилища на время запроса (unit of work) и транзакции ---
+
+_current_snapshot = ContextVar("storage_snapshot", default=None)
+_lock_depth = ContextVar("storage_lock_depth", default=0)
+
+LOCK_FILE = DEFAULT_TENANT.lock_file
+
+
+class StorageConflict(RuntimeError):
+    """Файл изменили другой поток или процесс после чтения в снимке: отложенная запись затёрла бы их изменения."""
+
+
+def _copy_json(value):
+    """Глубокая копия данных JSON-файла (списки, словари и скаляры) — быстрее copy.deepcopy."""
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    return value
+
+
+class StorageSnapshot:
+    """
+    Снимок файлов хранилища в рамках одного запроса: каждый файл читается с диска
+    не больше одного раза, записи копятся в памяти и сбрасываются на диск в flush().
+    parent — внешний снимок (для транзакции): его данные переиспользуются (копией — транзакция меняет
+    их на месте, а при откате внешний снимок должен остаться прежним), если файл с тех пор не менялся.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.data = {}
+        self.versions = {}
+        self.dirty = set()
+        self.reads = {}
+        self.index_patches = {}
+        self.appends = {}
+        self.removed = set()
+        self.on_commit = []
+        self.month_checked = parent.month_checked if parent else False
+
+    def load(self, key, loader):
+        if key not in self.data:
+            parent = self.parent
+            if parent is not None and key in parent.data and (
+                key in parent.dirty or parent.versions.get(key) == _file_version(key)
+            ):
+                self.data[key] = _copy_json(parent.data[key])
+                self.versions[key] = parent.versions.get(key)
+                if key in parent.dirty:
+                    self.dirty.add(key)
+                return self.data[key]
+            version = _file_version(key)
+            value = loader()
+            self.reads[key] = self.reads.get(key, 0) + 1
+            if value is None:
+                return None
+            self.data[key] = value
+            self.versions[key] = version
+        return self.data[key]
+
+    def put(self, key, data):
+        self.data[key] = data
+        self.dirty.add(key)
+        self.removed.discard(key)
+
+    def remove(self, key):
+        """Удалить файл key при flush (после записи остальных файлов)."""
+        self.data.pop(key, None)
+        self.versions.pop(key, None)
+        self.dirty.discard(key)
+        self.removed.add(key)
+
+    def flush(self):
+        """
+        Записать изменённые файлы под блокировкой хранилища: сначала файлы итогов месяцев
+        (на них ссылается индекс), затем в порядке FILE_NAMES, и удалить файлы из removed
+        (на них индекс уже не ссылается). После записи выполняются действия on_commit (_on_commit).
+        Если прочитанный в снимке файл с тех пор изменён другим потоком или процессом, ничего
+        не пишется и выбрасывается StorageConflict (чтение-изменение-запись — в transaction()).
+        """
+        if not self.dirty and not self.removed and not self.on_commit:
+            return
+        keys = sorted(k for k in self.dirty if k not in FILE_NAMES) + list(FILE_NAMES)
+        with _storage_lock(), _changelog_batch():
+            stale = [k for k in keys if k in self.dirty and k in self.versions and self.versions[k] != _file_version(k)]
+            if stale:
+                raise StorageConflict(f"storage files changed since read: {', '.join(stale)}")
+            for key in keys:
+                if key in self.dirty:
+                    _write_json_file(
+                        key, self.data[key],
+                        index_patches=self.index_patches.get(key), appended=self._appended(key),
+                    )
+                    self.versions[key] = _file_version(key)
+            for key in sorted(self.removed):
+                _delete_json_file(key)
+            hooks, self.on_commit = self.on_commit, []
+            for fn in hooks:
+                fn()
+        self.dirty.clear()
+        self.removed.clear()
+        self.index_patches.clear()
+        self.appends.clear()
+
+    def _appended(self, key):
+        """Элементы, дописанные в конец списка key в этом снимке (для журнала), если больше он не менялся."""
+        if key not in self.appends:
+            return None
+        base, items = self.appends[key]
+        data = self.data[key]
+        if len(data) != base + len(items) or any(a is not b for a, b in zip(data[base:], items)):
+            return None
+        return items
+
+    def discard(self):
+        """Отбросить несохранённые изменения."""
+        for key in self.dirty:
+            self.data.pop(key, None)
+        self.dirty.clear()
+        self.removed.clear()
+        self.on_commit.clear()
+        self.index_patches.clear()
+        self.appends.clear()
+
+    def merge_into_parent(self):
+        """Передать зафиксированное состояние во внешний снимок (после успешной транзакции)."""
+        parent = self.parent
+        for key, value in self.data.items():
+            parent.data[key] = value
+            parent.versions[key] = self.versions.get(key)
+            parent.dirty.discard(key)
+        for key in self.removed:
+            parent.data.pop(key, None)
+            parent.versions.pop(key, None)
+            parent.dirty.discard(key)
+        parent.month_checked = parent.month_checked or self.month_checked
+
+
+@contextmanager
+def snapshot(autoflush=True):
+    """
+    Открыть снимок хранилища. Вложенный вызов использует уже открытый снимок.
+    При выходе без исключения изменённые файлы записываются на диск, при исключении — отбрасываются.
+    autoflush=False — запись оставляется вызывающему (snap.flush()), например чтобы выполнить её вне event loop.
+    """
+    snap = _current_snapshot.get()
+    if snap is not None:
+        yield snap
+        return
+    snap = StorageSnapshot()
+    token = _current_snapshot.set(snap)
+    try:
+        yield snap
+    except BaseException:
+        snap.discard()
+        raise
+    else:
+        if autoflush:
+            snap.flush()
+    finally:
+        _current_snapshot.reset(token)
+
+
+@contextmanager
+def _storage_lock():
+    """
+    Эксклюзивная блокировка всего хранилища: между потоками процесса — Tenant.thread_lock,
+    между процессами — flock. Повторный вход в том же потоке допускается.
+    flock принадлежит открытому файлу, а не потоку: блокировка потоков не зависит от того,
+    как ФС реализует flock (на NFS это fcntl-блокировка процесса, и потоки её не делят).
+    """
+    depth = _lock_depth.get()
+    if depth:
+        token = _lock_depth.set(depth + 1)
+        try:
+            yield
+        finally:
+            _lock_depth.reset(token)
+        return
+    tenant = _current_tenant.get()
+    lock_file = tenant.lock_file
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with tenant.thread_lock, open(lock_file, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        token = _lock_depth.set(1)
+        try:
+            yield
+        finally:
+            _lock_depth.reset(token)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def transaction():
+    """
+    Атомарная операция чтение-изменение-запись: на всё время держится блокировка хранилища,
+    данные читаются актуальными, а все изменённые файлы записываются по одному разу при выходе.
+    При исключении изменения отбрасываются. Вложенная транзакция входит во внешнюю.
+    """
+    outer = _current_snapshot.get()
+    if outer is not None and _lock_depth.get():
+        yield outer
+        return
+    with _storage_lock():
+        snap = StorageSnapshot(parent=outer)
+        token = _current_snapshot.set(snap)
+        try:
+            yield snap
+            snap.flush()
+        except BaseException:
+            snap.discard()
+            raise
+        finally:
+            _current_snapshot.reset(token)
+        if outer is not None:
+            snap.merge_into_parent()
+
+
+def _on_commit(fn):
+    """
+    Выполнить fn после записи текущего снимка на диск, под блокировкой хранилища (сразу, если снимка нет).
+    Во вложенной транзакции — после записи внешней: при её откате fn не выполняется.
+    """
+    snap = _current_snapshot.get()
+    if snap is None:
+        fn()
+    else:
+        snap.on_commit.append(fn)
+
+
+def transactional(func):
+    """Декоратор: выполнить функцию хранилища в transaction()."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with transaction():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _load_json(key):
+    path = _path(key)
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
         _ensure_defaults()
-    with open(path, "r", encoding="utf-8") as f:
+        f = open(path, "r", encoding="utf-8")
+    with f:
         fd = f.fileno()
         fcntl.flock(fd, fcntl.LOCK_SH)
         try:
@@ -106,25 +461,273 @@ def _read_json(key):
             fcntl.flock(fd, fcntl.LOCK_UN)
 
 
+def _read_json(key):
+    snap = _current_snapshot.get()
+    if snap is not None:
+        return snap.load(key, lambda: _load_json(key))
+    return _load_json(key)
+
+
 def _write_json(key, data):
-    path = FILES[key]
+    snap = _current_snapshot.get()
+    if snap is not None:
+        snap.put(key, data)
+        return
+    _write_json_file(key, data)
+
+
+def _write_json_file(key, data, fsync=False, index_patches=None, appended=None):
+    """Записать файл атомарно: во временный файл рядом и os.replace — читатель никогда не видит
+    наполовину записанный JSON. fsync=True — дождаться сброса на диск (для счётчиков).
+    index_patches — {имя индекса: [fn]} для точечного обновления индексов вместо пересборки.
+    appended — дописанные в конец элементы: в журнал изменений попадут только они, а не весь файл."""
+    tenant = _current_tenant.get()
+    if tenant.read_only:
+        raise RuntimeError(f"storage {tenant.data_dir} is read-only (replica)")
+    path = tenant.path(key)
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-        try:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        finally:
-            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    before = _file_version(key)
+    os.replace(tmp_path, path)
+    _refresh_indexes(key, before, index_patches)
+    if tenant.changelog and key not in CHANGELOG_SKIP:
+        _changelog_record(key, data, appended)
+
+
+def _delete_json(key):
+    snap = _current_snapshot.get()
+    if snap is not None:
+        snap.remove(key)
+        return
+    _delete_json_file(key)
+
+
+def _delete_json_file(key):
+    """Удалить файл key (если есть) и сбросить его индексы."""
+    tenant = _current_tenant.get()
+    if tenant.read_only:
+        raise RuntimeError(f"storage {tenant.data_dir} is read-only (replica)")
+    before = _file_version(key)
+    if before is None:
+        return
+    tenant.path(key).unlink(missing_ok=True)
+    _refresh_indexes(key, before)
+    if tenant.changelog and key not in CHANGELOG_SKIP:
+        _changelog_change({"key": key, "op": "delete"})
+
+
+# --- Журнал изменений (log shipping): упорядоченные записи о каждом сохранении, читает core.replication ---
+
+# Счётчик номеров событий и ключи идемпотентности реплике не нужны: отчёты их не читают
+CHANGELOG_SKIP = {"event_seq", "idempotency"}
+CHANGELOG_SEGMENT_BYTES = getattr(settings, "CHANGELOG_SEGMENT_BYTES", 64 * 1024 * 1024)
+CHANGELOG_KEEP_SEGMENTS = getattr(settings, "CHANGELOG_KEEP_SEGMENTS", 4)
+
+_changelog_pending = ContextVar("storage_changelog_pending", default=None)
+
+
+def _log_append(key, data, item):
+    """Отметить, что item дописан в конец списка data файла key (в журнал попадёт только он)."""
+    snap = _current_snapshot.get()
+    if snap is not None:
+        base, items = snap.appends.setdefault(key, (len(data) - 1, []))
+        items.append(item)
+
+
+def _changelog_record(key, data, appended):
+    if appended is not None:
+        change = {"key": key, "op": "append", "items": appended}
+    else:
+        change = {"key": key, "op": "put", "data": data}
+    _changelog_change(change)
+
+
+def _changelog_change(change):
+    pending = _changelog_pending.get()
+    if pending is not None:
+        pending.append(change)
+    else:
+        _changelog_append([change])
+
+
+@contextmanager
+def _changelog_batch():
+    """Все записи файлов внутри блока попадают в журнал одной записью (одна транзакция — одна запись)."""
+    if _changelog_pending.get() is not None:
+        yield
+        return
+    pending = []
+    token = _changelog_pending.set(pending)
+    try:
+        yield
+    finally:
+        _changelog_pending.reset(token)
+    if pending:
+        _changelog_append(pending)
+
+
+def changelog_segments(data_dir):
+    """Сегменты журнала [(начальная позиция, путь)] по возрастанию."""
+    log_dir = Path(data_dir) / "changelog"
+    if not log_dir.is_dir():
+        return []
+    return sorted((int(p.stem), p) for p in log_dir.glob("*.jsonl") if p.stem.isdigit())
+
+
+def _changelog_append(changes):
+    """
+    Дописать запись в журнал под блокировкой хранилища. Позиция записи (lsn) — её смещение
+    от начала журнала. Журнал разбит на сегменты по CHANGELOG_SEGMENT_BYTES,
+    хранятся последние CHANGELOG_KEEP_SEGMENTS.
+    """
+    tenant = _current_tenant.get()
+    with _storage_lock():
+        segments = changelog_segments(tenant.data_dir)
+        if segments:
+            start, path = segments[-1]
+            size = path.stat().st_size
+        else:
+            tenant.changelog_dir.mkdir(parents=True, exist_ok=True)
+            start, size = 0, 0
+        if size >= CHANGELOG_SEGMENT_BYTES:
+            start, size = start + size, 0
+            segments.append((start, None))
+            for _, old in segments[:-CHANGELOG_KEEP_SEGMENTS]:
+                old.unlink(missing_ok=True)
+        record = {"lsn": start + size, "ts": time.time(), "changes": changes}
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with open(tenant.changelog_dir / f"{start:020d}.jsonl", "ab") as f:
+            f.write(line.encode("utf-8"))
+
+
+# --- Производные индексы в памяти процесса, привязанные к версии файла ---
+
+_index_cache = {}
+# Индексы общие для потоков процесса, а заплатки меняют их на месте. Под этой блокировкой
+# применяются заплатки и читаются индексы, изменяемые заплатками. Внутри неё — только работа
+# с памятью: чтение файлов под ней могло бы ждать flock писателя, который ждёт её саму.
+_index_lock = threading.RLock()
+
+
+def _file_version(key):
+    """Версия файла (mtime_ns, size, inode): меняется при любой записи, в т.ч. из другого процесса."""
+    try:
+        st = os.stat(_path(key))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _cached_index(key, name, build):
+    """
+    Вернуть индекс name, построенный build(data) по содержимому файла key.
+    Пересобирается, только если файл изменился с момента последней сборки.
+    """
+    snap = _current_snapshot.get()
+    if snap is not None and key in snap.dirty:
+        return build(snap.data[key])
+    slot = (str(_path(key)), name)
+    version = _file_version(key)
+    if snap is not None and key in snap.data:
+        # Внутри снимка индекс должен соответствовать уже прочитанным данным
+        version = snap.versions.get(key)
+    with _index_lock:
+        cached = _index_cache.get(slot)
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[1]
+    data = _read_json_any(key)
+    if snap is not None and key in snap.versions:
+        version = snap.versions[key]
+    value = build(data)
+    with _index_lock:
+        # Пока строили, другой поток мог записать файл: тогда data может быть новее version,
+        # и его заплатки применились бы повторно — такой индекс не кэшируем
+        if version is not None and version == _file_version(key):
+            _index_cache[slot] = (version, value)
+    return value
+
+
+def _patch_index(key, name, fn):
+    """
+    Запланировать точечное обновление индекса name файла key: fn(index) будет применена
+    при записи файла в текущей транзакции (если индекс был актуален), вместо полной пересборки.
+    """
+    snap = _current_snapshot.get()
+    if snap is not None:
+        snap.index_patches.setdefault(key, {}).setdefault(name, []).append(fn)
+
+
+def _refresh_indexes(key, before, index_patches=None):
+    """После записи файла key: индексы с заплатками обновить и привязать к новой версии, остальные сбросить."""
+    path = str(_path(key))
+    after = _file_version(key)
+    with _index_lock:
+        for slot in [s for s in _index_cache if s[0] == path]:
+            version, value = _index_cache[slot]
+            fns = (index_patches or {}).get(slot[1])
+            if fns and before is not None and version == before:
+                for fn in fns:
+                    fn(value)
+                _index_cache[slot] = (after, value)
+            else:
+                _index_cache.pop(slot, None)
+
+
+# --- Кэш результатов отчётов (Django cache "stats"), ключ включает версии файлов ---
+
+def _report_cache(*deps):
+    """
+    Кэшировать результат функции отчёта в кэше Django "stats" (LRU, см. CACHES).
+    Ключ — имя функции, аргументы, каталог данных и версии файлов deps: любая запись в эти файлы
+    (в т.ч. из другого процесса) меняет ключ, поэтому явная инвалидация не нужна.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ensure_monthly_reset_done()
+            key = _report_cache_key(func.__name__, deps, args, kwargs)
+            if key is None:
+                return func(*args, **kwargs)
+            cache = caches["stats"]
+            value = cache.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def _report_cache_key(name, deps, args, kwargs):
+    """Ключ кэша отчёта или None, если файлы изменены в текущем снимке и ещё не записаны."""
+    snap = _current_snapshot.get()
+    versions = []
+    for key in deps:
+        if snap is not None and key in snap.dirty:
+            return None
+        if snap is not None and key in snap.data:
+            version = snap.versions.get(key)
+        else:
+            version = _file_version(key)
+        if version is None:
+            return None
+        versions.append(version)
+    raw = repr((args, sorted(kwargs.items()), str(current_data_dir()), versions))
+    return f"report:{name}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
 
 
 def get_groups():
-    _ensure_defaults()
     return _read_json("groups")
 
 
+@transactional
 def ensure_groups_numbered(count=10):
     """Обеспечить наличие групп group1..groupN с названиями «1»..«N». Не удаляет лишние группы."""
-    _ensure_defaults()
     groups = get_groups()
     by_id = {g["id"]: g for g in groups}
     changed = False
@@ -146,19 +749,28 @@ def ensure_groups_numbered(count=10):
 
 
 def _read_json_any(key, default=None):
-    """Прочитать JSON; если ключа нет в FILES или файла нет — вернуть default."""
-    if key not in FILES:
+    """Прочитать JSON; если ключ не из хранилища или файла нет — вернуть default."""
+    if not _is_storage_key(key):
         return default
-    path = FILES[key]
+    snap = _current_snapshot.get()
+    if snap is not None:
+        value = snap.load(key, lambda: _load_json_any(key))
+        return default if value is None else value
+    value = _load_json_any(key)
+    return default if value is None else value
+
+
+def _load_json_any(key):
+    path = _path(key)
     if not path.exists():
-        return default
+        return None
     with open(path, "r", encoding="utf-8") as f:
         fd = f.fileno()
         fcntl.flock(fd, fcntl.LOCK_SH)
         try:
             f.seek(0)
             raw = f.read()
-            return json.loads(raw) if raw.strip() else default
+            return json.loads(raw) if raw.strip() else None
         finally:
             fcntl.flock(fd, fcntl.LOCK_UN)
 
@@ -167,8 +779,34 @@ def ensure_monthly_reset_done():
     """
     В конце месяца: при первом обращении в новом месяце сохранить итоги за прошлый месяц
     и обнулить балансы всех детей. Вызывать из get_children().
+    На реплике не выполняется: сброс делает основной экземпляр, реплика получит его из журнала.
     """
-    _ensure_defaults()
+    if _current_tenant.get().read_only:
+        return
+    snap = _current_snapshot.get()
+    if snap is not None:
+        if snap.month_checked:
+            return
+        snap.month_checked = True
+    if _month_reset_due(_read_json_any("last_month_reset")):
+        # Проверяем ещё раз под блокировкой: сброс мог уже выполнить другой воркер
+        with transaction():
+            if _month_reset_due(_read_json_any("last_month_reset")):
+                _do_month_reset()
+
+
+def _month_reset_due(last):
+    """Нужна ли запись last_month_reset / сброс месяца (last — содержимое last_month_reset.json)."""
+    if last is None or not isinstance(last, dict):
+        return True
+    now = datetime.now()
+    last_year, last_month = last.get("year"), last.get("month")
+    if last_year is None or last_month is None:
+        return False
+    return (now.year, now.month) > (last_year, last_month)
+
+
+def _do_month_reset():
     now = datetime.now()
     now_year, now_month = now.year, now.month
     last = _read_json_any("last_month_reset")
@@ -176,8 +814,6 @@ def ensure_monthly_reset_done():
         _write_json("last_month_reset", {"year": now_year, "month": now_month})
         return
     last_year, last_month = last.get("year"), last.get("month")
-    if last_year is None or last_month is None or (now_year, now_month) <= (last_year, last_month):
-        return
     # Новый месяц: сохраняем итоги за (last_year, last_month), обнуляем балансы
     children = _read_json("children")
     if not isinstance(children, list):
@@ -187,24 +823,16 @@ def ensure_monthly_reset_done():
         {"childId": c["id"], "fullName": c.get("fullName", ""), "balance": c.get("balance", 0), "groupId": c.get("groupId")}
         for c in children
     ]
-    total_sum = sum(s.get("balance", 0) for s in snapshot)
-    results = _read_json_any("monthly_results") or []
-    results.append({
-        "year": last_year,
-        "month": last_month,
-        "children": snapshot,
-        "totalSum": total_sum,
-    })
-    _write_json("monthly_results", results)
+    _save_month(last_year, last_month, snapshot)
     for i in range(len(children)):
         children[i] = {**children[i], "balance": 0}
     _write_json("children", children)
+    _children_balances_reset()
     _write_json("last_month_reset", {"year": now_year, "month": now_month})
 
 
 def get_children():
     try:
-        _ensure_defaults()
         ensure_monthly_reset_done()
         data = _read_json("children")
         return data if isinstance(data, list) else []
@@ -213,22 +841,242 @@ def get_children():
         return []
 
 
-def get_events():
-    _ensure_defaults()
+def _get_raw_events():
+    """Все события как есть в events.json, включая события удалённых детей (для записи обратно)."""
     return _read_json("events")
 
 
+def _max_event_seq(events):
+    """Наибольший номер события в журнале: поле seq или число в старых id (ev_N_..., adj_..._N)."""
+    best = len(events)
+    for e in events:
+        seq = e.get("seq")
+        if isinstance(seq, int):
+            best = max(best, seq)
+            continue
+        parts = (e.get("id") or "").split("_")
+        if parts[0] == "ev" and len(parts) > 1 and parts[1].isdigit():
+            best = max(best, int(parts[1]))
+        elif parts[0] == "adj" and parts[-1].isdigit():
+            best = max(best, int(parts[-1]))
+    return best
+
+
+def _next_event_seq(count=1):
+    """
+    Зарезервировать count номеров событий подряд и вернуть первый.
+    Счётчик хранится в event_seq.json и пишется атомарно с fsync до записи событий,
+    поэтому номера не повторяются даже после сбоя или удаления событий (номер может только пропасть).
+    Журнал событий читается только при первом запуске, когда счётчика ещё нет.
+    """
+    with _storage_lock():
+        data = _load_json_any("event_seq")
+        if isinstance(data, dict) and isinstance(data.get("seq"), int):
+            last = data["seq"]
+        else:
+            last = _max_event_seq(_get_raw_events())
+        _write_json_file("event_seq", {"seq": last + count}, fsync=True)
+    return last + 1
+
+
+def get_tombstones():
+    """Надгробия удалённых детей: {childId: deletedAt}. Их события скрыты до компактизации."""
+    return {t["childId"]: t.get("deletedAt", "") for t in (_read_json_any("tombstones") or [])}
+
+
+def _is_tombstoned(event, tombstones):
+    deleted_at = tombstones.get(event.get("childId"))
+    return deleted_at is not None and (event.get("timestamp") or "") <= deleted_at
+
+
+def get_events():
+    """События без событий удалённых детей (с учётом надгробий)."""
+    events = _get_raw_events()
+    tombstones = get_tombstones()
+    if not tombstones:
+        return events
+    return [e for e in events if not _is_tombstoned(e, tombstones)]
+
+
 def get_actions_config():
-    _ensure_defaults()
     return _read_json("actions_config")
 
 
+def _build_children_by_id(children):
+    return {c["id"]: c for c in children or []}
+
+
+def _build_children_by_group(children):
+    by_group = {}
+    for c in children or []:
+        by_group.setdefault(c.get("groupId"), []).append(c["id"])
+    return by_group
+
+
+def _build_actions_by_id(actions):
+    return {a["id"]: a for a in actions or []}
+
+
 def get_child_by_id(child_id):
-    children = get_children()
-    for c in children:
-        if c["id"] == child_id:
-            return c
-    return None
+    ensure_monthly_reset_done()
+    return _cached_index("children", "by_id", _build_children_by_id).get(child_id)
+
+
+def get_child_ids_in_group(group_id):
+    """id детей группы (по индексу, без прохода по всем детям)."""
+    ensure_monthly_reset_done()
+    by_group = _cached_index("children", "by_group", _build_children_by_group)
+    with _index_lock:
+        return list(by_group.get(group_id, []))
+
+
+def _children_balance_changed(child_id, balance):
+    """
+    Заплатки индексов children.json после изменения баланса одного ребёнка (состав групп не меняется)
+    и запись в журнал изменений детей.
+    """
+    def set_balance(by_id):
+        if child_id in by_id:
+            by_id[child_id] = {**by_id[child_id], "balance": balance}
+    _patch_index("children", "by_id", set_balance)
+    _patch_index("children", "by_group", lambda by_group: None)
+    _patch_index("children", "leaderboard", lambda lb: lb.set_balance(child_id, balance))
+    _log_child_change(child_id)
+
+
+def _children_balances_reset():
+    """Заплатки индексов children.json после обнуления всех балансов (сброс месяца); киоскам — полная пересинхронизация."""
+    def reset(by_id):
+        for cid, c in by_id.items():
+            by_id[cid] = {**c, "balance": 0}
+    _patch_index("children", "by_id", reset)
+    _patch_index("children", "by_group", lambda by_group: None)
+    _patch_index("children", "leaderboard", Leaderboard.reset_balances)
+    _log_child_change(None, reset=True)
+
+
+def _children_removed(child_id, group_id):
+    """Заплатки индексов children.json после удаления ребёнка (group_id — его группа)."""
+    def remove_from_groups(by_group):
+        for ids in by_group.values():
+            if child_id in ids:
+                ids.remove(child_id)
+    _patch_index("children", "by_id", lambda by_id: by_id.pop(child_id, None))
+    _patch_index("children", "by_group", remove_from_groups)
+    _patch_index("children", "leaderboard", lambda lb: lb.remove(child_id))
+    _log_child_change(child_id, groups=[group_id])
+
+
+# --- Журнал изменений детей: дельта-синхронизация киосков (/children/changes) ---
+
+CHILD_CHANGES_MAX = getattr(settings, "CHILD_CHANGES_MAX", 2000)
+
+
+class ChildChanges:
+    """
+    Журнал child_changes.json в памяти: записи {"seq", "childId", "groups"?} или {"seq", "reset": true}
+    по возрастанию seq и список seq для bisect. groups — группы, которых изменение касается помимо
+    текущей группы ребёнка (прежняя при переводе, группа удалённого ребёнка).
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries or [])
+        self.seqs = [e["seq"] for e in self.entries]
+
+    @property
+    def seq(self):
+        return self.seqs[-1] if self.seqs else 0
+
+    def add(self, entry):
+        self.entries.append(entry)
+        self.seqs.append(entry["seq"])
+
+    def trim(self, keep):
+        del self.entries[:-keep]
+        del self.seqs[:-keep]
+
+    def since(self, seq):
+        """Записи после seq или None, если их уже нет в журнале (обрезан) или между ними сброс месяца."""
+        if seq > self.seq or (self.seqs and self.seqs[0] > seq + 1):
+            return None
+        entries = self.entries[bisect_left(self.seqs, seq + 1):]
+        if any(e.get("reset") for e in entries):
+            return None
+        return entries
+
+
+def _log_child_change(child_id, groups=None, reset=False):
+    """
+    Дописать изменение ребёнка в child_changes.json в текущей транзакции (номер — следующий seq).
+    reset — изменились все дети (сброс месяца): клиенты с более ранним seq получат полный список.
+    Журнал хранит последние CHILD_CHANGES_MAX записей (обрезается пачкой, когда превышен на 10%).
+    """
+    entries = _read_json_any("child_changes", [])
+    entry = {"seq": (entries[-1]["seq"] if entries else 0) + 1}
+    if reset:
+        entry["reset"] = True
+    else:
+        entry["childId"] = child_id
+        if groups:
+            entry["groups"] = [g for g in groups if g]
+    entries.append(entry)
+    _log_append("child_changes", entries, entry)
+    _patch_index("child_changes", "log", lambda idx: idx.add(entry))
+    if len(entries) > CHILD_CHANGES_MAX + CHILD_CHANGES_MAX // 10:
+        del entries[:-CHILD_CHANGES_MAX]
+        _patch_index("child_changes", "log", lambda idx: idx.trim(CHILD_CHANGES_MAX))
+    _write_json("child_changes", entries)
+
+
+def get_children_changes(since=None, group_id=None):
+    """
+    Дети, изменённые после номера since (в группе group_id, если задана):
+    {"seq": текущий номер, "full": False, "children": [...], "removed": [id]}.
+    Если since не задан, журнал уже обрезан или после since был сброс месяца — полный список
+    с "full": True. Номер берётся до чтения детей: изменение, попавшее между ними, придёт повторно.
+    """
+    ensure_monthly_reset_done()
+    log = _cached_index("child_changes", "log", ChildChanges)
+    with _index_lock:
+        seq = log.seq
+        entries = None if since is None else log.since(since)
+    if entries is None:
+        children = get_children()
+        if group_id:
+            children = [c for c in children if c.get("groupId") == group_id]
+        return {"seq": seq, "full": True, "children": children, "removed": []}
+    touched = {}
+    for e in entries:
+        touched.setdefault(e["childId"], set()).update(e.get("groups") or ())
+    by_id = _cached_index("children", "by_id", _build_children_by_id)
+    changed, removed = [], []
+    for cid, groups in touched.items():
+        child = by_id.get(cid)
+        if child is not None and (not group_id or child.get("groupId") == group_id):
+            changed.append(child)
+        elif not group_id or group_id in groups:
+            removed.append(cid)
+    return {"seq": seq, "full": False, "children": changed, "removed": removed}
+
+
+def get_kiosk_bootstrap(group_id):
+    """
+    Всё для старта киоска группы одним вызовом: {"group", "children", "actions", "seq"} или None, если группы нет.
+    Дети — по индексам групп и id, без прохода по всем детям; seq — номер журнала изменений детей
+    для последующих запросов /children/changes (берётся до чтения детей, как в get_children_changes).
+    """
+    ensure_monthly_reset_done()
+    group = next((g for g in get_groups() if g["id"] == group_id), None)
+    if group is None:
+        return None
+    log = _cached_index("child_changes", "log", ChildChanges)
+    with _index_lock:
+        seq = log.seq
+    by_group = _cached_index("children", "by_group", _build_children_by_group)
+    by_id = _cached_index("children", "by_id", _build_children_by_id)
+    with _index_lock:
+        children = [by_id[cid] for cid in by_group.get(group_id, []) if cid in by_id]
+    return {"group": group, "children": children, "actions": get_actions_config(), "seq": seq}
 
 
 def _event_date(ts):
@@ -236,32 +1084,92 @@ def _event_date(ts):
     return (ts or "")[:10]
 
 
+class EventIndex:
+    """
+    Вторичные индексы событий: общий массив по времени и массивы по каждому ребёнку.
+    Ключ события — (timestamp, -позиция в файле): в массивах при равном времени позже записанное
+    событие стоит раньше. Выборка идёт с конца: новые по времени сверху, а равные по времени —
+    в порядке файла, как у прежнего sorted(..., key=timestamp, reverse=True).
+    Период выбирается bisect по ключам, новые события вставляются заплатками из транзакций.
+    """
+
+    def __init__(self, events):
+        events = events or []
+        self.count = len(events)
+        self.keys = []
+        self.events = []
+        self.by_child = {}
+        order = sorted(((e.get("timestamp") or "", -i), e) for i, e in enumerate(events))
+        for key, e in order:
+            self.keys.append(key)
+            self.events.append(e)
+            keys, items = self.by_child.setdefault(e.get("childId"), ([], []))
+            keys.append(key)
+            items.append(e)
+
+    def add(self, event):
+        key = (event.get("timestamp") or "", -self.count)
+        self.count += 1
+        for keys, items in (self.keys, self.events), self.by_child.setdefault(event.get("childId"), ([], [])):
+            i = bisect_left(keys, key)
+            keys.insert(i, key)
+            items.insert(i, event)
+
+    @staticmethod
+    def _bounds(keys, from_date, to_date):
+        lo = bisect_left(keys, (from_date,)) if from_date else 0
+        hi = bisect_left(keys, (to_date + "~",)) if to_date else len(keys)
+        return lo, hi
+
+    def select(self, from_date=None, to_date=None, child_ids=None):
+        """События за период (даты включительно), новые сверху; child_ids — только этих детей."""
+        if child_ids is None:
+            lo, hi = self._bounds(self.keys, from_date, to_date)
+            return self.events[lo:hi][::-1]
+        ranges = []
+        for cid in child_ids:
+            keys, items = self.by_child.get(cid, ((), ()))
+            lo, hi = self._bounds(keys, from_date, to_date)
+            if lo < hi:
+                ranges.append((keys, items, lo, hi))
+        if len(ranges) <= 1:
+            return [e for keys, items, lo, hi in ranges for e in items[lo:hi][::-1]]
+        # Начинаем с меньшего: слияние массивов детей или отбор по общему массиву за период
+        lo, hi = self._bounds(self.keys, from_date, to_date)
+        if hi - lo <= sum(r[3] - r[2] for r in ranges):
+            wanted = set(child_ids)
+            return [e for e in self.events[lo:hi][::-1] if e.get("childId") in wanted]
+        merged = heapq.merge(*(zip(keys[lo:hi], items[lo:hi]) for keys, items, lo, hi in ranges))
+        return [e for _, e in merged][::-1]
+
+
+def _select_events(from_date=None, to_date=None, child_ids=None):
+    """Выборка по EventIndex без событий удалённых детей (с учётом надгробий)."""
+    index = _cached_index("events", "by_time", EventIndex)
+    tombstones = get_tombstones()
+    with _index_lock:
+        events = index.select(from_date, to_date, child_ids)
+    if not tombstones:
+        return events
+    return [e for e in events if not _is_tombstoned(e, tombstones)]
+
+
 def get_events_for_child(child_id, from_date=None, to_date=None):
-    events = get_events()
-    out = [e for e in events if e.get("childId") == child_id]
-    if from_date:
-        out = [e for e in out if _event_date(e.get("timestamp")) >= from_date]
-    if to_date:
-        out = [e for e in out if _event_date(e.get("timestamp")) <= to_date]
-    return sorted(out, key=lambda x: x.get("timestamp", ""), reverse=True)
+    return _select_events(from_date, to_date, [child_id])
 
 
 def get_all_events(from_date=None, to_date=None, group_id=None, child_id=None):
-    events = get_events()
     children = get_children()
     actions = get_actions_config()
     children_dict = {c["id"]: c.get("fullName", c["id"]) for c in children}
     actions_dict = {a["id"]: a.get("name", a["id"]) for a in actions}
     actions_dict["balance_adjust"] = "Корректировка баланса"
-    if from_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) >= from_date]
-    if to_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) <= to_date]
+    child_ids = None
     if group_id:
-        child_ids_in_group = {c["id"] for c in children if c.get("groupId") == group_id}
-        events = [e for e in events if e.get("childId") in child_ids_in_group]
+        child_ids = get_child_ids_in_group(group_id)
     if child_id:
-        events = [e for e in events if e.get("childId") == child_id]
+        child_ids = [child_id] if child_ids is None or child_id in child_ids else []
+    events = _select_events(from_date, to_date, child_ids)
     # Добавляем ФИО ребёнка и название действия к каждому событию
     result = []
     for e in events:
@@ -269,25 +1177,87 @@ def get_all_events(from_date=None, to_date=None, group_id=None, child_id=None):
         event["childName"] = children_dict.get(e.get("childId"), e.get("childId"))
         event["actionName"] = actions_dict.get(e.get("actionId"), e.get("actionId"))
         result.append(event)
-    return sorted(result, key=lambda x: x.get("timestamp", ""), reverse=True)
+    return result
 
 
 def _today_iso():
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def process_interaction(child_id, action_id):
+# --- Ключи идемпотентности начислений: повтор запроса (киоск не получил ответ) не начисляет второй раз ---
+
+IDEMPOTENCY_TTL = getattr(settings, "IDEMPOTENCY_TTL", 24 * 3600)
+IDEMPOTENCY_MAX_KEYS = getattr(settings, "IDEMPOTENCY_MAX_KEYS", 5000)
+
+
+def _build_idempotency_index(entries):
+    return {e["key"]: e for e in entries or []}
+
+
+def _idempotent_result(key, child_id, action_id):
+    """Результат уже обработанного запроса с ключом key или None, если ключ новый (или устарел по TTL)."""
+    entry = _cached_index("idempotency", "by_key", _build_idempotency_index).get(key)
+    if entry is None or time.time() - entry["at"] > IDEMPOTENCY_TTL:
+        return None
+    if (entry["childId"], entry["actionId"]) != (child_id, action_id):
+        return {"success": False, "credited": 0, "new_balance": 0, "reason": "idempotency_key_reused"}
+    return {**entry["result"], "replayed": True}
+
+
+def _remember_result(key, child_id, action_id, result):
+    """
+    Сохранить результат под ключом key в той же транзакции, что и начисление.
+    Записи идут по времени: устаревшие по IDEMPOTENCY_TTL и сверх IDEMPOTENCY_MAX_KEYS вытесняются с начала.
+    """
+    now = time.time()
+    entries = _read_json_any("idempotency", [])
+    start = 0
+    while start < len(entries) and entries[start]["at"] < now - IDEMPOTENCY_TTL:
+        start += 1
+    start = max(start, len(entries) + 1 - IDEMPOTENCY_MAX_KEYS)
+    dropped = [e["key"] for e in entries[:start]]
+    entry = {"key": key, "at": round(now, 3), "childId": child_id, "actionId": action_id, "result": result}
+    entries = entries[start:] + [entry]
+    _write_json("idempotency", entries)
+
+    def patch(index):
+        for k in dropped:
+            index.pop(k, None)
+        index[key] = entry
+    _patch_index("idempotency", "by_key", patch)
+
+
+def get_idempotent_result(idempotency_key, child_id, action_id):
+    """
+    Сохранённый ответ на запрос с этим ключом (повтор или чужой ключ — idempotency_key_reused) или None.
+    Проверка до лимитера: повтор уже выполненного запроса получает свой ответ, а не 429.
+    """
+    return _idempotent_result(idempotency_key, child_id, action_id)
+
+
+@transactional
+def process_interaction(child_id, action_id, idempotency_key=None):
     """
     Обработать взаимодействие: проверить cooldown и лимиты, начислить монеты, записать событие.
     Возвращает: {"success": bool, "credited": int, "new_balance": int, "reason": str}
+    С idempotency_key повтор того же запроса возвращает сохранённый результат (с "replayed": true),
+    не читая и не меняя children.json и events.json.
     """
-    _ensure_defaults()
+    if not idempotency_key:
+        return _process_interaction(child_id, action_id)
+    result = _idempotent_result(idempotency_key, child_id, action_id)
+    if result is None:
+        result = _process_interaction(child_id, action_id)
+        _remember_result(idempotency_key, child_id, action_id, result)
+    return result
+
+
+def _process_interaction(child_id, action_id):
     child = get_child_by_id(child_id)
     if not child:
         return {"success": False, "credited": 0, "new_balance": 0, "reason": "child_not_found"}
 
-    actions = {a["id"]: a for a in get_actions_config()}
-    action = actions.get(action_id)
+    action = _cached_index("actions_config", "by_id", _build_actions_by_id).get(action_id)
     if not action:
         return {"success": False, "credited": 0, "new_balance": child["balance"], "reason": "unknown_action"}
 
@@ -295,7 +1265,7 @@ def process_interaction(child_id, action_id):
     cooldown_sec = action.get("cooldown_sec", 30)
     daily_limit = action.get("daily_limit_coins", 20)
 
-    events = get_events()
+    events = _get_raw_events()
     now = datetime.now()
     today = _today_iso()
     now_ts = now.isoformat()
@@ -336,8 +1306,10 @@ def process_interaction(child_id, action_id):
         }
 
     new_balance = child["balance"] + coins
+    seq = _next_event_seq()
     event = {
-        "id": f"ev_{len(events) + 1}_{child_id}_{action_id}",
+        "id": f"ev_{seq}_{child_id}_{action_id}",
+        "seq": seq,
         "childId": child_id,
         "actionId": action_id,
         "credited": coins,
@@ -351,9 +1323,12 @@ def process_interaction(child_id, action_id):
             children[i] = {**c, "balance": new_balance}
             break
     _write_json("children", children)
+    _children_balance_changed(child_id, new_balance)
 
     events.append(event)
     _write_json("events", events)
+    _log_append("events", events, event)
+    _events_index_add(event)
 
     return {
         "success": True,
@@ -363,51 +1338,77 @@ def process_interaction(child_id, action_id):
     }
 
 
+def _events_in_period(from_date=None, to_date=None):
+    """События за период без событий удалённых детей: диапазон по EventIndex, без разбора events.json."""
+    return _select_events(from_date, to_date)
+
+
+def _credited_by_child(events):
+    """Один проход по событиям: {childId: [начислено, число событий]}."""
+    totals = {}
+    for e in events:
+        cell = totals.get(e.get("childId"))
+        if cell is None:
+            cell = totals[e.get("childId")] = [0, 0]
+        cell[0] += e.get("credited", 0)
+        cell[1] += 1
+    return totals
+
+
+@_report_cache("groups", "children", "events", "tombstones")
 def get_stats_groups(from_date=None, to_date=None):
     groups = get_groups()
-    children = get_children()
-    events = get_events()
-    if from_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) >= from_date]
-    if to_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) <= to_date]
+    ensure_monthly_reset_done()
+    totals = _credited_by_child(_events_in_period(from_date, to_date))
+    return _stats_groups_rows(groups, totals)
+
 
+def _stats_groups_rows(groups, totals):
+    """Строки статистики групп: число детей, сумма балансов и начислено за период (totals — _credited_by_child)."""
+    by_id = _cached_index("children", "by_id", _build_children_by_id)
+    by_group = _cached_index("children", "by_group", _build_children_by_group)
     result = []
-    for g in groups:
-        gid = g["id"]
-        kids = [c for c in children if c.get("groupId") == gid]
-        total_balance = sum(c.get("balance", 0) for c in kids)
-        period_credited = sum(e.get("credited", 0) for e in events if e.get("childId") in {c["id"] for c in kids})
-        result.append({
-            "groupId": gid,
-            "groupName": g.get("name", gid),
-            "childrenCount": len(kids),
-            "totalBalance": total_balance,
-            "periodCredited": period_credited,
-        })
+    with _index_lock:
+        for g in groups:
+            gid = g["id"]
+            kid_ids = by_group.get(gid, [])
+            result.append({
+                "groupId": gid,
+                "groupName": g.get("name", gid),
+                "childrenCount": len(kid_ids),
+                "totalBalance": sum(by_id[cid].get("balance", 0) for cid in kid_ids),
+                "periodCredited": sum(totals.get(cid, (0, 0))[0] for cid in kid_ids),
+            })
     return result
 
 
+@_report_cache("children", "groups", "events", "tombstones")
 def get_stats_children(group_id=None, q=None, from_date=None, to_date=None):
-    children = get_children()
+    children = _children_of(group_id)
     groups = get_groups()
-    groups_dict = {g["id"]: g.get("name", g["id"]) for g in groups}
-    events = get_events()
-    if from_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) >= from_date]
-    if to_date:
-        events = [e for e in events if _event_date(e.get("timestamp")) <= to_date]
-    if group_id:
-        children = [c for c in children if c.get("groupId") == group_id]
     if q:
         ql = q.lower()
         children = [c for c in children if ql in (c.get("fullName") or "").lower()]
+    totals = _credited_by_child(_events_in_period(from_date, to_date))
+    return _stats_children_rows(children, groups, totals)
+
+
+def _children_of(group_id=None):
+    """Дети группы (по индексу) или все дети, если group_id не задан."""
+    if not group_id:
+        return get_children()
+    by_id = _cached_index("children", "by_id", _build_children_by_id)
+    ids = get_child_ids_in_group(group_id)
+    with _index_lock:
+        return [by_id[cid] for cid in ids if cid in by_id]
+
 
+def _stats_children_rows(children, groups, totals):
+    groups_dict = {g["id"]: g.get("name", g["id"]) for g in groups}
     result = []
     for c in children:
         cid = c["id"]
-        child_events = [e for e in events if e.get("childId") == cid]
-        period_credited = sum(e.get("credited", 0) for e in child_events)
+        period_credited, actions_count = totals.get(cid, (0, 0))
         result.append({
             "id": cid,
             "fullName": c.get("fullName", ""),
@@ -415,11 +1416,230 @@ def get_stats_children(group_id=None, q=None, from_date=None, to_date=None):
             "groupName": groups_dict.get(c.get("groupId"), c.get("groupId")),
             "balance": c.get("balance", 0),
             "periodCredited": period_credited,
-            "actionsCount": len(child_events),
+            "actionsCount": actions_count,
         })
     return result
 
 
+@_report_cache("groups", "children", "events", "tombstones", "monthly_index")
+def get_dashboard(from_date=None, to_date=None, group_id=None, q=None, scope_group=None):
+    """
+    Стартовая страница админки одним вызовом: группы, статистика групп и детей за период
+    (один проход по событиям на обе) и итоги месяцев.
+    scope_group — группа воспитателя: список групп и их статистика только по ней;
+    group_id — фильтр статистики детей и итогов месяцев, q — поиск детей по ФИО.
+    """
+    all_groups = get_groups()
+    groups = [g for g in all_groups if g["id"] == scope_group] if scope_group else all_groups
+    children = _children_of(group_id)
+    if q:
+        ql = q.lower()
+        children = [c for c in children if ql in (c.get("fullName") or "").lower()]
+    totals = _credited_by_child(_events_in_period(from_date, to_date))
+    return {
+        "groups": groups,
+        "statsGroups": _stats_groups_rows(groups, totals),
+        "statsChildren": _stats_children_rows(children, all_groups, totals),
+        "monthlyResults": get_monthly_results(group_id=group_id),
+    }
+
+
+# --- Рейтинг (лидерборд) по группам и по всему саду ---
+
+LEADERBOARD_ALL = "*"
+
+
+class Leaderboard:
+    """
+    Рейтинг детей по балансу: отсортированный список (-balance, childId) на каждую группу
+    и общий по саду. Топ-K — срез за O(K), изменение баланса — bisect за O(log n)
+    (плюс сдвиг элементов списка). Строится из children.json и обновляется заплатками
+    из транзакций (process_interaction, adjust_balance, сброс месяца).
+    """
+
+    def __init__(self, children):
+        self.entries = {}
+        self.ranks = {LEADERBOARD_ALL: []}
+        for c in children or []:
+            self.entries[c["id"]] = {"fullName": c.get("fullName", ""), "groupId": c.get("groupId"), "balance": c.get("balance", 0)}
+        for cid, e in self.entries.items():
+            for scope in self._scopes(e):
+                self.ranks.setdefault(scope, []).append((-e["balance"], cid))
+        for lst in self.ranks.values():
+            lst.sort()
+
+    @staticmethod
+    def _scopes(entry):
+        return (LEADERBOARD_ALL, entry["groupId"]) if entry["groupId"] else (LEADERBOARD_ALL,)
+
+    def _remove(self, cid):
+        e = self.entries.pop(cid, None)
+        if e is None:
+            return None
+        for scope in self._scopes(e):
+            lst = self.ranks.get(scope, [])
+            i = bisect_left(lst, (-e["balance"], cid))
+            if i < len(lst) and lst[i] == (-e["balance"], cid):
+                del lst[i]
+        return e
+
+    def set_balance(self, cid, balance):
+        e = self._remove(cid)
+        if e is None:
+            return
+        e = {**e, "balance": balance}
+        self.entries[cid] = e
+        for scope in self._scopes(e):
+            insort(self.ranks.setdefault(scope, []), (-balance, cid))
+
+    def remove(self, cid):
+        self._remove(cid)
+
+    def reset_balances(self):
+        for e in self.entries.values():
+            e["balance"] = 0
+        for lst in self.ranks.values():
+            lst[:] = sorted((0, cid) for _, cid in lst)
+
+    def top(self, group_id=None, limit=10):
+        out = []
+        for rank, (neg_balance, cid) in enumerate(self.ranks.get(group_id or LEADERBOARD_ALL, [])[:limit], start=1):
+            e = self.entries[cid]
+            out.append({"rank": rank, "id": cid, "fullName": e["fullName"], "groupId": e["groupId"], "balance": -neg_balance})
+        return out
+
+
+def get_leaderboard(group_id=None, limit=10):
+    """Топ детей по балансу в группе (или по всему саду, если group_id не задан)."""
+    ensure_monthly_reset_done()
+    leaderboard = _cached_index("children", "leaderboard", Leaderboard)
+    with _index_lock:
+        return leaderboard.top(group_id, limit)
+
+
+# --- Дневные агрегаты событий (для графиков активности) ---
+
+class DailyBuckets:
+    """
+    Агрегаты событий по дням: totals[day][actionId] и by_child[day][childId][actionId] = [coins, count],
+    плюс отсортированный список дней для выборки диапазона через bisect. Строится одним проходом
+    по events.json, новые события добавляются заплатками из транзакций.
+    """
+
+    def __init__(self, events):
+        self.totals = {}
+        self.by_child = {}
+        self.days = []
+        for e in events or []:
+            self.add(e)
+
+    def add(self, event):
+        day = _event_date(event.get("timestamp"))
+        if not day:
+            return
+        if day not in self.totals:
+            self.totals[day] = {}
+            self.by_child[day] = {}
+            insort(self.days, day)
+        aid = event.get("actionId")
+        credited = event.get("credited", 0)
+        for cell in (
+            self.totals[day].setdefault(aid, [0, 0]),
+            self.by_child[day].setdefault(event.get("childId"), {}).setdefault(aid, [0, 0]),
+        ):
+            cell[0] += credited
+            cell[1] += 1
+
+    def days_between(self, from_date=None, to_date=None):
+        lo = bisect_left(self.days, from_date) if from_date else 0
+        hi = bisect_left(self.days, to_date + "~") if to_date else len(self.days)
+        return self.days[lo:hi]
+
+
+def _sum_actions(per_action, action_id, sign=1):
+    coins = count = 0
+    for aid, (c, n) in per_action.items():
+        if action_id and aid != action_id:
+            continue
+        coins += c
+        count += n
+    return sign * coins, sign * count
+
+
+def _events_index_add(event):
+    """Дописанное событие — заплатками в дневные агрегаты и индекс по времени."""
+    _patch_index("events", "daily_buckets", lambda idx: idx.add(event))
+    _patch_index("events", "by_time", lambda idx: idx.add(event))
+
+
+# Наибольшее число интервалов в ответе get_stats_timeseries: дни примерно за 2,7 года, недели — за 19 лет
+TIMESERIES_MAX_BUCKETS = 1000
+
+
+def _bucket_start(day, bucket):
+    if bucket == "week":
+        d = date.fromisoformat(day)
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return day
+
+
+def get_stats_timeseries(from_date=None, to_date=None, group_id=None, action_id=None, bucket="day"):
+    """
+    Монеты и число действий по дням или неделям (bucket = "day" | "week") за период,
+    с фильтром по группе и действию. Считается по дневным агрегатам (DailyBuckets), без прохода по событиям.
+    Пустые интервалы внутри периода возвращаются с нулями.
+    ValueError — если в периоде больше TIMESERIES_MAX_BUCKETS интервалов.
+    """
+    index = _cached_index("events", "daily_buckets", DailyBuckets)
+    tombstones = get_tombstones()
+    child_ids = None
+    if group_id:
+        child_ids = set(get_child_ids_in_group(group_id))
+    with _index_lock:
+        return _timeseries(index, tombstones, child_ids, from_date, to_date, action_id, bucket)
+
+
+def _timeseries(index, tombstones, child_ids, from_date, to_date, action_id, bucket):
+    """Точки get_stats_timeseries по DailyBuckets (вызывается под _index_lock)."""
+    days = index.days_between(from_date, to_date)
+    start = from_date or (days[0] if days else _today_iso())
+    end = to_date or _today_iso()
+    series = {}
+    d = date.fromisoformat(_bucket_start(start, bucket))
+    step = timedelta(days=7 if bucket == "week" else 1)
+    count = (date.fromisoformat(end) - d).days // step.days + 1
+    if count > TIMESERIES_MAX_BUCKETS:
+        raise ValueError(
+            f"Слишком длинный период: {count} интервалов ({bucket}), допустимо не больше {TIMESERIES_MAX_BUCKETS}"
+        )
+    while d.isoformat() <= end:
+        series[d.isoformat()] = {"date": d.isoformat(), "coins": 0, "actions": 0}
+        d += step
+    for day in days:
+        point = series.get(_bucket_start(day, bucket))
+        if point is None:
+            continue
+        day_children = index.by_child[day]
+        if child_ids is None:
+            # Весь сад: готовые дневные итоги минус события удалённых детей
+            parts = [_sum_actions(index.totals[day], action_id)]
+            for cid, deleted_at in tombstones.items():
+                if cid in day_children and day <= deleted_at[:10]:
+                    parts.append(_sum_actions(day_children[cid], action_id, sign=-1))
+        else:
+            small, large = (child_ids, day_children) if len(child_ids) < len(day_children) else (day_children, child_ids)
+            parts = [
+                _sum_actions(day_children[cid], action_id)
+                for cid in small
+                if cid in large and not (cid in tombstones and day <= tombstones[cid][:10])
+            ]
+        for coins, count in parts:
+            point["coins"] += coins
+            point["actions"] += count
+    return {"bucket": bucket, "from": start, "to": end, "series": list(series.values())}
+
+
+@transactional
 def adjust_balance(child_id, delta, comment, admin_username):
     child = get_child_by_id(child_id)
     if not child:
@@ -431,9 +1651,12 @@ def adjust_balance(child_id, delta, comment, admin_username):
             children[i] = {**c, "balance": new_balance}
             break
     _write_json("children", children)
-    events = get_events()
+    _children_balance_changed(child_id, new_balance)
+    events = _get_raw_events()
+    seq = _next_event_seq()
     events.append({
-        "id": f"adj_{child_id}_{len(events) + 1}",
+        "id": f"adj_{child_id}_{seq}",
+        "seq": seq,
         "childId": child_id,
         "actionId": "balance_adjust",
         "credited": delta,
@@ -442,24 +1665,76 @@ def adjust_balance(child_id, delta, comment, admin_username):
         "meta": {"comment": comment, "admin": admin_username},
     })
     _write_json("events", events)
+    _log_append("events", events, events[-1])
+    _events_index_add(events[-1])
     return new_balance
 
 
+@transactional
+def adjust_group_balance(group_id, delta, comment, admin_username):
+    """
+    Корректировка баланса всех детей группы одной транзакцией: children.json и events.json
+    записываются по одному разу. Возвращает [{"childId", "new_balance"}] или None, если группы нет.
+    """
+    if not any(g["id"] == group_id for g in get_groups()):
+        return None
+    children = get_children()
+    events = _get_raw_events()
+    now_ts = datetime.now().isoformat()
+    result = []
+    members = [i for i, c in enumerate(children) if c.get("groupId") == group_id]
+    seq = _next_event_seq(len(members)) if members else 0
+    for i in members:
+        c = children[i]
+        new_balance = max(0, c.get("balance", 0) + delta)
+        children[i] = {**c, "balance": new_balance}
+        _children_balance_changed(c["id"], new_balance)
+        events.append({
+            "id": f"adj_{c['id']}_{seq}",
+            "seq": seq,
+            "childId": c["id"],
+            "actionId": "balance_adjust",
+            "credited": delta,
+            "timestamp": now_ts,
+            "balanceAfter": new_balance,
+            "meta": {"comment": comment, "admin": admin_username},
+        })
+        _log_append("events", events, events[-1])
+        _events_index_add(events[-1])
+        seq += 1
+        result.append({"childId": c["id"], "new_balance": new_balance})
+    if result:
+        _write_json("children", children)
+        _write_json("events", events)
+    return result
+
+
 # --- CRUD групп и детей (админ) ---
 
+def _new_id(prefix, taken):
+    """Новый id вида {prefix}_{timestamp}, уникальный относительно taken (при совпадении — суффикс _2, _3, ...)."""
+    base = f"{prefix}_{int(datetime.now().timestamp())}"
+    new_id = base
+    n = 1
+    while new_id in taken:
+        n += 1
+        new_id = f"{base}_{n}"
+    return new_id
+
+
+@transactional
 def create_group(name):
     """Создать группу. Возвращает id или None при ошибке."""
-    _ensure_defaults()
     groups = get_groups()
-    gid = f"group_{int(datetime.now().timestamp())}"
+    gid = _new_id("group", {g["id"] for g in groups})
     groups.append({"id": gid, "name": (name or "").strip() or "Новая группа"})
     _write_json("groups", groups)
     return gid
 
 
+@transactional
 def update_group(group_id, name):
     """Обновить название группы. Возвращает True/False."""
-    _ensure_defaults()
     groups = get_groups()
     for i, g in enumerate(groups):
         if g["id"] == group_id:
@@ -469,9 +1744,9 @@ def update_group(group_id, name):
     return False
 
 
+@transactional
 def delete_group(group_id):
     """Удалить группу. Возвращает True или строку с ошибкой (если в группе есть дети)."""
-    _ensure_defaults()
     children = get_children()
     if any(c.get("groupId") == group_id for c in children):
         return "В группе есть дети. Сначала переместите или удалите их."
@@ -481,14 +1756,14 @@ def delete_group(group_id):
     return True
 
 
+@transactional
 def create_child(full_name, group_id):
     """Создать ребёнка. group_id может быть пустым. Возвращает id или None."""
-    _ensure_defaults()
     groups = get_groups()
     if group_id and not any(g["id"] == group_id for g in groups):
         return None
     children = get_children()
-    cid = f"child_{int(datetime.now().timestamp())}"
+    cid = _new_id("child", {c["id"] for c in children})
     children.append({
         "id": cid,
         "fullName": (full_name or "").strip() or "Без имени",
@@ -497,12 +1772,99 @@ def create_child(full_name, group_id):
         "avatar": None,
     })
     _write_json("children", children)
+    _log_child_change(cid)
     return cid
 
 
+CSV_NAME_COLUMNS = ("fullname", "full_name", "фио", "имя")
+CSV_GROUP_COLUMNS = ("group", "groupname", "group_name", "группа")
+
+
+def parse_children_csv(text):
+    """
+    Разобрать CSV со столбцами «ФИО» и «группа» (разделитель , ; или таб; заголовок необязателен).
+    Возвращает список {"line", "fullName", "group"}.
+    """
+    text = (text or "").lstrip("\ufeff")
+    lines = text.splitlines()
+    if not lines:
+        return []
+    try:
+        dialect = csv.Sniffer().sniff(lines[0], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    name_col, group_col = 0, 1
+    start = 0
+    if rows:
+        header = [(h or "").strip().lower() for h in rows[0]]
+        if any(h in CSV_NAME_COLUMNS for h in header):
+            name_col = next(i for i, h in enumerate(header) if h in CSV_NAME_COLUMNS)
+            group_col = next((i for i, h in enumerate(header) if h in CSV_GROUP_COLUMNS), None)
+            start = 1
+    out = []
+    for line_no, row in enumerate(rows[start:], start=start + 1):
+        if not any((cell or "").strip() for cell in row):
+            continue
+        full_name = row[name_col].strip() if name_col < len(row) else ""
+        group = row[group_col].strip() if group_col is not None and group_col < len(row) else ""
+        out.append({"line": line_no, "fullName": full_name, "group": group})
+    return out
+
+
+@transactional
+def import_children(rows):
+    """
+    Массовое создание детей: rows — список {"line", "fullName", "group"} (group — название группы).
+    Недостающие группы создаются. Сначала проверяются все строки: при ошибках ничего не пишется
+    и возвращается {"errors": [{"line", "error"}]}. Иначе группы и дети сохраняются одной записью
+    каждого файла; возвращается {"created": [...], "groupsCreated": [...]}.
+    """
+    errors = []
+    for row in rows:
+        if not row.get("fullName"):
+            errors.append({"line": row.get("line"), "error": "Не указано ФИО"})
+    if not rows:
+        errors.append({"line": None, "error": "Нет строк для импорта"})
+    if errors:
+        return {"errors": errors}
+
+    groups = get_groups()
+    children = get_children()
+    group_by_name = {}
+    for g in groups:
+        group_by_name.setdefault((g.get("name") or "").strip().lower(), g["id"])
+    group_ids = {g["id"] for g in groups}
+    child_ids = {c["id"] for c in children}
+    groups_created = []
+    created = []
+    for row in rows:
+        group_name = row.get("group") or ""
+        gid = None
+        if group_name:
+            gid = group_by_name.get(group_name.lower())
+            if gid is None:
+                gid = _new_id("group", group_ids)
+                group_ids.add(gid)
+                group_by_name[group_name.lower()] = gid
+                groups.append({"id": gid, "name": group_name})
+                groups_created.append({"id": gid, "name": group_name})
+        cid = _new_id("child", child_ids)
+        child_ids.add(cid)
+        child = {"id": cid, "fullName": row["fullName"], "groupId": gid, "balance": 0, "avatar": None}
+        children.append(child)
+        created.append({"id": cid, "fullName": child["fullName"], "groupId": gid})
+    if groups_created:
+        _write_json("groups", groups)
+    _write_json("children", children)
+    for child in created:
+        _log_child_change(child["id"])
+    return {"created": created, "groupsCreated": groups_created}
+
+
+@transactional
 def update_child(child_id, full_name, group_id):
     """Обновить ребёнка. group_id может быть None. Возвращает True/False."""
-    _ensure_defaults()
     children = get_children()
     for i, c in enumerate(children):
         if c["id"] == child_id:
@@ -512,40 +1874,162 @@ def update_child(child_id, full_name, group_id):
                 "groupId": group_id if group_id else None,
             }
             _write_json("children", children)
+            _log_child_change(child_id, groups=[c.get("groupId")])
             return True
     return False
 
 
+@transactional
 def delete_child(child_id):
-    """Удалить ребёнка и все его события. Возвращает True/False."""
-    _ensure_defaults()
+    """Удалить ребёнка. События не переписываются сразу: пишется надгробие, которое скрывает их
+    от чтения, а физически они удаляются в compact_events(). Возвращает True/False."""
     ensure_monthly_reset_done()
     children = _read_json("children")
-    orig_len = len(children)
-    children = [c for c in children if c["id"] != child_id]
-    if len(children) == orig_len:
+    child = next((c for c in children if c["id"] == child_id), None)
+    if child is None:
         return False
+    children = [c for c in children if c["id"] != child_id]
     _write_json("children", children)
-    events = get_events()
-    events = [e for e in events if e.get("childId") != child_id]
-    _write_json("events", events)
+    _children_removed(child_id, child.get("groupId"))
+    tombstones = [t for t in (_read_json_any("tombstones") or []) if t.get("childId") != child_id]
+    tombstones.append({"childId": child_id, "deletedAt": datetime.now().isoformat()})
+    _write_json("tombstones", tombstones)
     return True
 
 
+@transactional
+def compact_events():
+    """Физически удалить события, скрытые надгробиями, одним проходом по events.json.
+    Возвращает число удалённых событий."""
+    tombstones = get_tombstones()
+    if not tombstones:
+        return 0
+    events = _get_raw_events()
+    kept = [e for e in events if not _is_tombstoned(e, tombstones)]
+    removed = len(events) - len(kept)
+    if removed:
+        _write_json("events", kept)
+    _write_json("tombstones", [])
+    return removed
+
+
+# --- Итоги месяцев: индекс с суммами по группам и снимки детей по файлу на группу ---
+
+_MONTH_FILE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _month_group_key(year, month, file):
+    return f"{MONTHLY_DIR}/{year:04d}-{month:02d}/{file}"
+
+
+def _month_group_file(group_id, used):
+    """Имя файла группы в каталоге месяца: id группы, если он годится для имени файла, иначе хеш."""
+    if group_id is None:
+        name = "_nogroup"
+    elif _MONTH_FILE_RE.match(group_id):
+        name = group_id
+    else:
+        name = "g-" + hashlib.sha1(group_id.encode("utf-8")).hexdigest()[:12]
+    while name in used:
+        name += "_"
+    used.add(name)
+    return name
+
+
+def _save_month(year, month, children):
+    """
+    Сохранить итоги месяца (снимок детей на момент сброса): файл на каждую группу
+    и запись индекса monthly_index с суммами по группам. Месяц, уже бывший в индексе, заменяется,
+    а файлы его групп, которых нет в новой записи, удаляются.
+    """
+    by_group = {}
+    for c in children:
+        by_group.setdefault(c.get("groupId"), []).append(c)
+    groups = []
+    used = set()
+    old = next((e for e in _read_json_any("monthly_index", []) if (e.get("year"), e.get("month")) == (year, month)), None)
+    for group_id, rows in by_group.items():
+        file = _month_group_file(group_id, used)
+        _write_json(_month_group_key(year, month, file), rows)
+        groups.append({
+            "groupId": group_id,
+            "file": file,
+            "totalSum": sum(c.get("balance", 0) for c in rows),
+            "childrenCount": len(rows),
+        })
+    # Файлы групп прежней записи месяца, которых нет в новой, больше ни на что не ссылаются
+    for g in (old or {}).get("groups") or []:
+        if g.get("file") not in used:
+            _delete_json(_month_group_key(year, month, g["file"]))
+    index = [e for e in _read_json_any("monthly_index", []) if (e.get("year"), e.get("month")) != (year, month)]
+    index.append({
+        "year": year,
+        "month": month,
+        "totalSum": sum(g["totalSum"] for g in groups),
+        "childrenCount": len(children),
+        "groups": groups,
+    })
+    index.sort(key=lambda e: (e["year"], e["month"]))
+    _write_json("monthly_index", index)
+
+
+def _build_month_index(index):
+    return {(e.get("year"), e.get("month")): e for e in index or []}
+
+
+def _month_entry(year, month):
+    """Запись индекса за месяц (суммы по группам, имена файлов) или None."""
+    return _cached_index("monthly_index", "by_month", _build_month_index).get((year, month))
+
+
+def _month_groups(entry, group_id=None):
+    return [g for g in entry.get("groups") or [] if group_id is None or g.get("groupId") == group_id]
+
+
+def _month_children(entry, group_id=None):
+    """Снимок детей за месяц: читаются только файлы нужных групп."""
+    children = []
+    for g in _month_groups(entry, group_id):
+        children.extend(_read_json_any(_month_group_key(entry["year"], entry["month"], g["file"]), []))
+    return children
+
+
+def migrate_monthly_results():
+    """
+    Перенести итоги из прежнего monthly_results.json (все месяцы в одном файле) в индекс
+    и файлы по группам. Старый файл переименовывается в monthly_results.json.migrated после записи
+    новых файлов — внутри внешней транзакции только после её успешного завершения.
+    Возвращает число перенесённых месяцев или None, если старого файла нет.
+    """
+    legacy = current_data_dir() / LEGACY_MONTHLY_RESULTS
+    if not legacy.exists():
+        return None
+    with transaction():
+        with open(legacy, "r", encoding="utf-8") as f:
+            raw = f.read()
+        rows = json.loads(raw) if raw.strip() else []
+        for row in rows:
+            _save_month(row["year"], row["month"], row.get("children") or [])
+        if not rows and not _files()["monthly_index"].exists():
+            _write_json("monthly_index", [])
+        _on_commit(lambda: legacy.exists() and os.replace(legacy, legacy.with_name(legacy.name + ".migrated")))
+    return len(rows)
+
+
+@_report_cache("monthly_index")
 def get_monthly_results(group_id=None):
     """Список итогов по месяцам (year, month, children snapshot, totalSum), новые первые.
-    Если group_id задан — в каждой записи только дети этой группы и totalSum по группе."""
-    _ensure_defaults()
-    results = _read_json_any("monthly_results") or []
-    results = list(reversed(results))
-    if group_id:
-        out = []
-        for row in results:
-            children = [c for c in (row.get("children") or []) if c.get("groupId") == group_id]
-            total_sum = sum(c.get("balance", 0) for c in children)
-            out.append({**row, "children": children, "totalSum": total_sum})
-        return out
-    return results
+    Если group_id задан — в каждой записи только дети этой группы (читается только её файл) и totalSum по группе."""
+    out = []
+    for entry in reversed(_read_json_any("monthly_index", [])):
+        groups = _month_groups(entry, group_id or None)
+        out.append({
+            "year": entry["year"],
+            "month": entry["month"],
+            "children": _month_children(entry, group_id or None),
+            "totalSum": sum(g["totalSum"] for g in groups) if group_id else entry.get("totalSum", 0),
+        })
+    return out
 
 
 def _month_range(year, month):
@@ -559,32 +2043,27 @@ def _month_range(year, month):
     return from_date, to_date
 
 
+@_report_cache("monthly_index", "events", "tombstones", "children", "actions_config", "groups")
 def get_monthly_stats(year, month, group_id=None):
     """Расширенная статистика за один месяц: итоги, по действиям, топы по баллам и по активности.
-    Использует снимок из monthly_results для баллов и события за месяц для активности."""
-    _ensure_defaults()
+    Суммы по группам берутся из индекса итогов, снимок детей — из файлов нужных групп этого месяца,
+    события за месяц — для активности."""
     from_date, to_date = _month_range(year, month)
-    results = _read_json_any("monthly_results") or []
-    row = None
-    for r in reversed(results):
-        if r.get("year") == year and r.get("month") == month:
-            row = r
-            break
-    children_snapshot = (row.get("children") or []) if row else []
-    if group_id:
-        children_snapshot = [c for c in children_snapshot if c.get("groupId") == group_id]
-    total_coins = sum(c.get("balance", 0) for c in children_snapshot)
-    children_count = len(children_snapshot)
+    entry = _month_entry(year, month)
+    month_groups = _month_groups(entry, group_id or None) if entry else []
+    children_snapshot = _month_children(entry, group_id or None) if entry else []
+    total_coins = sum(g["totalSum"] for g in month_groups)
+    children_count = sum(g["childrenCount"] for g in month_groups)
     avg_coins = round(total_coins / children_count, 1) if children_count else 0
 
-    events = get_events()
-    events = [e for e in events if _event_date(e.get("timestamp")) >= from_date and _event_date(e.get("timestamp")) <= to_date]
+    child_ids_in_group = None
     if group_id:
         child_ids_in_group = {c.get("childId") for c in children_snapshot}
         if not child_ids_in_group:
             current_children = get_children()
             child_ids_in_group = {c["id"] for c in current_children if c.get("groupId") == group_id}
-        events = [e for e in events if e.get("childId") in child_ids_in_group]
+    # В хронологическом порядке, как в файле: порядок равных в топах не зависит от индекса
+    events = _select_events(from_date, to_date, child_ids_in_group)[::-1]
 
     total_actions = len(events)
     actions_config = get_actions_config()
@@ -636,17 +2115,16 @@ def get_monthly_stats(year, month, group_id=None):
         for c in top_by_coins
     ]
 
-    by_group = {}
-    for c in children_snapshot:
-        gid = c.get("groupId") or ""
-        if gid not in by_group:
-            by_group[gid] = {"groupId": gid, "groupName": groups_dict.get(gid, gid), "totalCoins": 0, "childrenCount": 0}
-        by_group[gid]["totalCoins"] += c.get("balance", 0)
-        by_group[gid]["childrenCount"] += 1
     by_group_list = []
-    for g in by_group.values():
-        g["avgCoins"] = round(g["totalCoins"] / g["childrenCount"], 1) if g["childrenCount"] else 0
-        by_group_list.append(g)
+    for g in month_groups:
+        gid = g.get("groupId") or ""
+        by_group_list.append({
+            "groupId": gid,
+            "groupName": groups_dict.get(gid, gid),
+            "totalCoins": g["totalSum"],
+            "childrenCount": g["childrenCount"],
+            "avgCoins": round(g["totalSum"] / g["childrenCount"], 1) if g["childrenCount"] else 0,
+        })
     by_group_list.sort(key=lambda x: -x["totalCoins"])
 
     return {
@@ -669,24 +2147,27 @@ def get_monthly_stats(year, month, group_id=None):
 
 def get_admins():
     """Список админов из admins.json: [{ username, password_hash, is_staff }, ...]."""
-    _ensure_defaults()
     return _read_json_any("admins") or []
 
 
+def _build_admins_index(admins):
+    index = {}
+    for a in admins or []:
+        index.setdefault((a.get("username") or "").strip(), a)
+    return index
+
+
 def get_admin_by_username(username):
-    """Найти админа по username. Возвращает dict или None."""
+    """Найти админа по username (индекс по username, пересобирается при изменении admins.json). Возвращает dict или None."""
     if not username:
         return None
-    for a in get_admins():
-        if (a.get("username") or "").strip() == username.strip():
-            return a
-    return None
+    return _cached_index("admins", "by_username", _build_admins_index).get(username.strip())
 
 
+@transactional
 def add_or_update_admin(username, password, is_staff=True, role="admin", group_id=None):
     """Добавить или обновить пользователя в admins.json.
     role: "admin" | "educator". Для educator обязателен group_id."""
-    _ensure_defaults()
     username = (username or "").strip()
     if not username:
         return False
@@ -704,3 +2185,124 @@ def add_or_update_admin(username, password, is_staff=True, role="admin", group_i
         admins.append(entry)
     _write_json("admins", admins)
     return True
+
+
+# --- Запуск процесса: файлы по умолчанию и прогрев индексов ---
+
+_WARM_INDEXES = [
+    ("children", "by_id", _build_children_by_id),
+    ("children", "by_group", _build_children_by_group),
+    ("children", "leaderboard", Leaderboard),
+    ("actions_config", "by_id", _build_actions_by_id),
+    ("events", "daily_buckets", DailyBuckets),
+    ("events", "by_time", EventIndex),
+    ("admins", "by_username", _build_admins_index),
+]
+
+
+def warm_indexes():
+    """Построить все индексы в памяти процесса (дети по id и группам, действия, события, админы)."""
+    ensure_monthly_reset_done()
+    for key, name, build in _WARM_INDEXES:
+        _cached_index(key, name, build)
+
+
+def bootstrap(warm=True):
+    """
+    Подготовить хранилище при старте сервера (storage_client.startup, storage_server): создать каталог
+    и недостающие файлы, проверить месячный сброс и, если warm, построить индексы.
+    В gunicorn с preload_app это выполняется один раз в мастере до fork — воркеры получают
+    готовые индексы через copy-on-write и обслуживают первый запрос «тёплыми».
+    В мультитенантном режиме то же делается для каждого тенанта (индексы — для первых TENANT_CACHE_SIZE).
+    """
+    _ensure_defaults()
+    if warm:
+        warm_indexes()
+    if getattr(settings, "TENANT_MODE", ""):
+        for i, name in enumerate(list_tenants()):
+            with use_tenant(get_tenant(name)):
+                _ensure_defaults()
+                if warm and i < TENANT_CACHE_SIZE:
+                    warm_indexes()
+
+
+# --- Тенанты: один процесс обслуживает несколько детских садов, у каждого свой каталог данных ---
+
+TENANTS_DIR = Path(getattr(settings, "TENANTS_DIR", DATA_DIR / "tenants"))
+TENANT_CACHE_SIZE = getattr(settings, "TENANT_CACHE_SIZE", 100)
+TENANT_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
+# Открытые тенанты в порядке последнего обращения: у вытесненного сбрасываются индексы в памяти
+_tenants = OrderedDict()
+_tenants_lock = threading.Lock()
+
+
+def get_tenant(name):
+    """Тенант по имени (каталог TENANTS_DIR/<name>) или None, если такого нет."""
+    with _tenants_lock:
+        tenant = _tenants.get(name)
+        if tenant is not None:
+            _tenants.move_to_end(name)
+            return tenant
+    if not TENANT_NAME_RE.match(name or "") or not (TENANTS_DIR / name).is_dir():
+        return None
+    tenant = Tenant(name, TENANTS_DIR / name)
+    with _tenants_lock:
+        tenant = _tenants.setdefault(name, tenant)
+        while len(_tenants) > TENANT_CACHE_SIZE:
+            _, evicted = _tenants.popitem(last=False)
+            _drop_tenant_indexes(evicted)
+    return tenant
+
+
+def _drop_tenant_indexes(tenant):
+    paths = {str(p) for p in tenant.files.values()}
+    with _index_lock:
+        for slot in [s for s in _index_cache if s[0] in paths]:
+            _index_cache.pop(slot, None)
+
+
+def list_tenants():
+    """Имена тенантов (подкаталоги TENANTS_DIR)."""
+    if not TENANTS_DIR.is_dir():
+        return []
+    return sorted(p.name for p in TENANTS_DIR.iterdir() if p.is_dir() and TENANT_NAME_RE.match(p.name))
+
+
+def create_tenant(name):
+    """Создать каталог тенанта с файлами по умолчанию. None — если имя недопустимо."""
+    if not TENANT_NAME_RE.match(name or ""):
+        return None
+    (TENANTS_DIR / name).mkdir(parents=True, exist_ok=True)
+    tenant = get_tenant(name)
+    with use_tenant(tenant):
+        _ensure_defaults()
+    return tenant
+
+
+def current_tenant():
+    """Имя текущего тенанта ("" — тенант по умолчанию, DATA_DIR)."""
+    return _current_tenant.get().name
+
+
+def current_data_dir():
+    """Каталог данных текущего тенанта."""
+    return _current_tenant.get().data_dir
+
+
+@contextmanager
+def use_tenant(tenant):
+    """
+    Выполнить блок с хранилищем тенанта tenant (None — тенант по умолчанию).
+    Снимок и блокировка внешнего блока относятся к другому каталогу, поэтому внутри их нет.
+    """
+    tokens = (
+        _current_tenant.set(tenant or DEFAULT_TENANT),
+        _current_snapshot.set(None),
+        _lock_depth.set(0),
+    )
+    try:
+        yield
+    finally:
+        for var, token in zip((_current_tenant, _current_snapshot, _lock_depth), tokens):
+            var.reset(token)
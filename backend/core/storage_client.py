@@ -0,0 +1,137 @@
+"""
+Клиент сервера хранилища (core.storage_server): те же функции, что в core.storage, но выполняются
+в процессе storage_server через Unix-сокет STORAGE_SOCKET.
+
+install() подменяет функции API в модуле core.storage, поэтому представления, бэкенд авторизации
+и async-представления работают с сервером без изменений. Вызывается из config.wsgi и config.asgi (startup):
+команды manage.py по-прежнему работают с файлами напрямую (под той же блокировкой хранилища).
+"""
+import functools
+import os
+import socket
+import threading
+
+from django.conf import settings
+
+from core import storage
+from core.storage_server import API, recv_message, send_message
+
+SOCKET_TIMEOUT = getattr(settings, "STORAGE_SOCKET_TIMEOUT", 30)
+
+# Функции, которые меняют данные: после обрыва соединения их нельзя повторять вслепую
+MUTATIONS = {
+    "create_group", "update_group", "delete_group", "ensure_groups_numbered",
+    "create_child", "import_children", "update_child", "delete_child",
+    "reset_actions_config_to_defaults", "compact_events",
+    "process_interaction", "adjust_balance", "adjust_group_balance", "add_or_update_admin",
+}
+
+_ERRORS = {e.__name__: e for e in (KeyError, ValueError, TypeError, RuntimeError, PermissionError)}
+
+
+class StorageServerError(RuntimeError):
+    """Ошибка на сервере хранилища или связь с ним потеряна посреди изменяющего вызова."""
+
+
+class StorageClient:
+    """
+    Соединение с сервером хранилища: у каждого потока своё постоянное соединение
+    (после fork воркера gunicorn открывается новое). client.get_groups() — то же, что storage.get_groups().
+    """
+
+    def __init__(self, path, timeout=SOCKET_TIMEOUT):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise StorageServerError(f"storage server is not available at {self.path}: {e}") from e
+        self._local.conn = (os.getpid(), sock)
+        return sock
+
+    def _socket(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn[0] == os.getpid():
+            return conn[1], True
+        return self._connect(), False
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None and conn[0] == os.getpid():
+            conn[1].close()
+
+    def call(self, name, *args, **kwargs):
+        request = {"fn": name, "args": args, "kwargs": kwargs, "tenant": storage.current_tenant()}
+        sock, reused = self._socket()
+        try:
+            send_message(sock, request)
+            response = recv_message(sock)
+        except OSError:
+            response = None
+        if response is None:
+            self.close()
+            # Сервер перезапущен или закрыл простаивающее соединение: чтение безопасно повторить
+            # по новому соединению, изменение — нет (оно могло уже выполниться)
+            if not reused or name in MUTATIONS:
+                raise StorageServerError(f"storage server connection lost during {name}")
+            sock, _ = self._socket()
+            try:
+                send_message(sock, request)
+                response = recv_message(sock)
+            except OSError:
+                response = None
+            if response is None:
+                self.close()
+                raise StorageServerError(f"storage server connection lost during {name}")
+        if "error" in response:
+            raise _ERRORS.get(response["error"], StorageServerError)(response.get("message", ""))
+        return response["result"]
+
+    def __getattr__(self, name):
+        if name not in API:
+            raise AttributeError(name)
+        return functools.partial(self.call, name)
+
+
+def _proxy(client, name, local):
+    @functools.wraps(local)
+    def wrapper(*args, **kwargs):
+        # Каталог реплики (core.replication.replica_reads) читается в этом процессе
+        if storage._current_tenant.get().read_only:
+            return local(*args, **kwargs)
+        return client.call(name, *args, **kwargs)
+    wrapper.local = local
+    return wrapper
+
+
+def install(path=None):
+    """
+    Направить функции API core.storage на сервер хранилища (path или STORAGE_SOCKET).
+    Без адреса сервера ничего не делает. Возвращает клиента или None.
+    """
+    path = path or getattr(settings, "STORAGE_SOCKET", "")
+    if not path:
+        return None
+    client = StorageClient(path)
+    for name in API:
+        local = getattr(storage, name)
+        setattr(storage, name, _proxy(client, name, getattr(local, "local", local)))
+    return client
+
+
+def startup():
+    """
+    Подготовка процесса сервера приложения (config.wsgi, config.asgi; в gunicorn с preload_app —
+    в мастере до fork). С сервером хранилища — подключить клиента (данные готовит storage_server),
+    без него — storage.bootstrap: файлы данных, месячный сброс и индексы. При инициализации Django (AppConfig.ready) этого нет:
+    команды manage.py (migrate, test, shell) не должны трогать каталог данных.
+    """
+    if install() is None:
+        storage.bootstrap(warm=getattr(settings, "STORAGE_WARM_ON_STARTUP", True))
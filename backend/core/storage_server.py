@@ -0,0 +1,174 @@
+"""
+Сервер хранилища (manage.py storage_server): один процесс владеет DATA_DIR и обслуживает
+вызовы функций core.storage от воркеров gunicorn через Unix-сокет (клиент — core.storage_client).
+
+Индексы, кэш отчётов и блокировка хранилища живут в одном процессе: запись одного воркера
+не сбрасывает индексы остальных, а записи выстраиваются в очередь на Tenant.thread_lock без flock
+между процессами. Каждый вызов выполняется в своём снимке хранилища, как отдельный запрос API.
+
+Протокол: сообщение — 4 байта длины (big-endian) и JSON.
+Запрос {"fn", "args", "kwargs", "tenant"}, ответ {"result"} или {"error": имя исключения, "message"}.
+"""
+import errno
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+
+from core import storage
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct(">I")
+
+# Функции core.storage, доступные через сервер (остальные — внутренние или работают локально)
+API = (
+    "get_groups", "create_group", "update_group", "delete_group", "ensure_groups_numbered",
+    "get_children", "get_child_by_id", "get_child_ids_in_group", "get_children_changes", "get_kiosk_bootstrap",
+    "create_child", "import_children", "update_child", "delete_child",
+    "get_actions_config", "reset_actions_config_to_defaults",
+    "get_events", "get_tombstones", "get_events_for_child", "get_all_events", "compact_events",
+    "get_idempotent_result", "process_interaction", "adjust_balance", "adjust_group_balance",
+    "get_leaderboard", "get_stats_groups", "get_stats_children", "get_stats_timeseries", "get_dashboard",
+    "get_monthly_results", "get_monthly_stats",
+    "get_admins", "get_admin_by_username", "add_or_update_admin",
+)
+
+
+def send_message(sock, message):
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    """Прочитать сообщение; None — соединение закрыто."""
+    header = _recv_exact(sock, _LENGTH.size)
+    if header is None:
+        return None
+    body = _recv_exact(sock, _LENGTH.unpack(header)[0])
+    if body is None:
+        return None
+    return json.loads(body)
+
+
+def execute(request):
+    """Выполнить вызов функции хранилища в тенанте запроса. Возвращает ответ протокола."""
+    name = request.get("fn")
+    if name not in API:
+        return {"error": "ValueError", "message": f"unknown storage function: {name}"}
+    tenant = None
+    if request.get("tenant"):
+        tenant = storage.get_tenant(request["tenant"])
+        if tenant is None:
+            return {"error": "KeyError", "message": f"unknown tenant: {request['tenant']}"}
+    try:
+        with storage.use_tenant(tenant), storage.snapshot():
+            result = getattr(storage, name)(*request.get("args") or (), **request.get("kwargs") or {})
+    except Exception as e:
+        if not isinstance(e, (KeyError, ValueError, TypeError)):
+            logger.exception("storage server: %s failed", name)
+        return {"error": type(e).__name__, "message": str(e)}
+    return {"result": result}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Соединение воркера: запросы по одному, пока клиент не закроет сокет."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+            with server.idle:
+                if server.stopping:
+                    return
+                server.busy += 1
+            try:
+                response = execute(request)
+            finally:
+                with server.idle:
+                    server.busy -= 1
+                    server.idle.notify_all()
+            try:
+                send_message(self.request, response)
+            except TypeError as e:
+                send_message(self.request, {"error": "TypeError", "message": str(e)})
+            except OSError:
+                return
+
+
+class StorageServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Сервер на Unix-сокете: поток на соединение. Чтения идут параллельно по общим индексам,
+    записи выстраиваются на блокировке хранилища (core.storage._storage_lock).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.busy = 0
+        self.stopping = False
+        self.idle = threading.Condition()
+        super().__init__(path, _Handler)
+
+    def server_bind(self):
+        """
+        Сокет даёт полный доступ к данным (в т.ч. к администраторам) — только владельцу.
+        Он создаётся в личном каталоге 0700 рядом с path, получает права 0600 и только потом
+        появляется по адресу path (жёсткая ссылка: занятый адрес не перезаписывается).
+        umask процесса не меняется — он общий для всех потоков.
+        """
+        path = self.server_address
+        private = tempfile.mkdtemp(prefix=".storage-sock-", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            bound = os.path.join(private, "sock")
+            self.socket.bind(bound)
+            os.chmod(bound, 0o600)
+            try:
+                os.link(bound, path)
+            except FileExistsError:
+                raise OSError(errno.EADDRINUSE, f"address already in use: {path}")
+        finally:
+            shutil.rmtree(private, ignore_errors=True)
+        self.server_address = path
+
+    def drain(self, timeout=30):
+        """Перестать принимать запросы и дождаться завершения начатых (их записи должны дойти до диска)."""
+        with self.idle:
+            self.stopping = True
+            return self.idle.wait_for(lambda: self.busy == 0, timeout)
+
+
+def remove_stale_socket(path):
+    """Удалить файл сокета, оставшийся от упавшего сервера. False — по нему отвечает работающий сервер."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+    return False
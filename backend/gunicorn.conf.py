@@ -0,0 +1,21 @@
+"""
+Настройки gunicorn. Приложение загружается в мастере до fork (preload_app):
+config.wsgi (core.storage_client.startup) создаёт файлы данных и строит индексы хранилища один раз,
+а воркеры получают их через copy-on-write и отвечают на первый запрос без «холодного» старта.
+GUNICORN_THREADS > 1 — потоковые воркеры (gthread): каждый держит до N соединений
+(простаивающие киоски не занимают процесс), хранилище потокобезопасно (core.storage._storage_lock).
+"""
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Перенести объекты, созданные при загрузке, в постоянное поколение GC: сборщик мусора
+    # в воркере не будет их обходить и не станет копировать страницы с общими индексами.
+    gc.freeze()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Сравнить sync- и gthread-воркеры gunicorn (как в Dockerfile) и ASGI (uvicorn, config/asgi.py) по числу одновременных соединений.
+
+Для каждого сервера:
+- открываем N «медленных» соединений (заголовки запроса отправлены не полностью — как SSE/long-polling
+  или клиент на плохом Wi-Fi) и замеряем, успевает ли обычный GET /api/v1/children;
+- замеряем пропускную способность GET /api/v1/children при C параллельных клиентах.
+
+Данные — во временном DATA_DIR. Запуск: python scripts/bench_asgi.py [--slow 8] [--concurrency 32] [--requests 400]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "gunicorn-sync (2 workers)": ["gunicorn", "--workers", "2", "--log-level", "error", "--bind", "127.0.0.1:{port}", "config.wsgi:application"],
+    "gunicorn-gthread (2 workers x 8 threads)": ["gunicorn", "--workers", "2", "--threads", "8", "--log-level", "error", "--bind", "127.0.0.1:{port}", "config.wsgi:application"],
+    "uvicorn-asgi (1 worker)": ["uvicorn", "--log-level", "error", "--port", "{port}", "config.asgi:application"],
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/groups", timeout=1).read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _get(port, timeout=10):
+    start = time.perf_counter()
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/children", timeout=timeout).read()
+        return time.perf_counter() - start
+    except OSError:
+        return None
+
+
+def _open_slow_connections(port, count):
+    conns = []
+    for _ in range(count):
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(b"GET /api/v1/children HTTP/1.1\r\nHost: 127.0.0.1\r\n")
+        conns.append(s)
+    return conns
+
+
+def bench(name, cmd, env, args):
+    port = _free_port()
+    proc = subprocess.Popen([c.format(port=port) for c in cmd], cwd=BACKEND_DIR, env=env)
+    try:
+        if not _wait_ready(port):
+            print(f"{name}: сервер не запустился")
+            return
+        slow = _open_slow_connections(port, args.slow)
+        latency = _get(port, timeout=5)
+        for s in slow:
+            s.close()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            start = time.perf_counter()
+            times = [t for t in pool.map(lambda _: _get(port), range(args.requests)) if t is not None]
+            elapsed = time.perf_counter() - start
+        times.sort()
+        p50 = times[len(times) // 2] * 1000 if times else 0
+        p99 = times[int(len(times) * 0.99) - 1] * 1000 if times else 0
+        held = f"{latency * 1000:.1f} мс" if latency is not None else "таймаут (все воркеры заняты)"
+        print(f"{name}:")
+        print(f"  запрос при {args.slow} медленных соединениях: {held}")
+        print(f"  {len(times)}/{args.requests} ответов, {len(times) / elapsed:.0f} rps, p50 {p50:.1f} мс, p99 {p99:.1f} мс (C={args.concurrency})")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slow", type=int, default=8, help="число медленных соединений")
+    parser.add_argument("--concurrency", type=int, default=32, help="параллельных клиентов")
+    parser.add_argument("--requests", type=int, default=400, help="всего запросов")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = {**os.environ, "DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "DEBUG": "0"}
+        env.pop("API_ASYNC", None)
+        for name, cmd in SERVERS.items():
+            bench(name, cmd, env, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Серверное время открытия админки: пять отдельных запросов против одного /admin/dashboard.
+
+Во временном DATA_DIR создаются группы, дети и события с начала текущего месяца. Через весь стек Django
+(сессия, DRF, снимок хранилища) под администратором и под воспитателем запрашиваются:
+- как раньше: /admin/me, /admin/groups, /admin/stats/groups, /admin/stats/children, /admin/monthly-results;
+- одним запросом: /admin/dashboard с теми же параметрами.
+«Холодно» — кэш отчётов очищен (первое открытие после любой записи в данные), «тепло» — повторное открытие.
+Запуск: python scripts/bench_dashboard.py [--children 300] [--events 200000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+GROUPS = 10
+FAN_OUT = ["/api/v1/admin/me", "/api/v1/admin/groups", "/api/v1/admin/stats/groups", "/api/v1/admin/stats/children", "/api/v1/admin/monthly-results"]
+
+
+def _generate(data_dir, children_count, events_count):
+    rnd = random.Random(1)
+    groups = [{"id": f"group{g}", "name": str(g)} for g in range(1, GROUPS + 1)]
+    children = [
+        {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": f"group{i % GROUPS + 1}", "balance": 0, "avatar": None}
+        for i in range(children_count)
+    ]
+    start = datetime.now().replace(day=1, hour=8, minute=0, second=0, microsecond=0)
+    span = max(1, int((datetime.now() - start).total_seconds()))
+    events = []
+    for seq in range(1, events_count + 1):
+        child = children[rnd.randrange(children_count)]
+        ts = (start + timedelta(seconds=span * seq // events_count)).isoformat()
+        child["balance"] += 1
+        events.append({
+            "id": f"ev_{seq}_{child['id']}_crane", "seq": seq, "childId": child["id"], "actionId": "crane",
+            "credited": 1, "timestamp": ts, "balanceAfter": child["balance"],
+        })
+    last_reset = {"year": start.year, "month": start.month}
+    files = (("groups", groups), ("children", children), ("events", events), ("event_seq", {"seq": events_count}), ("last_month_reset", last_reset))
+    for name, data in files:
+        with open(os.path.join(data_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _login(client, username):
+    response = client.post("/api/v1/admin/login", {"username": username, "password": username}, content_type="application/json")
+    assert response.status_code == 200, response.content
+
+
+def _timed(client, urls, params):
+    start = time.perf_counter()
+    for url in urls:
+        response = client.get(url, params)
+        assert response.status_code == 200, (url, response.status_code)
+    return time.perf_counter() - start
+
+
+def measure(client, params, repeat):
+    """(холодно отдельные, холодно dashboard, тепло отдельные, тепло dashboard) — медианы, мс."""
+    from django.core.cache import caches
+    runs = {"cold_fan": [], "cold_dash": [], "warm_fan": [], "warm_dash": []}
+    for _ in range(repeat):
+        for kind, urls in (("fan", FAN_OUT), ("dash", ["/api/v1/admin/dashboard"])):
+            caches["stats"].clear()
+            runs[f"cold_{kind}"].append(_timed(client, urls, params))
+            runs[f"warm_{kind}"].append(_timed(client, urls, params))
+    return {k: sorted(v)[len(v) // 2] * 1000 for k, v in runs.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--children", type=int, default=300)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench_dashboard_")
+    _generate(data_dir, args.children, args.events)
+    os.environ.update({
+        "DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "DEBUG": "0",
+        "ALLOWED_HOSTS": "testserver",
+    })
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import Client
+    from api.auth_backend import PROXY_USERNAME
+    from core import storage
+
+    call_command("migrate", verbosity=0)
+    # Как при старте сервера (config.wsgi): файлы данных и индексы готовы до первого запроса
+    storage.bootstrap()
+    get_user_model().objects.get_or_create(username=PROXY_USERNAME, defaults={"is_staff": True})
+    storage.add_or_update_admin("bench_admin", "bench_admin", is_staff=True, role="admin")
+    storage.add_or_update_admin("bench_educator", "bench_educator", is_staff=True, role="educator", group_id="group1")
+
+    today = datetime.now().date()
+    params = {"from": (today - timedelta(days=7)).isoformat(), "to": today.isoformat()}
+    print(f"{args.children} детей, {args.events} событий, период {params['from']}..{params['to']}")
+    for username in ("bench_admin", "bench_educator"):
+        client = Client()
+        _login(client, username)
+        r = measure(client, params, args.repeat)
+        print(f"{username}:")
+        print(f"  холодно: {len(FAN_OUT)} запросов {r['cold_fan']:.1f} мс, dashboard {r['cold_dash']:.1f} мс ({r['cold_fan'] / r['cold_dash']:.1f}x)")
+        print(f"  тепло:   {len(FAN_OUT)} запросов {r['warm_fan']:.1f} мс, dashboard {r['warm_dash']:.1f} мс ({r['warm_fan'] / r['warm_dash']:.1f}x)")
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Замер холодной загрузки киоска: байты по сети и оценка времени до первой отрисовки.
+
+Берётся собранный фронтенд (STATIC_ROOT или --static-root), копируется во временный каталог
+и сжимается (python -m whitenoise.compress, как при сборке образа). Затем через весь стек Django
+(WhiteNoise, оболочка SPA) запрашивается «/» и критические ресурсы из index.html
+(<script type="module">, <link rel="stylesheet">, <link rel="modulepreload">) —
+без сжатия (как было раньше), с gzip и с brotli. Для повторного захода — If-None-Match
+на оболочку; ресурсы с Cache-Control: immutable браузер не запрашивает вовсе.
+
+Время до первой отрисовки оценивается по сети киоска: 2 RTT (оболочка, затем ресурсы параллельно)
++ передача байтов при --mbit + время ответа сервера; разбор JS браузером не учитывается.
+Запуск: python scripts/bench_static.py [--static-root ../frontend/dist] [--mbit 5] [--rtt 40]
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CRITICAL_RE = re.compile(
+    r'<script[^>]+type="module"[^>]+src="([^"]+)"'
+    r'|<link[^>]+rel="(?:stylesheet|modulepreload)"[^>]+href="([^"]+)"'
+    r'|<link[^>]+href="([^"]+)"[^>]+rel="(?:stylesheet|modulepreload)"'
+)
+ENCODINGS = {"без сжатия": "identity", "gzip": "gzip", "brotli": "br, gzip"}
+
+
+def _body(response):
+    if response.streaming:
+        data = b"".join(response.streaming_content)
+        response.close()
+        return data
+    return response.content
+
+
+def _get(client, url, **headers):
+    start = time.perf_counter()
+    response = client.get(url, **headers)
+    body = _body(response)
+    return response, body, time.perf_counter() - start
+
+
+def _critical(index_html):
+    return [next(g for g in m.groups() if g) for m in CRITICAL_RE.finditer(index_html)]
+
+
+def cold_load(client, accept):
+    """Холодная загрузка «/»: (байт, запросов, время сервера в с, URL ресурсов, ETag оболочки)."""
+    response, body, server = _get(client, "/", HTTP_ACCEPT_ENCODING=accept)
+    assert response.status_code == 200, response.status_code
+    plain = client.get("/", HTTP_ACCEPT_ENCODING="identity").content.decode("utf-8")
+    urls = _critical(plain)
+    total = len(body)
+    slowest = 0.0
+    for url in urls:
+        r, data, elapsed = _get(client, url, HTTP_ACCEPT_ENCODING=accept)
+        assert r.status_code == 200, (url, r.status_code)
+        total += len(data)
+        slowest = max(slowest, elapsed)
+    return total, 1 + len(urls), server + slowest, urls, response.get("ETag")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--static-root", help="собранный фронтенд (по умолчанию STATIC_ROOT)")
+    parser.add_argument("--mbit", type=float, default=5.0, help="пропускная способность сети киоска, Мбит/с")
+    parser.add_argument("--rtt", type=float, default=40.0, help="RTT сети киоска, мс")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    os.environ.update({"DEBUG": "0", "ALLOWED_HOSTS": "testserver", "STORAGE_WARM": "0"})
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import Client, override_settings
+    from whitenoise.compress import main as compress
+
+    source = Path(args.static_root or settings.STATIC_ROOT)
+    if not (source / "index.html").is_file():
+        print(f"{source}: нет index.html — сначала соберите фронтенд (cd frontend && npm run build)")
+        return 1
+    static_root = Path(tempfile.mkdtemp(prefix="bench_static_")) / "static"
+    shutil.copytree(source, static_root)
+    compress(["-q", str(static_root)])
+
+    with override_settings(STATIC_ROOT=static_root):
+        client = Client()
+        client.get("/")  # загрузка middleware и оболочки — не в счёт замера
+        print(f"сеть киоска: {args.mbit:g} Мбит/с, RTT {args.rtt:g} мс")
+        for label, accept in ENCODINGS.items():
+            total, requests, server, urls, etag = cold_load(client, accept)
+            network = 2 * args.rtt / 1000 + total * 8 / (args.mbit * 1e6)
+            print(f"{label:>11}: {total / 1024:7.1f} КиБ за {requests} запросов, "
+                  f"первая отрисовка ≈ {(network + server) * 1000:.0f} мс (сервер {server * 1000:.1f} мс)")
+
+        response, body, _ = _get(client, "/", HTTP_ACCEPT_ENCODING="br, gzip", HTTP_IF_NONE_MATCH=etag)
+        cache_control = {url: _get(client, url)[0].get("Cache-Control", "") for url in urls}
+        immutable = [url for url, value in cache_control.items() if "immutable" in value]
+        print(f"повторный заход: оболочка {response.status_code} ({len(body)} Б), "
+              f"из кэша браузера без запроса: {len(immutable)} из {len(urls)} ресурсов")
+        for url, value in cache_control.items():
+            print(f"  {url}: Cache-Control: {value}")
+    shutil.rmtree(static_root.parent, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""Хранилище напрямую из воркеров против сервера хранилища (manage.py storage_server) при 2, 4 и 8 воркерах.
+
+Во временном DATA_DIR создаются дети и журнал событий. N процессов (как gunicorn --workers N) в течение
+--seconds секунд выполняют смесь вызовов, как у киосков и админки: начисления (process_interaction),
+рейтинг, опрос /children/changes и история ребёнка.
+- напрямую: каждый процесс сам читает файлы, держит свои индексы и берёт flock на запись;
+- через сервер: функции core.storage вызываются в процессе storage_server через Unix-сокет (core.storage_client).
+Печатается пропускная способность, медиана и 99-й перцентиль задержки чтений и записей, а также
+проверка, что число событий в файле равно числу успешных начислений (нет потерянных обновлений).
+Запуск: python scripts/bench_storage_server.py [--workers 2,4,8] [--seconds 5] [--children 300] [--events 20000]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+GROUPS = 10
+# Доля операций: начисление, рейтинг, опрос изменений детей, история ребёнка
+MIX = (("interaction", 0.1), ("leaderboard", 0.4), ("changes", 0.3), ("history", 0.2))
+
+
+def _generate(data_dir, children_count, events_count):
+    rnd = random.Random(1)
+    groups = [{"id": f"group{g}", "name": str(g)} for g in range(1, GROUPS + 1)]
+    children = [
+        {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": f"group{i % GROUPS + 1}", "balance": 0, "avatar": None}
+        for i in range(children_count)
+    ]
+    actions = [{"id": "crane", "name": "Кран", "coins": 1, "cooldown_sec": 0, "daily_limit_coins": 10 ** 9}]
+    start = datetime.now().replace(day=1, hour=8, minute=0, second=0, microsecond=0)
+    span = max(1, int((datetime.now() - start).total_seconds()))
+    events = []
+    for seq in range(1, events_count + 1):
+        child = children[rnd.randrange(children_count)]
+        child["balance"] += 1
+        events.append({
+            "id": f"ev_{seq}_{child['id']}_crane", "seq": seq, "childId": child["id"], "actionId": "crane", "credited": 1,
+            "timestamp": (start + timedelta(seconds=span * seq // events_count)).isoformat(), "balanceAfter": child["balance"],
+        })
+    last_reset = {"year": start.year, "month": start.month}
+    files = (
+        ("groups", groups), ("children", children), ("actions_config", actions), ("events", events),
+        ("event_seq", {"seq": events_count}), ("last_month_reset", last_reset),
+    )
+    for name, data in files:
+        with open(os.path.join(data_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def worker(data_dir, socket_path, children_count, seconds, seed, ready, go, out):
+    os.environ.update({"DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "STORAGE_WARM": "0"})
+    if socket_path:
+        os.environ["STORAGE_SOCKET"] = socket_path
+    import django
+    django.setup()
+    from core import storage, storage_client
+    if socket_path:
+        storage_client.install(socket_path)
+    else:
+        # Как gunicorn с preload_app: воркер начинает с готовыми индексами
+        storage.warm_indexes()
+    rnd = random.Random(seed)
+    since = storage.get_children_changes()["seq"]
+    ops = [name for name, _ in MIX]
+    weights = [w for _, w in MIX]
+    latencies = {"read": [], "write": []}
+    credited = 0
+    ready.release()
+    go.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        child_id = f"child{rnd.randrange(children_count)}"
+        start = time.perf_counter()
+        if op == "interaction":
+            credited += storage.process_interaction(child_id, "crane")["success"]
+        elif op == "leaderboard":
+            storage.get_leaderboard(group_id=f"group{rnd.randint(1, GROUPS)}")
+        elif op == "changes":
+            since = storage.get_children_changes(since=since, group_id=f"group{rnd.randint(1, GROUPS)}")["seq"]
+        else:
+            storage.get_events_for_child(child_id)
+        latencies["write" if op == "interaction" else "read"].append(time.perf_counter() - start)
+    out.put({"credited": credited, "latencies": latencies})
+
+
+def _wait_socket(path, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("storage_server завершился при старте")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            probe.close()
+    raise RuntimeError(f"storage_server не открыл {path}")
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+
+def run(workers, via_server, args):
+    """Один прогон на свежих данных: {"ops/s", "read p50/p99", "write p50/p99", "lost"}."""
+    with tempfile.TemporaryDirectory(prefix="bench_storage_server_") as data_dir:
+        _generate(data_dir, args.children, args.events)
+        server = None
+        socket_path = None
+        if via_server:
+            socket_path = os.path.join(data_dir, "storage.sock")
+            env = {**os.environ, "DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "STORAGE_SOCKET": socket_path}
+            server = subprocess.Popen(
+                [sys.executable, "manage.py", "storage_server"], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+            )
+            _wait_socket(socket_path, server)
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            ready, go, out = ctx.Semaphore(0), ctx.Event(), ctx.Queue()
+            procs = [
+                ctx.Process(target=worker, args=(data_dir, socket_path, args.children, args.seconds, seed, ready, go, out))
+                for seed in range(workers)
+            ]
+            for p in procs:
+                p.start()
+            for _ in procs:
+                ready.acquire()
+            go.set()
+            results = [out.get() for _ in procs]
+            for p in procs:
+                p.join()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        with open(os.path.join(data_dir, "events.json"), encoding="utf-8") as f:
+            events = len(json.load(f))
+    reads = [x for r in results for x in r["latencies"]["read"]]
+    writes = [x for r in results for x in r["latencies"]["write"]]
+    return {
+        "ops/s": (len(reads) + len(writes)) / args.seconds,
+        "read p50": _percentile(reads, 0.5), "read p99": _percentile(reads, 0.99),
+        "write p50": _percentile(writes, 0.5), "write p99": _percentile(writes, 0.99),
+        "lost": args.events + sum(r["credited"] for r in results) - events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="2,4,8", help="числа воркеров через запятую")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--children", type=int, default=300)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.children} детей, {args.events} событий, {args.seconds:g} с на прогон, смесь: "
+          + ", ".join(f"{name} {share:.0%}" for name, share in MIX))
+    print(f"{'воркеры':>8} {'режим':>10} {'опер/с':>8} {'чтение p50/p99, мс':>20} {'запись p50/p99, мс':>20} {'потеряно':>9}")
+    lost = 0
+    for workers in (int(w) for w in args.workers.split(",")):
+        for mode, via_server in (("напрямую", False), ("сервер", True)):
+            r = run(workers, via_server, args)
+            lost += r["lost"]
+            print(
+                f"{workers:>8} {mode:>10} {r['ops/s']:>8.0f} {r['read p50']:>9.2f} / {r['read p99']:<8.2f}"
+                f" {r['write p50']:>9.2f} / {r['write p99']:<8.2f} {r['lost']:>9}"
+            )
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""Замер мультитенантного режима: N детских садов в одном процессе (TENANT_MODE=prefix).
+
+Для каждого тенанта (свой каталог, свои небольшие файлы):
+- «холодный» первый запрос (файлы читаются, индексы строятся) и «тёплые» повторные;
+- память индексов на тенант (tracemalloc) и итоговый RSS процесса.
+Для сравнения — один сад с теми же суммарными данными (все дети и события в одном файле).
+
+Данные — во временном DATA_DIR. Запуск: python scripts/bench_tenants.py [--tenants 50] [--children 60] [--events 3000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _fill(storage, children, events, groups=4):
+    """Записать в текущий тенант groups групп, children детей и events событий."""
+    group_list = [{"id": f"group{g}", "name": str(g)} for g in range(1, groups + 1)]
+    child_list = [
+        {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": f"group{i % groups + 1}", "balance": 0, "avatar": None}
+        for i in range(1, children + 1)
+    ]
+    actions = [a["id"] for a in storage.DEFAULT_ACTIONS]
+    start = datetime.now() - timedelta(days=25)
+    step = 25 * 86400 // max(1, events)
+    event_list = []
+    for n in range(events):
+        child = child_list[n % children]
+        event_list.append({
+            "id": f"ev_{n + 1}_{child['id']}", "seq": n + 1, "childId": child["id"],
+            "actionId": random.choice(actions), "credited": 1,
+            "timestamp": (start + timedelta(seconds=n * step)).isoformat(),
+            "balanceAfter": 0,
+        })
+    storage._write_json_file("groups", group_list)
+    storage._write_json_file("children", child_list)
+    storage._write_json_file("events", event_list)
+    storage._write_json_file("event_seq", {"seq": events})
+
+
+def _ms(fn):
+    start = time.perf_counter()
+    response = fn()
+    assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - start) * 1000
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _run(client, prefix, children, rounds):
+    """Холодный запрос и rounds «тёплых» циклов: список детей, рейтинг, начисление."""
+    cold = _ms(lambda: client.get(f"{prefix}/api/v1/children"))
+    warm = {"children": [], "leaderboard": [], "interaction": []}
+    for _ in range(rounds):
+        child = f"child{random.randint(1, children)}"
+        warm["children"].append(_ms(lambda: client.get(f"{prefix}/api/v1/children")))
+        warm["leaderboard"].append(_ms(lambda: client.get(f"{prefix}/api/v1/leaderboard?limit=10")))
+        warm["interaction"].append(_ms(lambda: client.post(
+            f"{prefix}/api/v1/game/interaction",
+            json.dumps({"childId": child, "actionId": "crane"}), content_type="application/json",
+        )))
+    return cold, warm
+
+
+def _report(warm):
+    return ", ".join(f"{name} p50 {_pct(v, 0.5):.2f} / p99 {_pct(v, 0.99):.2f} мс" for name, v in warm.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=50, help="число тенантов")
+    parser.add_argument("--children", type=int, default=60, help="детей в одном саду")
+    parser.add_argument("--events", type=int, default=3000, help="событий в одном саду")
+    parser.add_argument("--rounds", type=int, default=10, help="тёплых циклов на тенант")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench_tenants_")
+    os.environ.update({
+        "DATA_DIR": data_dir, "TENANT_MODE": "prefix", "STORAGE_WARM": "0", "DEBUG": "0",
+        "ALLOWED_HOSTS": "testserver", "TENANT_CACHE_SIZE": str(args.tenants),
+        "DJANGO_SETTINGS_MODULE": "config.settings",
+    })
+    import django
+    django.setup()
+    import logging
+    logging.disable(logging.WARNING)
+    from django.test import Client, override_settings
+    from core import storage
+
+    names = [f"sad{n}" for n in range(1, args.tenants + 1)]
+    for name in names:
+        with storage.use_tenant(storage.create_tenant(name)):
+            _fill(storage, args.children, args.events)
+    storage._index_cache.clear()
+
+    client = Client()
+    colds, warms = [], {}
+    for name in names:
+        cold, warm = _run(client, f"/t/{name}", args.children, args.rounds)
+        colds.append(cold)
+        for op, values in warm.items():
+            warms.setdefault(op, []).extend(values)
+
+    # Память: сколько занимают индексы одного тенанта, оставшиеся в кэше процесса после прогрева
+    storage._index_cache.clear()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for name in names:
+        with storage.use_tenant(storage.get_tenant(name)):
+            storage.warm_indexes()
+    per_tenant = (tracemalloc.get_traced_memory()[0] - base) / args.tenants
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"{args.tenants} тенантов × {args.children} детей × {args.events} событий:")
+    print(f"  холодный первый запрос: p50 {_pct(colds, 0.5):.1f} мс, max {max(colds):.1f} мс")
+    print(f"  тёплые: {_report(warms)}")
+    print(f"  индексы в памяти на тенант: {per_tenant / 1024:.0f} КиБ; RSS процесса {rss:.0f} МиБ")
+
+    # Тот же объём данных в одном саду: файлы в N раз больше, каждая запись переписывает всё
+    _fill(storage, args.children * args.tenants, args.events * args.tenants, groups=4 * args.tenants)
+    storage._index_cache.clear()
+    with override_settings(TENANT_MODE=""):
+        cold, warm = _run(Client(), "", args.children * args.tenants, args.rounds)
+    print(f"один сад с теми же данными ({args.children * args.tenants} детей, {args.events * args.tenants} событий):")
+    print(f"  холодный первый запрос: {cold:.1f} мс")
+    print(f"  тёплые: {_report(warm)}")
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""Нагрузочная проверка потокобезопасности хранилища: нет потерянных обновлений и согласованы индексы.
+
+Во временном DATA_DIR P процессов по T потоков (как gunicorn --workers P --threads T) начисляют
+монеты (process_interaction) и корректируют балансы (adjust_balance), а потоки-читатели тем временем
+запрашивают рейтинг, историю событий и статистику — по индексам, которые писатели меняют заплатками.
+В конце проверяется: баланс каждого ребёнка равен сумме его событий, номера событий без пропусков
+и повторов, число событий равно числу успешных операций, индексы в памяти совпадают с собранными
+заново из файлов, читатели не получили ни одного исключения.
+Запуск: python scripts/stress_threads.py [--processes 2] [--threads 8] [--ops 50] [--readers 2]
+Малая версия в одном процессе входит в тесты: api/tests/test_threads.py.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CHILDREN = 40
+GROUPS = 4
+
+
+def _setup(data_dir):
+    """Дети по группам и действия без cooldown и дневного лимита — каждое начисление успешно."""
+    groups = [{"id": f"group{g}", "name": str(g)} for g in range(1, GROUPS + 1)]
+    children = [
+        {"id": f"child{i}", "fullName": f"Ребёнок {i}", "groupId": f"group{i % GROUPS + 1}", "balance": 0, "avatar": None}
+        for i in range(CHILDREN)
+    ]
+    actions = [{"id": "crane", "name": "Кран", "coins": 1, "cooldown_sec": 0, "daily_limit_coins": 10 ** 9}]
+    for name, data in (("groups", groups), ("children", children), ("events", []), ("actions_config", actions)):
+        with open(os.path.join(data_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _check_indexes(storage):
+    """Индексы в памяти процесса совпадают с построенными заново из файлов."""
+    errors = []
+    for key, name, build in storage._WARM_INDEXES:
+        index = storage._cached_index(key, name, build)
+        fresh = build(storage._read_json_any(key))
+        same = (vars(index) if hasattr(index, "__dict__") else index) == (vars(fresh) if hasattr(fresh, "__dict__") else fresh)
+        if not same:
+            errors.append(f"индекс {key}/{name} разошёлся с файлом")
+    return errors
+
+
+def worker(data_dir, threads, ops, readers, seed, out):
+    os.environ.update({"DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "STORAGE_WARM": "0"})
+    import django
+    django.setup()
+    from core import storage
+    storage.warm_indexes()
+    # Переключать потоки как можно чаще: гонки между заплатками индексов и чтением проявляются чаще
+    sys.setswitchinterval(1e-6)
+
+    done = threading.Event()
+    errors = []
+    credited = [0]
+    count_lock = threading.Lock()
+
+    def write(n):
+        rnd = random.Random(seed * 1000 + n)
+        ok = 0
+        try:
+            for _ in range(ops):
+                child_id = f"child{rnd.randrange(CHILDREN)}"
+                if rnd.random() < 0.9:
+                    ok += storage.process_interaction(child_id, "crane")["success"]
+                else:
+                    ok += storage.adjust_balance(child_id, rnd.randint(1, 3), "stress", "admin") is not None
+        except Exception:
+            errors.append(traceback.format_exc())
+        with count_lock:
+            credited[0] += ok
+
+    def read(n):
+        rnd = random.Random(-seed * 1000 - n)
+        try:
+            while not done.is_set():
+                group_id = f"group{rnd.randint(1, GROUPS)}"
+                op = rnd.randrange(10)
+                if op < 5:
+                    storage.get_leaderboard(limit=CHILDREN)
+                elif op < 7:
+                    storage.get_all_events(child_id=f"child{rnd.randrange(CHILDREN)}", from_date="2000-01-01")
+                elif op < 8:
+                    storage.get_stats_timeseries(group_id=group_id)
+                elif op < 9:
+                    storage.get_all_events(group_id=group_id)
+                else:
+                    storage.get_stats_groups()
+        except Exception:
+            errors.append(traceback.format_exc())
+
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(threads)]
+    reading = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    for t in writers + reading:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    for t in reading:
+        t.join()
+    errors.extend(_check_indexes(storage))
+    out.put({"ops": credited[0], "errors": errors})
+
+
+def verify(data_dir, expected_ops):
+    """Проверка файлов после нагрузки: список ошибок."""
+    from core import storage
+    children = storage._read_json_any("children")
+    events = storage._read_json_any("events")
+    errors = []
+    if len(events) != expected_ops:
+        errors.append(f"событий {len(events)}, успешных операций {expected_ops}: потеряны обновления")
+    seqs = sorted(e["seq"] for e in events)
+    if seqs != list(range(1, len(events) + 1)):
+        errors.append("номера событий с пропусками или повторами")
+    sums = {}
+    for e in events:
+        sums[e["childId"]] = sums.get(e["childId"], 0) + e["credited"]
+    for c in children:
+        if c["balance"] != sums.get(c["id"], 0):
+            errors.append(f"{c['id']}: баланс {c['balance']}, по событиям {sums.get(c['id'], 0)}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=2, help="число процессов (воркеров gunicorn)")
+    parser.add_argument("--threads", type=int, default=8, help="потоков-писателей в процессе")
+    parser.add_argument("--ops", type=int, default=50, help="операций на поток")
+    parser.add_argument("--readers", type=int, default=2, help="потоков-читателей в процессе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        _setup(data_dir)
+        os.environ.update({"DATA_DIR": data_dir, "DJANGO_SETTINGS_MODULE": "config.settings", "STORAGE_WARM": "0"})
+        ctx = multiprocessing.get_context("spawn")
+        out = ctx.Queue()
+        procs = [
+            ctx.Process(target=worker, args=(data_dir, args.threads, args.ops, args.readers, seed, out))
+            for seed in range(1, args.processes + 1)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        import django
+        django.setup()
+        ops = sum(r["ops"] for r in results)
+        errors = [e for r in results for e in r["errors"]] + verify(data_dir, ops)
+        total = args.processes * args.threads * args.ops
+        print(f"{args.processes} процесса x {args.threads} потоков (+{args.readers} читателя): "
+              f"{ops}/{total} операций за {elapsed:.1f} с, {ops / elapsed:.0f} операций/с")
+        for e in errors[:20]:
+            print(e)
+        if errors:
+            print(f"ОШИБОК: {len(errors)}")
+            return 1
+        print("Потерянных обновлений нет, индексы согласованы с файлами.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
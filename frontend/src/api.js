@@ -1,4 +1,6 @@
-const API_BASE = '/api/v1'
+// Мультитенантный режим с префиксом URL (/t/<детсад>/...): запросы к API идут через тот же префикс
+export const TENANT_PREFIX = (window.location.pathname.match(/^\/t\/[a-z0-9][a-z0-9-]*/) || [''])[0]
+const API_BASE = `${TENANT_PREFIX}/api/v1`
 
 function getCsrfToken() {
   const m = document.cookie.match(/csrftoken=([^;]+)/)
@@ -27,16 +29,62 @@ export async function getChildren() {
   return r.json()
 }
 
+// Дельта-синхронизация киоска: после первого (полного) ответа запрашиваются только изменённые дети
+export const CHILDREN_SYNC_INTERVAL_MS = 15000
+
+export async function getChildrenChanges(since, groupId) {
+  const params = new URLSearchParams()
+  if (since != null) params.set('since', String(since))
+  if (groupId) params.set('groupId', groupId)
+  const r = await fetch(`${API_BASE}/children/changes?${params}`, fetchOpts('GET'))
+  if (!r.ok) throw new Error('Не удалось обновить список детей')
+  return r.json()
+}
+
+export function applyChildrenChanges(children, changes) {
+  if (changes.full) return changes.children
+  const changed = new Map(changes.children.map((c) => [c.id, c]))
+  const removed = new Set(changes.removed)
+  const next = children.filter((c) => !removed.has(c.id)).map((c) => changed.get(c.id) || c)
+  const known = new Set(next.map((c) => c.id))
+  return next.concat(changes.children.filter((c) => !known.has(c.id)))
+}
+
+// Старт киоска группы одним запросом: группа, её дети (только нужные поля), правила и seq для дельта-синхронизации.
+// Ответ с ETag: при повторном открытии браузер получает 304 и берёт тело из своего кэша
+export async function getKioskBootstrap(groupId, fields) {
+  const params = new URLSearchParams({ groupId })
+  if (fields) params.set('fields', fields.join(','))
+  const r = await fetch(`${API_BASE}/kiosk/bootstrap?${params}`, fetchOpts('GET'))
+  if (r.status === 404) throw new Error('Группа не найдена')
+  if (!r.ok) throw new Error('Не удалось загрузить данные киоска')
+  return r.json()
+}
+
 export async function getGameActions() {
   const r = await fetch(`${API_BASE}/game/actions`, fetchOpts('GET'))
   if (!r.ok) throw new Error('Не удалось загрузить правила')
   return r.json()
 }
 
+// Повторы начисления при обрыве связи: с тем же requestId сервер вернёт сохранённый результат, а не начислит второй раз
+const INTERACTION_RETRY_DELAYS_MS = [500, 1500, 4000]
+
+function newRequestId() {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`
+}
+
 export async function gameInteraction(childId, actionId) {
-  const r = await fetch(`${API_BASE}/game/interaction`, fetchOpts('POST', { childId, actionId }))
-  const data = await r.json()
-  return data
+  const requestId = newRequestId()
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const r = await fetch(`${API_BASE}/game/interaction`, fetchOpts('POST', { childId, actionId, requestId }))
+      if (r.status < 500 || attempt >= INTERACTION_RETRY_DELAYS_MS.length) return await r.json()
+    } catch (e) {
+      if (attempt >= INTERACTION_RETRY_DELAYS_MS.length) throw e
+    }
+    await new Promise((resolve) => setTimeout(resolve, INTERACTION_RETRY_DELAYS_MS[attempt]))
+  }
 }
 
 export async function adminLogin(username, password) {
@@ -50,6 +98,18 @@ export async function adminLogout() {
   await fetch(`${API_BASE}/admin/logout`, fetchOpts('POST', null))
 }
 
+// Открытие админки одним запросом: me, groups, statsGroups, statsChildren, monthlyResults
+export async function adminDashboard(from, to, groupId, q) {
+  const params = new URLSearchParams()
+  if (from) params.set('from', from)
+  if (to) params.set('to', to)
+  if (groupId) params.set('groupId', groupId)
+  if (q) params.set('q', q)
+  const r = await fetch(`${API_BASE}/admin/dashboard?${params}`, fetchOpts('GET'))
+  if (!r.ok) throw new Error('Ошибка загрузки')
+  return r.json()
+}
+
 export async function adminStatsGroups(from, to) {
   const params = new URLSearchParams()
   if (from) params.set('from', from)
@@ -117,7 +177,7 @@ export async function adminBalanceAdjust(childId, delta, comment) {
 }
 
 export async function adminCheckAuth() {
-  const r = await fetch(`${API_BASE}/admin/stats/groups`, fetchOpts('GET'))
+  const r = await fetch(`${API_BASE}/admin/me`, fetchOpts('GET'))
   return r.ok
 }
 
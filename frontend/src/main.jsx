@@ -3,6 +3,7 @@ import ReactDOM from 'react-dom/client'
 import { BrowserRouter } from 'react-router-dom'
 import { registerSW } from 'virtual:pwa-register'
 import App from './App'
+import { TENANT_PREFIX } from './api'
 import './index.css'
 
 if (import.meta.env.PROD) {
@@ -11,7 +12,7 @@ if (import.meta.env.PROD) {
 
 ReactDOM.createRoot(document.getElementById('root')).render(
   <React.StrictMode>
-    <BrowserRouter>
+    <BrowserRouter basename={TENANT_PREFIX || undefined}>
       <App />
     </BrowserRouter>
   </React.StrictMode>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
-import { adminLogin } from '../api'
+import { adminLogin, TENANT_PREFIX } from '../api'
 
 export default function AdminLogin() {
   const [username, setUsername] = useState('')
@@ -10,7 +10,7 @@ export default function AdminLogin() {
   const navigate = useNavigate()
 
   useEffect(() => {
-    fetch('/api/v1/csrf-set', { credentials: 'include' }).catch(() => {})
+    fetch(`${TENANT_PREFIX}/api/v1/csrf-set`, { credentials: 'include' }).catch(() => {})
   }, [])
 
   const handleSubmit = async (e) => {
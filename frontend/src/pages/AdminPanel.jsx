@@ -3,8 +3,7 @@ import { useNavigate, Link } from 'react-router-dom'
 import {
   adminCheckAuth,
   adminLogout,
-  adminMe,
-  adminStatsGroups,
+  adminDashboard,
   adminStatsChildren,
   adminChildEvents,
   adminEvents,
@@ -63,15 +62,16 @@ export default function AdminPanel() {
   const refetch = () => {
     setLoading(true)
     return Promise.all([
-      adminStatsGroups(period.from, period.to),
-      adminStatsChildren(filterGroup || undefined, filterQ || undefined, period.from, period.to),
+      adminDashboard(period.from, period.to, filterGroup || undefined, filterQ || undefined),
       adminEvents(filterGroup || undefined, undefined, period.from, period.to),
     ])
-      .then(([g, c, e]) => {
-        setGroups(g)
-        setChildren(c)
+      .then(([d, e]) => {
+        setMe(d.me)
+        setGroups(d.statsGroups)
+        setChildren(d.statsChildren)
+        if (!monthlyGroupFilter && !filterGroup) setMonthlyResults(d.monthlyResults)
         setEvents(e)
-        return [g, c, e]
+        return [d.statsGroups, d.statsChildren, e]
       })
       .finally(() => setLoading(false))
   }
@@ -83,11 +83,6 @@ export default function AdminPanel() {
     })
   }, [navigate])
 
-  useEffect(() => {
-    if (!auth) return
-    adminMe().then(setMe).catch(() => setMe({ role: 'admin', group_id: null }))
-  }, [auth])
-
   useEffect(() => {
     if (!auth) return
     refetch()
@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Link } from 'react-router-dom'
-import { getChildren, getGameActions, gameInteraction } from '../api'
+import { getChildrenChanges, applyChildrenChanges, CHILDREN_SYNC_INTERVAL_MS, getGameActions, gameInteraction } from '../api'
 import ChildCards from '../components/ChildCards'
 import GameScene from '../components/GameScene'
 import paperIcon from '../../icons/paper.png'
@@ -24,10 +24,14 @@ export default function Home() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
 
+  const childrenSeq = useRef(null)
+
   useEffect(() => {
-    Promise.all([getChildren(), getGameActions()])
+    childrenSeq.current = null
+    Promise.all([getChildrenChanges(null, undefined), getGameActions()])
       .then(([childrenData, actionsData]) => {
-        setChildren(childrenData)
+        childrenSeq.current = childrenData.seq
+        setChildren(childrenData.children)
         const merged = (actionsData || []).map((a) => ({
           ...a,
           ...ACTION_ICONS[a.id],
@@ -38,6 +42,20 @@ export default function Home() {
       .finally(() => setLoading(false))
   }, [])
 
+  // Балансы, начисленные с других киосков, и правки админки — только изменённые дети
+  useEffect(() => {
+    const timer = setInterval(() => {
+      if (childrenSeq.current == null) return
+      getChildrenChanges(childrenSeq.current, undefined)
+        .then((changes) => {
+          childrenSeq.current = changes.seq
+          setChildren((prev) => applyChildrenChanges(prev, changes))
+        })
+        .catch(() => {})
+    }, CHILDREN_SYNC_INTERVAL_MS)
+    return () => clearInterval(timer)
+  }, [])
+
   const selectedChild = selected ? children.find((c) => c.id === selected) : null
 
   const onInteraction = async (actionId) => {
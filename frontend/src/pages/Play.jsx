@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Link, useParams, useNavigate } from 'react-router-dom'
-import { getChildren, getGameActions, gameInteraction } from '../api'
+import { getKioskBootstrap, getChildrenChanges, applyChildrenChanges, CHILDREN_SYNC_INTERVAL_MS, gameInteraction } from '../api'
 import ChildCards from '../components/ChildCards'
 import GameScene from '../components/GameScene'
 import paperIcon from '../../icons/paper.png'
@@ -17,6 +17,9 @@ const ACTION_ICONS = {
   sorting: { icon: '🗑️', iconImage: trashIcon, hint: 'Дома сортировал мусор' },
 }
 
+// Поля ребёнка, которые нужны карточкам и игре
+const CHILD_FIELDS = ['id', 'fullName', 'balance']
+
 export default function Play() {
   const { groupId } = useParams()
   const navigate = useNavigate()
@@ -26,15 +29,22 @@ export default function Play() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
 
-  const childrenInGroup = groupId
-    ? children.filter((c) => c.groupId === groupId)
-    : []
+  // Сервер отдаёт (и в дельтах) только детей этой группы
+  const childrenInGroup = groupId ? children : []
+
+  const childrenSeq = useRef(null)
 
   useEffect(() => {
-    Promise.all([getChildren(), getGameActions()])
-      .then(([childrenData, actionsData]) => {
-        setChildren(childrenData)
-        const merged = (actionsData || []).map((a) => ({
+    childrenSeq.current = null
+    if (!groupId) {
+      setLoading(false)
+      return
+    }
+    getKioskBootstrap(groupId, CHILD_FIELDS)
+      .then((data) => {
+        childrenSeq.current = data.seq
+        setChildren(data.children)
+        const merged = (data.actions || []).map((a) => ({
           ...a,
           ...ACTION_ICONS[a.id],
         }))
@@ -42,7 +52,21 @@ export default function Play() {
       })
       .catch((e) => setError(e.message))
       .finally(() => setLoading(false))
-  }, [])
+  }, [groupId])
+
+  // Балансы, начисленные с других киосков, и правки админки — только изменённые дети
+  useEffect(() => {
+    const timer = setInterval(() => {
+      if (childrenSeq.current == null) return
+      getChildrenChanges(childrenSeq.current, groupId)
+        .then((changes) => {
+          childrenSeq.current = changes.seq
+          setChildren((prev) => applyChildrenChanges(prev, changes))
+        })
+        .catch(() => {})
+    }, CHILDREN_SYNC_INTERVAL_MS)
+    return () => clearInterval(timer)
+  }, [groupId])
 
   const selectedChild = selected ? children.find((c) => c.id === selected) : null
 